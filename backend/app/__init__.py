@@ -1,11 +1,37 @@
+import json
 import os
+import threading
+import time
 from flask import Flask
 from flask_cors import CORS
+from . import startup
 from .config import Config
 from .db import init_db
 
 
+def _init_db_in_background(app):
+    try:
+        init_db(app)
+    except Exception:
+        app.logger.exception("database initialization failed")
+
+
+def _model_policies(value):
+    """``MODEL_POLICIES`` as a dict: the JSON string from the environment, or a dict from test config."""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as exc:
+            raise ValueError(f"MODEL_POLICIES is not valid JSON: {exc}") from exc
+    if not isinstance(value, dict):
+        raise ValueError("MODEL_POLICIES must be a JSON object of per-call-type overrides")
+    return value
+
+
 def create_app(test_config=None):
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
     if test_config:
@@ -30,11 +56,57 @@ def create_app(test_config=None):
         pass
 
     # initialize database
-    init_db(app)
+    if app.config.get("DB_STARTUP") == "background":
+        startup.require("db")
+        threading.Thread(target=_init_db_in_background, args=(app,), name="init-db", daemon=True).start()
+    else:
+        init_db(app)
+
+    from .routing import router
+
+    router.configure(_model_policies(app.config.get("MODEL_POLICIES")))
+
+    from . import admission, preprocess, slide_images
+
+    admission.configure(app.config)
+
+    preprocess.configure(
+        upload_folder=app.config.get("UPLOAD_FOLDER"),
+        workers=app.config.get("PREPROCESS_WORKERS"),
+        chunk_pages=app.config.get("PREPROCESS_CHUNK_PAGES"),
+    )
+    slide_images.configure(
+        enabled=app.config.get("SLIDE_IMAGES"),
+        widths=app.config.get("SLIDE_IMAGE_WIDTHS"),
+        fmt=app.config.get("SLIDE_IMAGE_FORMAT"),
+        quality=app.config.get("SLIDE_IMAGE_QUALITY"),
+    )
 
     # register flask-restx API (implements endpoints & Swagger UI)
-    from .api import api as restx_api
+    with startup.timed("import_api"):
+        from .api import api as restx_api
 
     restx_api.init_app(app)
 
+    from . import journal, ws
+
+    ws.init_app(app)
+    journal.init_app(app)
+
+    if app.config.get("MODEL_LOADING") in ("eager", "preload"):
+        from .ai_utils import preload_models
+
+        startup.require("models")
+        preload_models(fork=app.config.get("MODEL_LOADING") == "preload")
+
+    if app.config.get("GC_INTERVAL") and not app.config.get("TESTING"):
+        from . import collector
+
+        collector.start(app)
+
+    startup.record("create_app", time.perf_counter() - started)
+    app.logger.info(
+        "startup: %s",
+        ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in startup.phases().items()),
+    )
     return app
@@ -0,0 +1,241 @@
+"""
+Admission control for the expensive endpoints.
+
+Slide generation, LLM-graded answers, questions (the ``llm`` gate) and
+speech synthesis (the ``tts`` gate) each pass through a ``Gate`` before
+doing their work. A gate admits at most ``capacity`` requests at a time in
+this worker, and at most ``per_key`` of them per lecture. Requests beyond
+that wait in a queue per lecture. Freed slots go round-robin across lectures
+with waiters, so a student who sends ten next-slide requests in a row gets
+one slot per round rather than ten slots ahead of everyone else.
+
+Waiting is bounded by the gate's ``queue_target``. A request is shed with
+``Overloaded``, which the API turns into ``503`` with ``Retry-After``:
+
+- on arrival, if the queue is full or the expected wait (recent hold time
+  times the queue ahead, per slot) is already past the target, so the client
+  learns at once instead of timing out;
+- after waiting ``queue_target`` without being admitted.
+
+Per gate, /metrics has the queue length and running count (gauges
+``admission.<gate>.queued`` / ``.running``), the queue delay
+(``admission.<gate>.queue_delay``), admitted/shed counters and a moving
+shed rate (``admission.<gate>.shed_rate``).
+
+Gates are per process, like gunicorn's threads: queued requests hold a
+thread while they wait, so ``capacity`` should stay below the worker's
+thread count to leave room for cheap reads.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .metrics import metrics
+
+# weight of the newest observation in the moving hold time and shed rate
+_SMOOTHING = 0.1
+
+
+class Overloaded(Exception):
+    """The request was shed; retry after ``retry_after`` seconds."""
+
+    def __init__(self, gate: str, retry_after: float, reason: str):
+        super().__init__(f"{gate}: {reason}")
+        self.gate = gate
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("key", "event", "admitted", "enqueued")
+
+    def __init__(self, key):
+        self.key = key
+        self.event = threading.Event()
+        self.admitted = False
+        self.enqueued = time.perf_counter()
+
+
+class Ticket:
+    """An admitted request; hand it back to ``Gate.release``."""
+
+    __slots__ = ("key", "started")
+
+    def __init__(self, key):
+        self.key = key
+        self.started = time.perf_counter()
+
+
+class Gate:
+    """
+    Concurrency cap with per-key caps, round-robin queueing across keys and shedding.
+
+    Args:
+        name: Metric prefix and error label.
+        capacity: Requests admitted at once; ``None`` admits everything.
+        per_key: Requests admitted at once for one key (lecture).
+        queue_target: Longest a request may wait for a slot (s).
+        max_queue: Requests that may wait at once.
+        hold_estimate: Initial guess of how long a request holds its slot (s).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: Optional[int],
+        per_key: int = 1,
+        queue_target: float = 10.0,
+        max_queue: int = 32,
+        hold_estimate: float = 5.0,
+    ):
+        self.name = name
+        self.capacity = capacity
+        self.per_key = max(1, per_key)
+        self.queue_target = queue_target
+        self.max_queue = max_queue
+        self._hold = hold_estimate
+        self._shed_rate = 0.0
+        self._lock = threading.Lock()
+        self._running = 0
+        self._running_by_key = defaultdict(int)
+        # key -> its waiters, in round-robin order (served keys move to the end)
+        self._queues: "OrderedDict[object, deque]" = OrderedDict()
+        self._queued = 0
+
+    def acquire(self, key) -> Ticket:
+        """Wait for a slot for ``key``; raises ``Overloaded`` if the request is shed."""
+        if self.capacity is None:
+            return Ticket(key)
+        with self._lock:
+            if self._running < self.capacity and self._running_by_key[key] < self.per_key:
+                # free slots are handed to eligible waiters on release, so nobody is skipped here
+                self._admit(key)
+                self._record(shed=False, delay=0.0)
+                return Ticket(key)
+            queue = self._queues.get(key, ())
+            expected = self._hold * max(
+                (self._queued + 1) / self.capacity, (len(queue) + 1) / self.per_key
+            )
+            if self._queued >= self.max_queue or expected > self.queue_target:
+                self._record(shed=True, reason="early")
+                raise Overloaded(self.name, expected, "queue delay target exceeded")
+            waiter = _Waiter(key)
+            self._queues.setdefault(key, deque()).append(waiter)
+            self._queued += 1
+            self._gauges()
+
+        waiter.event.wait(self.queue_target)
+        with self._lock:
+            delay = time.perf_counter() - waiter.enqueued
+            if waiter.admitted:
+                self._record(shed=False, delay=delay)
+                return Ticket(key)
+            self._queues[key].remove(waiter)
+            if not self._queues[key]:
+                del self._queues[key]
+            self._queued -= 1
+            self._record(shed=True, reason="deadline", delay=delay)
+            self._gauges()
+            retry_after = self._hold * (self._queued + 1) / self.capacity
+        raise Overloaded(self.name, retry_after, "no slot within the queue delay target")
+
+    def release(self, ticket: Ticket):
+        if self.capacity is None:
+            return
+        held = time.perf_counter() - ticket.started
+        with self._lock:
+            self._hold += _SMOOTHING * (held - self._hold)
+            self._running -= 1
+            self._running_by_key[ticket.key] -= 1
+            if not self._running_by_key[ticket.key]:
+                del self._running_by_key[ticket.key]
+            self._dispatch()
+            self._gauges()
+
+    @contextmanager
+    def slot(self, key):
+        ticket = self.acquire(key)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "running": self._running,
+                "queued": self._queued,
+                "lectures_waiting": len(self._queues),
+                "hold_estimate": self._hold,
+                "shed_rate": self._shed_rate,
+            }
+
+    # the methods below are called with self._lock held
+
+    def _admit(self, key):
+        self._running += 1
+        self._running_by_key[key] += 1
+        self._gauges()
+
+    def _dispatch(self):
+        """Hand free slots to waiters, one lecture at a time in round-robin order."""
+        while self._running < self.capacity:
+            for key, queue in self._queues.items():
+                if self._running_by_key[key] < self.per_key:
+                    break
+            else:
+                return  # every waiting lecture is at its own cap
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            self._queued -= 1
+            self._admit(key)
+            waiter.admitted = True
+            waiter.event.set()
+
+    def _record(self, shed: bool, reason: str = None, delay: float = None):
+        self._shed_rate += _SMOOTHING * ((1.0 if shed else 0.0) - self._shed_rate)
+        metrics.gauge(f"admission.{self.name}.shed_rate", self._shed_rate)
+        if shed:
+            metrics.incr(f"admission.{self.name}.shed")
+            metrics.incr(f"admission.{self.name}.shed_{reason}")
+        else:
+            metrics.incr(f"admission.{self.name}.admitted")
+        if delay is not None:
+            metrics.observe(f"admission.{self.name}.queue_delay", delay)
+
+    def _gauges(self):
+        metrics.gauge(f"admission.{self.name}.queued", self._queued)
+        metrics.gauge(f"admission.{self.name}.running", self._running)
+
+
+gates: Dict[str, Gate] = {
+    "llm": Gate("llm", None),
+    "tts": Gate("tts", None),
+}
+
+
+def configure(config):
+    """(Re)create the gates from the app config; ``ADMISSION=0`` admits everything."""
+    enabled = config.get("ADMISSION", True)
+    for name, prefix, hold in (("llm", "ADMISSION_LLM", 5.0), ("tts", "ADMISSION_TTS", 10.0)):
+        gates[name] = Gate(
+            name,
+            config.get(f"{prefix}_CONCURRENCY") if enabled else None,
+            per_key=config.get(f"{prefix}_PER_LECTURE", 1),
+            queue_target=config.get(f"{prefix}_QUEUE_TARGET", 10.0),
+            max_queue=config.get("ADMISSION_MAX_QUEUE", 32),
+            hold_estimate=hold,
+        )
+
+
+def slot(name: str, lecture_id):
+    """Context manager holding a slot of gate ``name`` for ``lecture_id``."""
+    return gates[name].slot(lecture_id)
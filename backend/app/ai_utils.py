@@ -1,33 +1,93 @@
-from openai import OpenAI
 import os
-from kokoro import KPipeline
+import threading
 from pydantic import BaseModel
-import soundfile as sf
-import re
-import numpy as np
+from typing import List
 
+from . import audio, preprocess, startup
+from .metrics import metrics
 from .models import Lecture, Slide
 from .prompts import (
+    Prompt,
     answer_feedback_prompt,
     lecture_intro_prompt,
     lecture_step_prompt,
     user_question_prompt,
 )
-from .utils import load_slide_as_named_tempfile
+from .grader import AnswerKey
+from .routing import router
+from .student_model import ConceptDelta
+from .text_chunking import plan_chunks
+from .timing import SentenceSplitter, TimingTrack
+from .utils import SLIDE_TEMP_PREFIX, load_slide_as_named_tempfile
+
+# The OpenAI client and the Kokoro pipeline are created on first use rather than
+# at import time: loading the TTS model takes seconds and most workers need it
+# only once a slide is synthesized. ``preload_models`` loads both up front, e.g.
+# in the gunicorn master before it forks so workers share the weights, and
+# ``warm_router`` starts the LLM router's loop and async client.
+_client = None
+_pipeline = None
+_client_lock = threading.Lock()
+_pipeline_lock = threading.Lock()
+
+
+def get_client():
+    """The shared OpenAI client, created on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                with startup.timed("openai_client"):
+                    from openai import OpenAI
+
+                    _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def get_pipeline():
+    """The shared Kokoro TTS pipeline, loaded on first call."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                with startup.timed("tts_pipeline"):
+                    from kokoro import KPipeline
+
+                    _pipeline = KPipeline(lang_code="a")
+                startup.set_ready("models")
+    return _pipeline
+
+
+def warm_router():
+    """Start the LLM router's loop thread and async client, once per process."""
+    with startup.timed("llm_router"):
+        router.warm()
+
+
+def preload_models(fork: bool = False):
+    """
+    Create the OpenAI clients and load the TTS pipeline now instead of on first use.
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-pipeline = KPipeline(lang_code="a")
+    Args:
+        fork: The process will fork workers (gunicorn's preload). The
+            router's loop thread would not survive the fork, so it is left
+            for each worker to start (``warm_router`` in ``post_fork``).
+    """
+    get_client()
+    get_pipeline()
+    if not fork:
+        warm_router()
 
 
 class AnswerFeedback(BaseModel):
     correct: bool
     summary: str
-    hypothesis: str
+    concept_updates: List[ConceptDelta]
 
 
 class UserQuestionResponse(BaseModel):
     answer: str
-    hypothesis: str
+    concept_updates: List[ConceptDelta]
     hypothesis_use: str
 
 
@@ -36,80 +96,94 @@ class SlideResponse(BaseModel):
     ask_question: bool
     question: str
     hypothesis_use: str
+    concepts: List[str]
+    answer_key: AnswerKey
 
 
-def _split_into_sentences(text: str):
+def _record_prompt_usage(prompt: Prompt, response):
     """
-    Split text into sentences using simple punctuation rules.
+    Record estimated and provider-reported prompt cache usage for one call.
 
     Args:
-        text: The input text to split.
-
-    Returns:
-        A list of sentence strings.
+        prompt: The prompt that was sent.
+        response: The API response, whose ``usage`` reports actual cached tokens.
     """
-    # basic split on punctuation boundaries to avoid overloading tts with very long inputs
-    text = text.strip()
-    if not text:
-        return []
-    sentences = re.split(r"(?<=[.!?])\s+", text)
-    return [s.strip() for s in sentences if s.strip()]
+    kind = prompt.kind
+    metrics.incr(f"prompt.{kind}.calls")
+    metrics.incr(f"prompt.{kind}.estimated_tokens", prompt.estimated_tokens)
+    metrics.incr(f"prompt.{kind}.estimated_cached_tokens", prompt.estimated_cached_tokens)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        details = getattr(usage, "input_tokens_details", None)
+        metrics.incr(f"prompt.{kind}.input_tokens", usage.input_tokens or 0)
+        metrics.incr(f"prompt.{kind}.cached_tokens", getattr(details, "cached_tokens", 0) or 0)
 
 
 def get_answer_feedback(question: str, answer: str, hypothesis: str) -> dict:
     """
-    Get feedback on an answer to a question and update the hypothesis of the student's understanding of the topic.
+    Get feedback on an answer to a question and the resulting changes to the student model.
 
     Args:
         question: The question that was asked.
         answer: The student's answer to the question.
-        hypothesis: The hypothesis of the student's understanding of the topic.
+        hypothesis: The rendered student model relevant to the question.
 
     Returns:
-        A dictionary containing the correctness of the answer, a summary of the feedback, and the updated hypothesis.
+        A dictionary containing the correctness of the answer, a summary of the feedback, and the concept deltas.
     """
     prompt = answer_feedback_prompt(question, answer, hypothesis)
-    response = client.responses.parse(
-        model="gpt-5-nano",
+    response = router.parse(
+        "answer",
         input=prompt,
         text_format=AnswerFeedback,
     )
+    _record_prompt_usage(prompt, response)
     parsed_response = response.output_parsed
     return {
         "correct": parsed_response.correct,
         "feedback": parsed_response.summary,
-        "hypothesis": parsed_response.hypothesis,
+        "concept_updates": parsed_response.concept_updates,
     }
 
 
-def lecture_step(lecture: Lecture, slide_num: int):
+def lecture_step(lecture: Lecture, slide_num: int, hypothesis: str, student_hypothesis: str = ""):
     """
     Generate a step in a lecture and inplace update the lecture with the generated script.
 
     Args:
         lecture: The lecture to generate a step for.
         slide_num: The slide number to generate a step for.
+        hypothesis: The rendered student model relevant to this slide.
+        student_hypothesis: The student's cross-lecture profile summary.
     """
-    temp = load_slide_as_named_tempfile(lecture, slide_num)
+    # the page split at upload time; parse the whole PDF only if it is not there yet
+    page = preprocess.page_path(lecture, slide_num)
+    temp = None if page else load_slide_as_named_tempfile(lecture, slide_num)
+    metrics.incr("step.page_preprocessed" if page else "step.page_split")
     uploaded_slide = None
 
     try:
-        with open(temp.name, "rb") as f:
-            uploaded_slide = client.files.create(file=f, purpose="assistants")
+        with open(page or temp.name, "rb") as f:
+            # named like the temp files either way, so the collector can find leftovers
+            name = f"{SLIDE_TEMP_PREFIX}{lecture.id}-{slide_num}.pdf"
+            uploaded_slide = get_client().files.create(file=(name, f), purpose="assistants")
+
+        # static instructions first, the slide file last, so consecutive steps share a cacheable prefix
+        prompt = (
+            lecture_intro_prompt(student_hypothesis, hypothesis)
+            if slide_num == 1
+            else lecture_step_prompt(lecture.script, student_hypothesis, hypothesis)
+        )
 
-        response = client.responses.parse(
-            model="gpt-5-nano",
+        response = router.parse(
+            "step",
             input=[
                 {
                     "role": "user",
                     "content": [
                         {
                             "type": "input_text",
-                            "text": (
-                                lecture_intro_prompt("", lecture.lecture_hypothesis)
-                                if slide_num == 1
-                                else lecture_step_prompt(lecture.script, "", lecture.lecture_hypothesis)
-                            ),  # TODO: add student hypotheses
+                            "text": prompt,
                         },
                         {
                             "type": "input_file",
@@ -120,6 +194,7 @@ def lecture_step(lecture: Lecture, slide_num: int):
             ],
             text_format=SlideResponse,
         )
+        _record_prompt_usage(prompt, response)
 
         script = response.output_parsed.script
         question = (
@@ -128,11 +203,17 @@ def lecture_step(lecture: Lecture, slide_num: int):
             else None
         )
         hypothesis_use = response.output_parsed.hypothesis_use
-        return {"script": script, "question": question, "hypothesis_use": hypothesis_use}
+        return {
+            "script": script,
+            "question": question,
+            "hypothesis_use": hypothesis_use,
+            "concepts": response.output_parsed.concepts,
+            "answer_key": response.output_parsed.answer_key if question else None,
+        }
 
     finally:
         if uploaded_slide is not None:
-            client.files.delete(uploaded_slide.id)
+            get_client().files.delete(uploaded_slide.id)
         try:
             # remove the temporary file created for upload
             if temp and os.path.exists(temp.name):
@@ -143,7 +224,15 @@ def lecture_step(lecture: Lecture, slide_num: int):
 
 def slide_to_speech(slide: Slide):
     """
-    Generate a speech for a slide.
+    Generate a speech for a slide, with a sentence offset index and a word
+    timing track next to it.
+
+    Samples are appended to the artifact's partial file as they are
+    synthesized (readers can stream it meanwhile, see ``audio.tail_pcm``), so
+    memory stays flat however long the slide is. The WAV is renamed into
+    place after its sidecars, so a finalized artifact always has all three
+    files. If another thread or worker is already synthesizing the slide,
+    this waits for it instead.
 
     Args:
         slide: The slide to generate a speech for.
@@ -151,59 +240,69 @@ def slide_to_speech(slide: Slide):
     Returns:
         The path to the generated speech file.
     """
-    # ensure output directory exists
-    backend_root = os.path.dirname(os.path.dirname(__file__))
-    output_dir = os.path.join(backend_root, "speech_outputs")
-    os.makedirs(output_dir, exist_ok=True)
-
-    output_path = os.path.join(
-        output_dir, f"{slide.slide_number}-{slide.lecture_id}.wav"
-    )
+    os.makedirs(audio.SPEECH_DIR, exist_ok=True)
+    output_path = audio.artifact_path(slide)
+    out = audio.open_partial(output_path)
+    if out is None:
+        return audio.relative(output_path)
 
-    # split script into sentences and synthesize one by one
-    sentences = _split_into_sentences(slide.script or "")
-    audio_chunks = []
+    import soundfile as sf
 
-    for sentence in sentences:
-        generator = pipeline(sentence, voice="af_heart")
-        for i, (gs, ps, audio) in enumerate(generator):
-            print(i, gs, ps)
-            # ensure consistent dtype for concatenation
-            audio_chunks.append(np.asarray(audio, dtype=np.float32))
+    # synthesize in planned units: short sentences batched, long ones split
+    chunks = plan_chunks(slide.script or "")
+    index = audio.SentenceIndex()
+    timings = TimingTrack(audio.SAMPLE_RATE)
 
-    if audio_chunks:
-        full_audio = np.concatenate(audio_chunks)
-    else:
-        # fallback to tiny silence if nothing synthesized
-        full_audio = np.zeros(0, dtype=np.float32)
-
-    sf.write(output_path, full_audio, 24000)
+    try:
+        with sf.SoundFile(
+            out, "w", samplerate=audio.SAMPLE_RATE, channels=audio.CHANNELS, subtype="PCM_16", format="WAV"
+        ) as wav:
+            for chunk in chunks:
+                # a unit of several sentences is cut back into sentences; pieces of a split sentence merge
+                splitter = SentenceSplitter(chunk.parts, audio.SAMPLE_RATE)
+                generator = get_pipeline()(chunk.text, voice="af_heart")
+                for result in generator:
+                    gs, ps, waveform = result
+                    pcm = audio.to_pcm16(waveform)
+                    wav.write(pcm)
+                    for sentence_no, text, length, tokens in splitter.split(gs, len(pcm), getattr(result, "tokens", None)):
+                        index.add(sentence_no, text, length)
+                        timings.add_chunk(sentence_no, text, length, tokens)
+
+        data_offset = audio.wav_data_offset(audio.partial_path(output_path))
+        audio.write_json_atomic(audio.index_path(output_path), index.to_dict(data_offset))
+        audio.write_bytes_atomic(audio.timings_path(output_path), timings.to_bytes())
+    except BaseException:
+        audio.abandon(out, output_path)
+        raise
+    audio.publish(out, output_path)
 
     # return relative path for storage in database
-    return os.path.relpath(output_path, backend_root)
+    return audio.relative(output_path)
 
 
 def user_ask_question(script: str, question: str, hypothesis: str) -> dict:
     """
-    Answer a question asked by the user and update the hypothesis of the student's understanding of the topic.
+    Answer a question asked by the user and work out the resulting changes to the student model.
 
     Args:
         script: The script of the lecture so far.
         question: The question that was asked.
-        hypothesis: The hypothesis of the student's understanding of the topic.
+        hypothesis: The rendered student model relevant to the question.
 
     Returns:
-        A dictionary containing the answer and the updated hypothesis.
+        A dictionary containing the answer and the concept deltas.
     """
     prompt = user_question_prompt(script, question, hypothesis)
-    response = client.responses.parse(
-        model="gpt-5-nano",
+    response = router.parse(
+        "question",
         input=prompt,
         text_format=UserQuestionResponse,
     )
+    _record_prompt_usage(prompt, response)
     parsed_response = response.output_parsed
     return {
         "answer": parsed_response.answer,
-        "hypothesis": parsed_response.hypothesis,
+        "concept_updates": parsed_response.concept_updates,
         "hypothesis_use": parsed_response.hypothesis_use,
     }
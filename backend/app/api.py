@@ -1,14 +1,42 @@
 from flask_restx import Api, Namespace, Resource, fields
-from flask import request, send_file
+from flask import Response, current_app, make_response, request, send_file
 from .ai_utils import lecture_step
 from .db import get_db
-from .models import Lecture, Slide
+from .models import Lecture, Slide, Student
+from . import student_model, student_profile
+import hashlib
+import json
+import logging
 import os
-import mimetypes
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from werkzeug.utils import secure_filename
 from .ai_utils import slide_to_speech, get_answer_feedback, user_ask_question
+from .cache import LRUCache
+from .metrics import metrics
+from .singleflight import LockTimeout, SingleFlight, advisory_lock
+from .timing import TimingTrack
+from . import admission, archive, audio, grader, journal, preprocess, runs, slide_images, startup
+
+logger = logging.getLogger(__name__)
+
+
+class _Api(Api):
+    def handle_error(self, e):
+        # shedding is expected under load: answer 503 without logging a traceback like other 5xx
+        if isinstance(e, admission.Overloaded):
+            return self.make_response(
+                {"message": "server busy, retry later"}, 503, headers={"Retry-After": str(e.retry_after)}
+            )
+        return super().handle_error(e)
 
-api = Api(
+
+api = _Api(
     title="Deepest Learning API",
     version="1.0",
     description="Lecture instantiate / step / answer API",
@@ -17,16 +45,52 @@ api = Api(
 
 ns = Namespace("lectures", description="Lecture operations")
 api.add_namespace(ns, path="")
+students_ns = Namespace("students", description="Student profiles")
+api.add_namespace(students_ns)
 
 # models
 upload_model = api.parser()
 upload_model.add_argument(
     "file_obj", location="files", type="file", required=True, help="PDF file"
 )
+upload_model.add_argument(
+    "student_id", location="form", type=int, required=False, help="Owning student"
+)
 
 lecture_response = api.model(
     "LectureCreateResponse",
-    {"id": fields.Integer("Lecture id"), "message": fields.String()},
+    {
+        "id": fields.Integer("Lecture id"),
+        "message": fields.String(),
+        "pages": fields.Integer("Number of pages in the PDF"),
+        "preprocess": fields.String("Page preprocessing status (see /lectures/preprocess)"),
+    },
+)
+
+preprocess_response = api.model(
+    "PreprocessStatus",
+    {
+        "lecture_id": fields.Integer(),
+        "status": fields.String(description="pending, running, done or failed"),
+        "pages": fields.Integer(),
+        "pages_ready": fields.Integer(),
+        "progress": fields.Float(description="Fraction of pages preprocessed"),
+        "error": fields.String(),
+    },
+)
+
+slide_images_response = api.model(
+    "SlideImages",
+    {
+        "lecture_id": fields.Integer(),
+        "available": fields.Boolean(description="False if the server cannot render images"),
+        "ready": fields.Boolean(description="Every page is rendered; others render on first request"),
+        "pages": fields.Integer(),
+        "widths": fields.List(fields.Integer, description="Rendered widths in pixels"),
+        "format": fields.String(),
+        "aspect": fields.List(fields.Float, description="Width / height of each page, once ready"),
+        "url": fields.String(description="URL template with {page} and {width}; responses are immutable"),
+    },
 )
 
 step_response = api.model(
@@ -59,6 +123,68 @@ question_response = api.model(
     {"answer": fields.String(), "hypothesis": fields.String(), "hypothesis_use": fields.String()},
 )
 
+student_request = api.model("StudentRequest", {"name": fields.String()})
+student_response = api.model(
+    "StudentResponse",
+    {"id": fields.Integer(), "name": fields.String(), "profile": fields.String()},
+)
+student_page = api.model(
+    "StudentPage",
+    {"students": fields.List(fields.Nested(student_response)), "next": fields.Integer()},
+)
+
+run_summary = api.model("LectureRun", {"run": fields.Integer(), "slides": fields.Integer()})
+run_list = api.model(
+    "LectureRuns",
+    {"current_run": fields.Integer(), "runs": fields.List(fields.Nested(run_summary))},
+)
+run_slide = api.model(
+    "RunSlide",
+    {
+        "id": fields.Integer(),
+        "slide": fields.Integer(),
+        "text": fields.String(),
+        "question": fields.String(),
+    },
+)
+
+MAX_PAGE_SIZE = 200
+# a year, the most caches honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def _page_limit() -> int:
+    """The ``limit`` query argument, capped at ``MAX_PAGE_SIZE``; below 1 is a 400."""
+    limit = request.args.get("limit", 50, type=int)
+    if limit < 1:
+        api.abort(400, "limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+@api.route("/metrics")
+class MetricsResource(Resource):
+    def get(self):
+        """Per-worker counters and latency percentiles."""
+        return metrics.snapshot()
+
+
+@api.route("/healthz")
+class HealthResource(Resource):
+    def get(self):
+        """Liveness: the process is up and serving requests."""
+        return {"status": "ok", "uptime": time.time() - startup.PROCESS_START}
+
+
+@api.route("/readyz")
+class ReadyResource(Resource):
+    def get(self):
+        """Readiness: the database and any eagerly loaded models are available."""
+        state = startup.readiness()
+        state["startup"] = startup.phases()
+        return state, 200 if state["ready"] else 503
+
+
 UPLOAD_FOLDER = "uploads"  # Directory to store uploaded PDFs
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -72,19 +198,34 @@ class InstantiateLecture(Resource):
         if not uploaded_file:
             api.abort(400, "file is required")
 
-        # Save the uploaded file locally
-        filename = secure_filename("uploaded.pdf")
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        uploaded_file.save(file_path)
+        student_id = request.form.get("student_id", type=int)
+
+        # content-addressed, so concurrent and repeated uploads never overwrite each other
+        file_path, digest = preprocess.store_upload(uploaded_file.stream, UPLOAD_FOLDER)
+        try:
+            page_count = preprocess.count_pages(file_path)
+        except ValueError as exc:
+            os.unlink(file_path)
+            api.abort(400, str(exc))
+        filename = secure_filename(uploaded_file.filename or "") or "uploaded.pdf"
+        status = preprocess.DONE if preprocess.is_complete(digest) else preprocess.PENDING
 
         # Store the file path in the database
         db_gen = get_db()
         db = next(db_gen)
         try:
+            if student_id is not None and db.get(Student, student_id) is None:
+                api.abort(404, "student not found")
             lecture = Lecture(
+                student_id=student_id,
                 title=filename,
+                pdf_filename=uploaded_file.filename,
                 pdf_path=file_path,
-                lecture_hypothesis="We have no knowledge of the user's understanding",
+                pdf_sha256=digest,
+                page_count=page_count,
+                preprocess_status=status,
+                pages_ready=page_count if status == preprocess.DONE else 0,
+                lecture_hypothesis=student_model.NO_EVIDENCE_TEXT,
             )
             db.add(lecture)
             db.commit()
@@ -95,7 +236,170 @@ class InstantiateLecture(Resource):
             except StopIteration:
                 pass
 
-        return {"id": lecture.id, "message": "lecture instantiated"}, 201
+        if status != preprocess.DONE:
+            preprocess.submit(file_path, digest, page_count)
+        journal.annotate(lecture_id=lecture.id, pages=page_count, document=digest[:16])
+        return {"id": lecture.id, "message": "lecture instantiated", "pages": page_count, "preprocess": status}, 201
+
+
+@ns.route("/preprocess/<int:lecture_id>")
+class PreprocessStatus(Resource):
+    @api.marshal_with(preprocess_response)
+    def get(self, lecture_id: int):
+        """Progress of the lecture's upload-time page preprocessing."""
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            lecture = db.get(Lecture, lecture_id)
+            if lecture is None:
+                api.abort(404, "lecture not found")
+            pages = lecture.page_count or 0
+            return {
+                "lecture_id": lecture.id,
+                "status": lecture.preprocess_status,
+                "pages": lecture.page_count,
+                "pages_ready": lecture.pages_ready,
+                "progress": (lecture.pages_ready or 0) / pages if pages else 0.0,
+                "error": lecture.preprocess_error,
+            }
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+
+@ns.route("/slide-images/<int:lecture_id>")
+class SlideImages(Resource):
+    @api.marshal_with(slide_images_response)
+    def get(self, lecture_id: int):
+        """Where the lecture's pre-rendered page images are and whether they are all rendered."""
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            lecture = db.get(Lecture, lecture_id)
+            if lecture is None:
+                api.abort(404, "lecture not found")
+            if not lecture.pdf_sha256 or not slide_images.available():
+                return {"lecture_id": lecture.id, "available": False, "ready": False, "pages": lecture.page_count}
+            rendered = slide_images.manifest(lecture.pdf_sha256)
+            return {
+                "lecture_id": lecture.id,
+                "available": True,
+                "ready": rendered is not None,
+                "pages": lecture.page_count,
+                "widths": list(slide_images.widths()),
+                "format": slide_images.extension(),
+                "aspect": rendered["aspect"] if rendered else None,
+                "url": f"{request.script_root}/lectures/slide-image/{lecture.pdf_sha256}/{{page}}/{{width}}.{slide_images.extension()}",
+            }
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+
+@ns.route("/slide-image/<string:digest>/<int:page>/<int:width>.<string:ext>")
+class SlideImage(Resource):
+    def get(self, digest: str, page: int, width: int, ext: str):
+        """One page of a document as an image; immutable, so clients and CDNs cache it for good."""
+        if not slide_images.available():
+            api.abort(501, "slide images need pypdfium2 and Pillow on the server")
+        if width not in slide_images.widths() or ext != slide_images.extension() or not _DIGEST.fullmatch(digest):
+            api.abort(404, "no such image")
+        path = slide_images.image_path(digest, page, width)
+        if not os.path.isfile(path):
+            db_gen = get_db()
+            db = next(db_gen)
+            try:
+                lecture = (
+                    db.query(Lecture.pdf_path, Lecture.page_count).filter(Lecture.pdf_sha256 == digest).first()
+                )
+            finally:
+                try:
+                    next(db_gen)
+                except StopIteration:
+                    pass
+            if lecture is None or not lecture.pdf_path or not 1 <= page <= (lecture.page_count or 0):
+                api.abort(404, "no such image")
+            try:
+                path = slide_images.ensure_image(lecture.pdf_path, digest, page, width)
+            except Exception as exc:
+                logger.exception("rendering page %d of %s failed", page, digest)
+                api.abort(500, f"rendering failed: {exc}")
+        response = send_file(
+            os.path.abspath(path),
+            mimetype=slide_images.mimetype(),
+            conditional=True,
+            etag=f"{digest[:16]}-{page}-w{width}",
+            max_age=IMMUTABLE_MAX_AGE,
+        )
+        # the URL names the document's content, so it never has to be revalidated
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+@ns.route("/export/<int:lecture_id>")
+class ExportLecture(Resource):
+    def get(self, lecture_id: int):
+        """Download a lecture with its slides, student model history and PDF as a single archive."""
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            if db.get(Lecture, lecture_id) is None:
+                api.abort(404, "lecture not found")
+            fd, path = tempfile.mkstemp(suffix=".tar")
+            os.close(fd)
+            try:
+                archive.export_lectures(db, path, lecture_ids=[lecture_id])
+            except RuntimeError as exc:
+                os.unlink(path)
+                api.abort(501, str(exc))
+            response = send_file(
+                path,
+                mimetype="application/x-tar",
+                as_attachment=True,
+                download_name=f"lecture-{lecture_id}.tar",
+            )
+            response.call_on_close(lambda: os.unlink(path))
+            return response
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+
+@ns.route("/import")
+class ImportLectures(Resource):
+    def post(self):
+        """Import an archive produced by /export or archive_lectures.py; returns old -> new lecture ids."""
+        uploaded_file = request.files.get("archive")
+        if not uploaded_file:
+            api.abort(400, "archive is required")
+        fd, path = tempfile.mkstemp(suffix=".tar")
+        os.close(fd)
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            uploaded_file.save(path)
+            try:
+                id_map = archive.import_lectures(db, path, UPLOAD_FOLDER)
+            except RuntimeError as exc:
+                api.abort(501, str(exc))
+            except (ValueError, KeyError, OSError) as exc:
+                db.rollback()
+                api.abort(400, f"invalid archive: {exc}")
+            archive.preprocess_imported(db, list(id_map.values()))
+            return {"lectures": {str(old): new for old, new in id_map.items()}}, 201
+        finally:
+            os.unlink(path)
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
 
 
 @ns.route("/reset/<int:lecture_id>")
@@ -111,18 +415,16 @@ class ResetLecture(Resource):
             if not lecture:
                 api.abort(404, "lecture not found")
 
-            # Delete all slides for this lecture and reset accumulated script and hypothesis
-            db.query(Slide).filter_by(lecture_id=lecture_id).delete()
-            lecture.script = ""
-            lecture.lecture_hypothesis = (
-                "We have no knowledge of the user's understanding"
-            )
+            # Start a new run: slides and student model of the old one are left to the collector
+            runs.start_run(db, lecture)
+            lecture.lecture_hypothesis = student_model.NO_EVIDENCE_TEXT
 
             db.add(lecture)
             db.commit()
+            _invalidate_steps(lecture_id)
             db.refresh(lecture)
 
-            return {"message": "lecture reset", "id": lecture.id}, 200
+            return {"message": "lecture reset", "id": lecture.id, "run": lecture.current_run}, 200
         finally:
             try:
                 next(db_gen)
@@ -130,72 +432,37 @@ class ResetLecture(Resource):
                 pass
 
 
-@ns.route("/step/<int:lecture_id>/<int:slide_num>")
-class StepResource(Resource):
-    @api.response(200, "OK", step_response)
-    def get(self, lecture_id, slide_num):
+@ns.route("/runs/<int:lecture_id>")
+class LectureRuns(Resource):
+    @api.response(200, "OK", run_list)
+    def get(self, lecture_id: int):
+        """Runs of a lecture that have not been garbage collected yet."""
         db_gen = get_db()
         db = next(db_gen)
         try:
             lecture = db.query(Lecture).filter_by(id=lecture_id).first()
             if not lecture:
                 api.abort(404, "lecture not found")
+            return {"current_run": lecture.current_run, "runs": runs.list_runs(db, lecture_id)}
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
 
-            # If this is slide 1, clear all previous slides to start fresh
-            if slide_num == 1:
-                db.query(Slide).filter_by(lecture_id=lecture_id).delete()
-                lecture.script = ""  # Reset accumulated script
-                db.commit()
-
-            # Always compute fresh - call OpenAI to generate script
-            result = lecture_step(lecture, slide_num)
-            
-            # Check if slide already exists (shouldn't after cleanup above, but defensive)
-            slide = (
-                db.query(Slide)
-                .filter_by(lecture_id=lecture_id, slide_number=slide_num)
-                .first()
-            )
-            
-            if slide:
-                # Update existing slide with fresh content
-                slide.script = result["script"]
-                slide.question = result["question"]
-            else:
-                # Create new slide
-                slide = Slide(
-                    script=result["script"],
-                    slide_number=slide_num,
-                    lecture_id=lecture_id,
-                    question=result["question"],
-                )
-                db.add(slide)
-            
-            # Update lecture script with accumulated context for future slides
-            if lecture.script:
-                lecture.script = lecture.script + "\n\n" + result["script"]
-            else:
-                lecture.script = result["script"]
-            
-            db.add(lecture)
-            db.commit()
-            db.refresh(lecture)
-            db.refresh(slide)
-
-            # audio_filename = slide_to_speech(slide)
-            # slide.audio_path = audio_filename
-            # db.add(slide)
-            # db.commit()
-            # db.refresh(slide)
 
-            return {
-                "id": slide.id,
-                "slide": slide_num,
-                "text": slide.script,
-                "question": result["question"],
-                "hypothesis_use": result["hypothesis_use"],
-                "hypothesis": lecture.lecture_hypothesis,
-            }
+@ns.route("/runs/<int:lecture_id>/<int:run>")
+class LectureRunSlides(Resource):
+    @api.response(200, "OK", [run_slide])
+    def get(self, lecture_id: int, run: int):
+        """Slides of one run, current or stale."""
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            return [
+                {"id": slide.id, "slide": slide.slide_number, "text": slide.script, "question": slide.question}
+                for slide in runs.run_slides(db, lecture_id, run)
+            ]
         finally:
             try:
                 next(db_gen)
@@ -203,6 +470,199 @@ class StepResource(Resource):
                 pass
 
 
+@ns.route("/step/<int:lecture_id>/<int:slide_num>")
+class StepResource(Resource):
+    @api.response(200, "OK", step_response)
+    @api.response(304, "Not modified")
+    @api.response(404, "The slide has not been generated yet")
+    def get(self, lecture_id, slide_num):
+        """The stored slide. Never generates anything; supports ETag / Last-Modified revalidation."""
+        key = (lecture_id, _step_generations[lecture_id], slide_num)
+        entry = _step_cache.get(key)
+        if entry is None:
+            metrics.incr("step.cache_miss")
+            entry = _load_step(lecture_id, slide_num)
+            _step_cache.set(key, entry)
+        else:
+            metrics.incr("step.cache_hit")
+        body, etag, last_modified = entry
+
+        response = make_response(body)
+        response.mimetype = "application/json"
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # the same URL serves a new slide after a reset: cache, but always revalidate
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            metrics.incr("step.not_modified")
+        return response
+
+    @api.response(200, "OK", step_response)
+    @api.response(503, "The slide is still being generated elsewhere")
+    def post(self, lecture_id, slide_num):
+        """Generate the slide (slide 1 starts a new run of the lecture)."""
+        # retries and second tabs asking for the same slide share one generation
+        result, shared = _step_flight.do((lecture_id, slide_num), lambda: _generate_step(lecture_id, slide_num))
+        if shared:
+            metrics.incr("step.coalesced")
+        return result
+
+
+_step_flight = SingleFlight()
+
+# read-through cache of rendered GET /step responses, per worker. Keys carry a
+# per-lecture generation that every write in this worker bumps, so a read that
+# raced a write can only fill an entry nobody looks up; the TTL bounds how long
+# a write made by another worker can go unnoticed.
+_step_cache = LRUCache(maxsize=4096, ttl=5)
+_step_generations = defaultdict(int)
+
+
+def _invalidate_steps(lecture_id):
+    _step_generations[lecture_id] += 1
+
+
+def _step_payload(slide):
+    return {
+        "id": slide.id,
+        "slide": slide.slide_number,
+        "text": slide.script,
+        "question": slide.question,
+        "hypothesis_use": slide.hypothesis_use,
+        "hypothesis": slide.hypothesis,
+    }
+
+
+def _load_step(lecture_id, slide_num):
+    """Render the stored slide as ``(body, etag, last_modified)``."""
+    db_gen = get_db()
+    db = next(db_gen)
+    try:
+        slide = runs.current_slide(db, lecture_id, slide_num)
+        if not slide or not slide.script:
+            api.abort(404, "slide not generated yet")
+        body = json.dumps(_step_payload(slide), separators=(",", ":"))
+        etag = hashlib.sha1(body.encode()).hexdigest()
+        last_modified = (slide.updated_at or datetime.utcnow()).replace(tzinfo=timezone.utc)
+        return body, etag, last_modified
+    finally:
+        try:
+            next(db_gen)
+        except StopIteration:
+            pass
+
+
+def _generate_step(lecture_id, slide_num):
+    """Generate a slide while holding the cross-worker lock for it."""
+    db_gen = get_db()
+    db = next(db_gen)
+    try:
+        lecture = db.query(Lecture).filter_by(id=lecture_id).first()
+        if not lecture:
+            api.abort(404, "lecture not found")
+
+        lock_name = f"deepest_learning:step:{lecture_id}:{slide_num}"
+        started = time.perf_counter()
+        try:
+            with advisory_lock(db.get_bind(), lock_name, current_app.config.get("STEP_LOCK_TIMEOUT", 120)) as waited:
+                # end the transaction the lecture was read in: under REPEATABLE READ (MySQL)
+                # it pins a snapshot taken before the lock, which would hide what the
+                # previous holder committed (its slide, the lecture's script)
+                db.rollback()
+                if waited:
+                    # another worker generated this slide while we waited; serve its result
+                    metrics.incr("step.lock_waited")
+                    metrics.observe("step.lock_wait", time.perf_counter() - started)
+                    slide = runs.current_slide(db, lecture_id, slide_num)
+                    if slide and slide.script:
+                        metrics.incr("step.lock_reused")
+                        return _step_payload(slide)
+                with admission.slot("llm", lecture_id):
+                    return _run_step(db, lecture, slide_num)
+        except LockTimeout:
+            api.abort(503, "slide is still being generated, retry later")
+    finally:
+        try:
+            next(db_gen)
+        except StopIteration:
+            pass
+
+
+def _run_step(db, lecture, slide_num):
+    lecture_id = lecture.id
+
+    # If this is slide 1, start fresh: a new run unless the current one is still empty
+    if slide_num == 1:
+        if runs.has_slides(db, lecture):
+            runs.start_run(db, lecture, carry_concepts=True)
+        lecture.script = ""  # Reset accumulated script
+        db.commit()
+        _invalidate_steps(lecture_id)
+    run = lecture.current_run
+
+    # Render the student model around the concepts of the previous slide
+    student_model.deferred.flush(lecture_id)
+    previous = runs.current_slide(db, lecture_id, slide_num - 1, run)
+    hypothesis = student_model.render_for(
+        db, lecture_id, student_model.parse_concepts(previous.concepts if previous else None), run=run
+    )
+
+    student_hypothesis = student_profile.get_summary(db, lecture.student_id)
+
+    # Always compute fresh - call OpenAI to generate script
+    result = lecture_step(lecture, slide_num, hypothesis, student_hypothesis)
+
+    # Check if slide already exists (regenerating a slide of this run)
+    slide = runs.current_slide(db, lecture_id, slide_num, run)
+
+    if slide:
+        # Update existing slide with fresh content
+        slide.script = result["script"]
+        slide.question = result["question"]
+        slide.concepts = student_model.dump_concepts(result["concepts"])
+        slide.answer_key = grader.dump_key(result["answer_key"])
+        slide.hypothesis = hypothesis
+        slide.hypothesis_use = result["hypothesis_use"]
+        slide.updated_at = datetime.utcnow()
+    else:
+        # Create new slide
+        slide = Slide(
+            script=result["script"],
+            slide_number=slide_num,
+            lecture_id=lecture_id,
+            run=run,
+            question=result["question"],
+            concepts=student_model.dump_concepts(result["concepts"]),
+            answer_key=grader.dump_key(result["answer_key"]),
+            hypothesis=hypothesis,
+            hypothesis_use=result["hypothesis_use"],
+            updated_at=datetime.utcnow(),
+        )
+        db.add(slide)
+
+    # Update lecture script with accumulated context for future slides
+    if lecture.script:
+        lecture.script = lecture.script + "\n\n" + result["script"]
+    else:
+        lecture.script = result["script"]
+    lecture.lecture_hypothesis = hypothesis
+
+    db.add(lecture)
+    db.commit()
+    _invalidate_steps(lecture_id)
+    db.refresh(lecture)
+    db.refresh(slide)
+
+    # audio_filename = slide_to_speech(slide)
+    # slide.audio_path = audio_filename
+    # db.add(slide)
+    # db.commit()
+    # db.refresh(slide)
+
+    return _step_payload(slide)
+
+
 @ns.route("/answer/<int:lecture_id>/<int:slide_num>")
 class AnswerResource(Resource):
     @api.expect(answer_request)
@@ -218,19 +678,52 @@ class AnswerResource(Resource):
         if not lecture:
             api.abort(404, "lecture not found")
 
-        slide = (
-            db.query(Slide)
-            .filter_by(lecture_id=lecture_id, slide_number=slide_num)
-            .first()
-        )
+        slide = runs.current_slide(db, lecture_id, slide_num, lecture.current_run)
         if not slide:
             api.abort(404, "slide not found")
 
-        result = get_answer_feedback(slide.question, answer, lecture.lecture_hypothesis)
+        concepts = student_model.parse_concepts(slide.concepts)
+
+        # closed-form answers are marked against the slide's answer key without the LLM;
+        # their model updates are applied in the background
+        key = grader.parse_key(slide.answer_key) if current_app.config.get("LOCAL_GRADING", True) else None
+        started = time.perf_counter()
+        grade = grader.grade(key, answer)
+        if grade is not None:
+            metrics.observe("answer.local_grade", time.perf_counter() - started)
+            metrics.incr("answer.local")
+            student_model.deferred.add(
+                lecture_id,
+                lecture.current_run,
+                grader.concept_deltas(key, concepts, grade.correct),
+                student_id=lecture.student_id,
+                source="answer",
+            )
+            return {
+                "feedback": grade.feedback,
+                "correct": grade.correct,
+                "hypothesis": lecture.lecture_hypothesis,
+            }
+
+        metrics.incr("answer.llm")
+        student_model.deferred.flush(lecture_id)
+        with admission.slot("llm", lecture_id):
+            result = get_answer_feedback(
+                slide.question, answer, student_model.render_for(db, lecture_id, concepts, run=lecture.current_run)
+            )
         feedback = result["feedback"]
         correct = result["correct"]
-        hypothesis = result["hypothesis"]
 
+        student_model.apply_deltas(
+            db,
+            lecture_id,
+            result["concept_updates"],
+            student_id=lecture.student_id,
+            source="answer",
+            run=lecture.current_run,
+        )
+        db.flush()
+        hypothesis = student_model.render_for(db, lecture_id, concepts, run=lecture.current_run)
         lecture.lecture_hypothesis = hypothesis
         db.add(lecture)
         db.commit()
@@ -242,39 +735,73 @@ class AnswerResource(Resource):
         }
 
 
+def _ensure_audio(db, slide: Slide) -> str:
+    """Return the finalized WAV for the slide's current script, synthesizing it if needed."""
+    wav_path = audio.artifact_path(slide)
+    if not audio.is_finalized(wav_path):
+        with admission.slot("tts", slide.lecture_id):
+            slide_to_speech(slide)
+    if slide.audio_path != audio.relative(wav_path):
+        slide.audio_path = audio.relative(wav_path)
+        db.add(slide)
+        db.commit()
+    return wav_path
+
+
+def _send_artifact(path: str, mimetype: str, etag: str):
+    """Serve an immutable artifact with Range/206 and ETag/304 handling."""
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=False,
+        conditional=True,
+        etag=etag,
+        max_age=0,
+    )
+    # artifacts are content-addressed, but the URL is not: revalidate via ETag
+    response.cache_control.no_cache = True
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
 @ns.route("/audio/<int:lecture_id>/<int:slide_num>")
 class AudioResource(Resource):
     def get(self, lecture_id, slide_num):
+        """Seekable slide audio: supports Range requests and conditional GETs."""
         db_gen = get_db()
         db = next(db_gen)
         try:
-            slide = (
-                db.query(Slide)
-                .filter_by(lecture_id=lecture_id, slide_number=slide_num)
-                .first()
-            )
+            slide = runs.current_slide(db, lecture_id, slide_num, request.args.get("run", type=int))
             if not slide:
                 api.abort(404, "slide not found")
+            if not slide.script:
+                api.abort(404, "no script available for this slide")
+
+            wav_path = _ensure_audio(db, slide)
+            return _send_artifact(wav_path, "audio/wav", audio.script_digest(slide.script))
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+
+@ns.route("/audio-index/<int:lecture_id>/<int:slide_num>")
+class AudioIndexResource(Resource):
+    def get(self, lecture_id, slide_num):
+        """Sentence -> byte offset / duration index for the slide's WAV, for seeking and resuming."""
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            slide = runs.current_slide(db, lecture_id, slide_num, request.args.get("run", type=int))
+            if not slide:
+                api.abort(404, "slide not found")
+            if not slide.script:
+                api.abort(404, "no script available for this slide")
 
-            audio_path = slide.audio_path
-            if not audio_path:
-                api.abort(404, "audio not available for this slide")
-
-            # resolve relative paths against backend root
-            if os.path.isabs(audio_path):
-                resolved_path = audio_path
-            else:
-                backend_root = os.path.dirname(os.path.dirname(__file__))
-                resolved_path = os.path.join(backend_root, audio_path)
-
-            if not os.path.isfile(resolved_path):
-                api.abort(404, "audio file not found")
-
-            mime_type, _ = mimetypes.guess_type(resolved_path)
-            return send_file(
-                resolved_path,
-                mimetype=mime_type or "application/octet-stream",
-                as_attachment=False,
+            wav_path = _ensure_audio(db, slide)
+            return _send_artifact(
+                audio.index_path(wav_path), "application/json", f"{audio.script_digest(slide.script)}-index"
             )
         finally:
             try:
@@ -283,6 +810,48 @@ class AudioResource(Resource):
                 pass
 
 
+# (timings file path, format) -> rendered body; files are immutable once finalized
+_timing_cache = LRUCache(maxsize=256)
+
+
+@ns.route("/timings/<int:lecture_id>/<int:slide_num>")
+class TimingsResource(Resource):
+    def get(self, lecture_id, slide_num):
+        """Sentence and word timings (in samples) for the slide audio; ``?format=bin`` for the packed form."""
+        fmt = request.args.get("format", "json")
+        if fmt not in ("json", "bin"):
+            api.abort(400, "format must be json or bin")
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            slide = runs.current_slide(db, lecture_id, slide_num, request.args.get("run", type=int))
+            if not slide:
+                api.abort(404, "slide not found")
+            if not slide.script:
+                api.abort(404, "no script available for this slide")
+
+            path = audio.timings_path(_ensure_audio(db, slide))
+            etag = f"{audio.script_digest(slide.script)}-timings-{fmt}"
+            if fmt == "bin":
+                return _send_artifact(path, "application/octet-stream", etag)
+
+            body = _timing_cache.get(path)
+            if body is None:
+                with open(path, "rb") as f:
+                    body = json.dumps(TimingTrack.from_bytes(f.read()).to_dict(), separators=(",", ":"))
+                _timing_cache.set(path, body)
+            response = make_response(body)
+            response.mimetype = "application/json"
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+
 @ns.route("/user-question/<int:lecture_id>/<int:slide_num>")
 class UserQuestionResource(Resource):
     @api.expect(question_request)
@@ -298,16 +867,26 @@ class UserQuestionResource(Resource):
         if not lecture:
             api.abort(404, "lecture not found")
 
-        slide = (
-            db.query(Slide)
-            .filter_by(lecture_id=lecture_id, slide_number=slide_num)
-            .first()
-        )
+        slide = runs.current_slide(db, lecture_id, slide_num, lecture.current_run)
         if not slide:
             api.abort(404, "slide not found")
 
-        result = user_ask_question(slide.script, question, lecture.lecture_hypothesis)
-        hypothesis = result["hypothesis"]
+        concepts = student_model.parse_concepts(slide.concepts)
+        student_model.deferred.flush(lecture_id)
+        with admission.slot("llm", lecture_id):
+            result = user_ask_question(
+                slide.script, question, student_model.render_for(db, lecture_id, concepts, run=lecture.current_run)
+            )
+        student_model.apply_deltas(
+            db,
+            lecture_id,
+            result["concept_updates"],
+            student_id=lecture.student_id,
+            source="question",
+            run=lecture.current_run,
+        )
+        db.flush()
+        hypothesis = student_model.render_for(db, lecture_id, concepts, run=lecture.current_run)
         lecture.lecture_hypothesis = hypothesis
         db.add(lecture)
         db.commit()
@@ -319,109 +898,161 @@ class UserQuestionResource(Resource):
         }
 
 
-import io
-import numpy as np
-import soundfile as sf
-from flask import Response
-import re
-
-
-def _split_into_sentences_for_streaming(text: str):
-    """Split text into sentences for streaming."""
-    text = text.strip()
-    if not text:
-        return []
-    sentences = re.split(r"(?<=[.!?])\s+", text)
-    return [s.strip() for s in sentences if s.strip()]
-
+@students_ns.route("")
+class StudentList(Resource):
+    @api.expect(student_request)
+    @api.response(201, "Created", student_response)
+    def post(self):
+        payload = request.get_json() or {}
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            student = Student(name=payload.get("name"))
+            db.add(student)
+            db.commit()
+            db.refresh(student)
+            return {"id": student.id, "name": student.name, "profile": ""}, 201
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
 
-import struct
+    @api.response(200, "OK", student_page)
+    def get(self):
+        """List students with their cross-lecture profiles, paginated by ``after`` (last id seen)."""
+        after = request.args.get("after", 0, type=int)
+        limit = _page_limit()
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            students = student_profile.list_students(db, after_id=after, limit=limit)
+            # summaries rebuilt during listing are persisted for the next reader
+            db.commit()
+            return {
+                "students": students,
+                "next": students[-1]["id"] if len(students) == limit else None,
+            }
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
 
 
-def create_wav_header(sample_rate=24000, bits_per_sample=16, channels=1):
-    """Create a WAV header for streaming (with unknown data size)."""
-    # For streaming, we set data size to max value since we don't know it yet
-    data_size = 0xFFFFFFFF - 36  # Maximum value for unknown size
+@students_ns.route("/<int:student_id>")
+class StudentResource(Resource):
+    @api.response(200, "OK", student_response)
+    def get(self, student_id: int):
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            student = db.get(Student, student_id)
+            if not student:
+                api.abort(404, "student not found")
+            profile = student_profile.get_summary(db, student_id)
+            db.commit()
+            return {"id": student.id, "name": student.name, "profile": profile}
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
 
-    header = bytearray()
 
-    # RIFF header
-    header.extend(b"RIFF")
-    header.extend(struct.pack("<I", data_size + 36))  # File size - 8
-    header.extend(b"WAVE")
+@students_ns.route("/by-concept")
+class StudentsByConcept(Resource):
+    def get(self):
+        """Cohort view: students with evidence on ``concept`` at or below ``max_mastery``."""
+        concept = request.args.get("concept")
+        if not concept:
+            api.abort(400, "concept required")
+        max_mastery = request.args.get("max_mastery", 1.0, type=float)
+        after = request.args.get("after", 0, type=int)
+        limit = _page_limit()
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            rows = student_profile.students_by_concept(
+                db, concept, max_mastery=max_mastery, after_id=after, limit=limit
+            )
+            return {
+                "students": rows,
+                "next": rows[-1]["cursor"] if len(rows) == limit else None,
+            }
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
 
-    # fmt subchunk
-    header.extend(b"fmt ")
-    header.extend(struct.pack("<I", 16))  # Subchunk size
-    header.extend(struct.pack("<H", 1))  # Audio format (1 = PCM)
-    header.extend(struct.pack("<H", channels))
-    header.extend(struct.pack("<I", sample_rate))
-    byte_rate = sample_rate * channels * bits_per_sample // 8
-    header.extend(struct.pack("<I", byte_rate))
-    block_align = channels * bits_per_sample // 8
-    header.extend(struct.pack("<H", block_align))
-    header.extend(struct.pack("<H", bits_per_sample))
 
-    # data subchunk
-    header.extend(b"data")
-    header.extend(struct.pack("<I", data_size))
+# artifacts being synthesized by a background thread of this worker
+_synthesizing = set()
+_synthesizing_lock = threading.Lock()
+
+
+def _synthesize_in_background(slide: Slide):
+    """Start writing the slide's audio artifact unless this worker already is."""
+    # a detached copy: the request's session is gone by the time the thread runs
+    snapshot = SimpleNamespace(lecture_id=slide.lecture_id, slide_number=slide.slide_number, script=slide.script)
+    wav_path = audio.artifact_path(snapshot)
+    with _synthesizing_lock:
+        if wav_path in _synthesizing:
+            return
+        _synthesizing.add(wav_path)
+    gate = admission.gates["tts"]
+    try:
+        ticket = gate.acquire(slide.lecture_id)
+    except admission.Overloaded:
+        with _synthesizing_lock:
+            _synthesizing.discard(wav_path)
+        raise
+
+    def run():
+        try:
+            slide_to_speech(snapshot)
+        except Exception:
+            logger.exception("synthesizing %s failed", wav_path)
+        finally:
+            gate.release(ticket)
+            with _synthesizing_lock:
+                _synthesizing.discard(wav_path)
 
-    return bytes(header)
+    threading.Thread(target=run, name="synthesize", daemon=True).start()
 
 
-def generate_audio_stream(script: str, voice: str = "af_heart"):
+def generate_audio_stream(wav_path: str):
     """
-    Generator that yields audio chunks as they're synthesized in real-time.
-
-    Args:
-        script: The text to synthesize
-        voice: The voice to use for synthesis
-
-    Yields:
-        Audio data chunks (WAV header first, then raw PCM data)
+    Stream an artifact while it is synthesized: a WAV header with an open-ended
+    length, then the PCM samples as they are appended to the partial file.
     """
-    from .ai_utils import pipeline
-
-    sentences = _split_into_sentences_for_streaming(script)
-    sample_rate = 24000
-
-    # Send WAV header first
-    yield create_wav_header(sample_rate=sample_rate, bits_per_sample=16, channels=1)
-
-    # Stream audio data as it's generated
-    for sentence in sentences:
-        generator = pipeline(sentence, voice=voice)
-
-        for i, (gs, ps, audio) in enumerate(generator):
-            audio_array = np.asarray(audio, dtype=np.float32)
-
-            # Convert float32 to int16 PCM
-            audio_int16 = (audio_array * 32767).astype(np.int16)
-
-            # Yield raw PCM bytes
-            yield audio_int16.tobytes()
+    yield audio.wav_header()
+    yield from audio.tail_pcm(wav_path)
 
 
 @ns.route("/audio-stream/<int:lecture_id>/<int:slide_num>")
 class AudioStreamResource(Resource):
     def get(self, lecture_id, slide_num):
-        """Stream audio as it's being generated in real-time"""
+        """Stream audio as it's being generated in real-time, or the finalized (seekable) file if one exists"""
         db_gen = get_db()
         db = next(db_gen)
         try:
-            slide = (
-                db.query(Slide)
-                .filter_by(lecture_id=lecture_id, slide_number=slide_num)
-                .first()
-            )
+            slide = runs.current_slide(db, lecture_id, slide_num, request.args.get("run", type=int))
             if not slide:
                 api.abort(404, "slide not found")
 
             if not slide.script:
                 api.abort(404, "no script available for this slide")
 
+            wav_path = audio.artifact_path(slide)
+            if audio.is_finalized(wav_path):
+                return _send_artifact(wav_path, "audio/wav", audio.script_digest(slide.script))
+
+            # synthesis writes the artifact once; this and any other stream follow the partial file
+            _synthesize_in_background(slide)
             return Response(
-                generate_audio_stream(slide.script),
+                generate_audio_stream(wav_path),
                 mimetype="audio/wav",
                 headers={
                     "Content-Disposition": "inline",
@@ -0,0 +1,344 @@
+"""
+Export and import lectures as a single archive.
+
+An archive is a tar file containing:
+
+- ``manifest.json``: format version and row counts;
+- ``lectures.parquet``, ``slides.parquet``, ``concepts.parquet`` and
+  ``concept_events.parquet``: one zstd-compressed Parquet table per model,
+  keyed by the lecture id at export time;
+- ``pdfs/<sha256>.pdf``: the uploaded decks, de-duplicated by content.
+
+Only the current run of each lecture is exported (it becomes run 0 of the
+imported lecture). Audio is referenced by path only. Rows are read from the
+database and written to Parquet in batches of lectures, so exporting
+thousands of lectures keeps memory bounded. ``pyarrow`` is imported lazily because only
+this module needs it. Both entry points (POST /lectures/import and
+``archive_lectures.py import``) then start page preprocessing of the
+imported decks with ``preprocess_imported``.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from . import preprocess
+from .models import ConceptEvent, ConceptMastery, Lecture, Slide
+
+ARCHIVE_VERSION = 1
+DEFAULT_BATCH_SIZE = 100
+PARQUET_COMPRESSION = "zstd"
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+def _pa():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:  # pragma: no cover - depends on the environment
+        raise RuntimeError("lecture archives require pyarrow (pip install pyarrow)") from exc
+    return pa, pq
+
+
+def _schemas():
+    pa, _ = _pa()
+    return {
+        "lectures": pa.schema(
+            [
+                ("lecture_id", pa.int64()),
+                ("title", pa.string()),
+                ("pdf_filename", pa.string()),
+                ("pdf_sha256", pa.string()),
+                ("script", pa.large_string()),
+                ("lecture_hypothesis", pa.string()),
+            ]
+        ),
+        "slides": pa.schema(
+            [
+                ("lecture_id", pa.int64()),
+                ("slide_number", pa.int32()),
+                ("script", pa.large_string()),
+                ("question", pa.string()),
+                ("concepts", pa.string()),
+                ("answer_key", pa.string()),
+                ("hypothesis", pa.string()),
+                ("hypothesis_use", pa.string()),
+                ("audio_path", pa.string()),
+            ]
+        ),
+        "concepts": pa.schema(
+            [
+                ("lecture_id", pa.int64()),
+                ("concept", pa.string()),
+                ("mastery", pa.float64()),
+                ("evidence", pa.int32()),
+            ]
+        ),
+        "concept_events": pa.schema(
+            [
+                ("lecture_id", pa.int64()),
+                ("concept", pa.string()),
+                ("delta", pa.float64()),
+                ("mastery", pa.float64()),
+                ("source", pa.string()),
+                ("created_at", pa.timestamp("s")),
+            ]
+        ),
+    }
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _current_run(db, model, lecture_ids):
+    """Rows of ``model`` belonging to the current run of the given lectures."""
+    return (
+        db.query(model)
+        .join(Lecture, Lecture.id == model.lecture_id)
+        .filter(model.lecture_id.in_(lecture_ids), model.run == Lecture.current_run)
+    )
+
+
+def _rows(records, columns):
+    return {column: [getattr(r, column) for r in records] for column in columns}
+
+
+def export_lectures(
+    db,
+    out_path: str,
+    lecture_ids: Optional[Iterable[int]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """
+    Write lectures (all of them, or ``lecture_ids``) to a tar archive at ``out_path``.
+
+    Args:
+        db: An open SQLAlchemy session.
+        out_path: Destination file.
+        lecture_ids: Restrict the export to these lectures.
+        batch_size: Lectures loaded per round trip; bounds memory use.
+
+    Returns:
+        The manifest that was written.
+    """
+    pa, pq = _pa()
+    schemas = _schemas()
+    wanted = sorted(set(lecture_ids)) if lecture_ids is not None else None
+    counts = {name: 0 for name in schemas}
+    workdir = tempfile.mkdtemp(prefix="lecture-export-")
+    writers = {
+        name: pq.ParquetWriter(os.path.join(workdir, f"{name}.parquet"), schema, compression=PARQUET_COMPRESSION)
+        for name, schema in schemas.items()
+    }
+    seen_pdfs = set()
+
+    def write(name, columns):
+        table = pa.Table.from_pydict(columns, schema=schemas[name])
+        if table.num_rows:
+            writers[name].write_table(table)
+            counts[name] += table.num_rows
+
+    try:
+        with tarfile.open(out_path, "w") as tar:
+            last_id = 0
+            while True:
+                query = db.query(Lecture).filter(Lecture.id > last_id)
+                if wanted is not None:
+                    query = query.filter(Lecture.id.in_(wanted))
+                lectures = query.order_by(Lecture.id.asc()).limit(batch_size).all()
+                if not lectures:
+                    break
+                last_id = lectures[-1].id
+                ids = [lecture.id for lecture in lectures]
+
+                hashes = []
+                for lecture in lectures:
+                    sha = None
+                    if lecture.pdf_path and os.path.isfile(lecture.pdf_path):
+                        sha = _sha256_file(lecture.pdf_path)
+                        if sha not in seen_pdfs:
+                            seen_pdfs.add(sha)
+                            tar.add(lecture.pdf_path, arcname=f"pdfs/{sha}.pdf")
+                    hashes.append(sha)
+
+                write(
+                    "lectures",
+                    {
+                        "lecture_id": ids,
+                        "title": [l.title for l in lectures],
+                        "pdf_filename": [l.pdf_filename for l in lectures],
+                        "pdf_sha256": hashes,
+                        "script": [l.script for l in lectures],
+                        "lecture_hypothesis": [l.lecture_hypothesis for l in lectures],
+                    },
+                )
+                slides = _current_run(db, Slide, ids).order_by(Slide.lecture_id, Slide.slide_number).all()
+                write("slides", _rows(slides, schemas["slides"].names))
+                concepts = _current_run(db, ConceptMastery, ids).all()
+                write("concepts", _rows(concepts, schemas["concepts"].names))
+                events = _current_run(db, ConceptEvent, ids).order_by(ConceptEvent.id).all()
+                write("concept_events", _rows(events, schemas["concept_events"].names))
+                # drop the batch from the identity map so memory stays flat
+                db.expunge_all()
+
+            for writer in writers.values():
+                writer.close()
+            writers = {}
+            for name in schemas:
+                tar.add(os.path.join(workdir, f"{name}.parquet"), arcname=f"{name}.parquet")
+
+            manifest = {
+                "version": ARCHIVE_VERSION,
+                "created_at": int(time.time()),
+                "counts": counts,
+                "pdfs": len(seen_pdfs),
+            }
+            manifest_path = os.path.join(workdir, "manifest.json")
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f)
+            tar.add(manifest_path, arcname="manifest.json")
+        return manifest
+    finally:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def import_lectures(db, archive_path: str, upload_folder: str, batch_size: int = 1000) -> Dict[int, int]:
+    """
+    Load an archive written by ``export_lectures`` into the database.
+
+    Lectures get new ids and are not linked to any student; PDFs are copied
+    into ``upload_folder`` under their content hash, after checking that the
+    hash named in the archive is the hash of the file. Everything is
+    inserted in one transaction, so a failed import leaves no lectures
+    behind.
+
+    Args:
+        db: An open SQLAlchemy session; committed once at the end, rolled
+            back if the import fails.
+        archive_path: The archive to read.
+        upload_folder: Where to store the extracted PDFs.
+        batch_size: Rows inserted per flush.
+
+    Returns:
+        Mapping from the lecture ids in the archive to the new ids.
+    """
+    _, pq = _pa()
+    workdir = tempfile.mkdtemp(prefix="lecture-import-")
+    try:
+        try:
+            with tarfile.open(archive_path, "r") as tar:
+                for member in tar.getmembers():
+                    # only regular files at the known, flat locations
+                    if not member.isfile() or ".." in member.name or member.name.startswith("/"):
+                        continue
+                    tar.extract(member, workdir)
+        except tarfile.TarError as exc:
+            raise ValueError(f"not a lecture archive: {exc}") from exc
+
+        with open(os.path.join(workdir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"unsupported archive version {manifest.get('version')}")
+
+        os.makedirs(upload_folder, exist_ok=True)
+        id_map = {}
+        stored = {}  # sha256 -> path in upload_folder, or None if the archive has no such PDF
+
+        def batches(name):
+            return pq.ParquetFile(os.path.join(workdir, f"{name}.parquet")).iter_batches(batch_size=batch_size)
+
+        def store_pdf(digest: str) -> Optional[str]:
+            # the digest names files in upload_folder and pages/, so it must be a bare hash of the content
+            if not _SHA256.fullmatch(digest):
+                raise ValueError(f"invalid pdf_sha256 {digest!r}")
+            if digest not in stored:
+                source = os.path.join(workdir, "pdfs", f"{digest}.pdf")
+                path = None
+                if os.path.isfile(source):
+                    if _sha256_file(source) != digest:
+                        raise ValueError(f"pdfs/{digest}.pdf does not match its hash")
+                    path = os.path.join(upload_folder, f"{digest}.pdf")
+                    if not os.path.exists(path):
+                        tmp = f"{path}.{os.getpid()}.tmp"
+                        shutil.copyfile(source, tmp)
+                        os.replace(tmp, path)
+                stored[digest] = path
+            return stored[digest]
+
+        try:
+            for batch in batches("lectures"):
+                for row in batch.to_pylist():
+                    pdf_path = store_pdf(row["pdf_sha256"]) if row["pdf_sha256"] else None
+                    lecture = Lecture(
+                        title=row["title"],
+                        pdf_filename=row["pdf_filename"],
+                        pdf_path=pdf_path,
+                        pdf_sha256=row["pdf_sha256"] if pdf_path else None,
+                        script=row["script"],
+                        lecture_hypothesis=row["lecture_hypothesis"],
+                    )
+                    db.add(lecture)
+                    db.flush()
+                    id_map[row["lecture_id"]] = lecture.id
+                    # only the id is needed from here on; keep the session small
+                    db.expunge(lecture)
+
+            # imported slides are new to this database: they change (for Last-Modified) now
+            imported_at = datetime.utcnow()
+            for name, model in (("slides", Slide), ("concepts", ConceptMastery), ("concept_events", ConceptEvent)):
+                for batch in batches(name):
+                    rows = batch.to_pylist()
+                    for row in rows:
+                        row["lecture_id"] = id_map[row["lecture_id"]]
+                        if model is Slide:
+                            row["updated_at"] = imported_at
+                    db.bulk_insert_mappings(model, rows)
+            db.commit()
+        except BaseException:
+            # copied PDFs are content-addressed and swept once unreferenced
+            db.rollback()
+            raise
+        return id_map
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def preprocess_imported(db, lecture_ids: Iterable[int]) -> List:
+    """
+    Start page preprocessing for imported lectures, once per document.
+
+    Returns:
+        The background threads started, for callers (the CLI) that must wait for them.
+    """
+    lecture_ids = list(lecture_ids)
+    for lecture in db.query(Lecture).filter(Lecture.id.in_(lecture_ids), Lecture.pdf_sha256.isnot(None)):
+        try:
+            lecture.page_count = preprocess.count_pages(lecture.pdf_path)
+        except ValueError:
+            lecture.preprocess_status = preprocess.FAILED
+            continue
+        if preprocess.is_complete(lecture.pdf_sha256):
+            lecture.preprocess_status = preprocess.DONE
+            lecture.pages_ready = lecture.page_count
+        else:
+            lecture.preprocess_status = preprocess.PENDING
+    db.commit()
+    started = {}
+    for lecture in db.query(Lecture).filter(Lecture.id.in_(lecture_ids), Lecture.preprocess_status == preprocess.PENDING):
+        if lecture.pdf_sha256 not in started:
+            started[lecture.pdf_sha256] = preprocess.submit(lecture.pdf_path, lecture.pdf_sha256, lecture.page_count)
+    return list(started.values())
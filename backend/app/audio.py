@@ -0,0 +1,308 @@
+"""
+Per-slide audio artifacts.
+
+Each synthesized slide is stored as a finalized 16-bit mono WAV named after
+the lecture, slide and a digest of the slide script, so a regenerated script
+never serves stale audio and the digest doubles as the HTTP ETag. Next to it
+is a sidecar index mapping every sentence to its byte offset, length and
+timing in the WAV, so clients can seek or resume without re-synthesizing,
+and a word/sentence timing track (see ``app.timing``) for captions.
+
+While a slide is synthesized its samples are appended to ``<wav>.partial``
+(``open_partial``), which the writer holds an exclusive ``flock`` on and
+renames into place when done (``publish``). ``tail_pcm`` lets any number of
+readers stream the partial file while it grows.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+SAMPLE_RATE = 24000
+BITS_PER_SAMPLE = 16
+CHANNELS = 1
+BYTES_PER_SAMPLE = BITS_PER_SAMPLE // 8 * CHANNELS
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(__file__))
+SPEECH_DIR = os.path.join(BACKEND_ROOT, "speech_outputs")
+
+# data size used in streamed headers, where the final length is unknown
+UNKNOWN_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+def to_pcm16(audio) -> np.ndarray:
+    """Convert float audio in ``[-1, 1]`` to int16 PCM, clipping out-of-range samples."""
+    samples = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+    return (samples * 32767).astype(np.int16)
+
+
+def wav_header(data_size: int = UNKNOWN_DATA_SIZE, sample_rate: int = SAMPLE_RATE, bits_per_sample: int = BITS_PER_SAMPLE, channels: int = CHANNELS) -> bytes:
+    """Build a 44 byte PCM WAV header for ``data_size`` bytes of samples."""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b"RIFF"
+        + struct.pack("<I", data_size + 36)
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+def _find_data(f, name: str) -> int:
+    f.seek(0)
+    if f.read(12)[8:12] != b"WAVE":
+        raise ValueError(f"{name} is not a WAV file")
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise ValueError(f"{name} has no data chunk")
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"data":
+            return f.tell()
+        f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def wav_data_offset(path: str) -> int:
+    """Byte offset of the first sample in a RIFF/WAV file (headers vary by writer)."""
+    with open(path, "rb") as f:
+        return _find_data(f, path)
+
+
+def script_digest(script: str) -> str:
+    return hashlib.sha1((script or "").encode()).hexdigest()[:16]
+
+
+def artifact_path(slide) -> str:
+    """Absolute path of the finalized WAV for ``slide``'s current script."""
+    return os.path.join(
+        SPEECH_DIR, f"{slide.lecture_id}-{slide.slide_number}-{script_digest(slide.script)}.wav"
+    )
+
+
+def partial_path(wav_path: str) -> str:
+    return wav_path + ".partial"
+
+
+def index_path(wav_path: str) -> str:
+    return os.path.splitext(wav_path)[0] + ".index.json"
+
+
+def timings_path(wav_path: str) -> str:
+    return os.path.splitext(wav_path)[0] + ".timings.bin"
+
+
+def resolve(path: str) -> str:
+    """Resolve a stored (backend-relative) audio path."""
+    return path if os.path.isabs(path) else os.path.join(BACKEND_ROOT, path)
+
+
+def relative(path: str) -> str:
+    """Path to store in the database: relative to the backend root."""
+    return os.path.relpath(path, BACKEND_ROOT)
+
+
+def is_finalized(wav_path: str) -> bool:
+    return all(os.path.isfile(p) for p in (wav_path, index_path(wav_path), timings_path(wav_path)))
+
+
+class SentenceIndex:
+    """Accumulates sentence boundaries (in samples) while audio is synthesized."""
+
+    def __init__(self):
+        self.sentences = []
+        self.total_samples = 0
+
+    def add(self, sentence: int, text: str, samples: int):
+        """Record ``samples`` more audio for ``sentence``; consecutive chunks of a sentence merge."""
+        if self.sentences and self.sentences[-1]["sentence"] == sentence:
+            entry = self.sentences[-1]
+            entry["samples"] += samples
+            if text:
+                entry["text"] = f"{entry['text']} {text}".strip()
+        else:
+            self.sentences.append(
+                {"sentence": sentence, "text": text or "", "start_sample": self.total_samples, "samples": samples}
+            )
+        self.total_samples += samples
+
+    def to_dict(self, data_offset: int) -> dict:
+        return {
+            "sample_rate": SAMPLE_RATE,
+            "bytes_per_sample": BYTES_PER_SAMPLE,
+            "data_offset": data_offset,
+            "data_bytes": self.total_samples * BYTES_PER_SAMPLE,
+            "duration": self.total_samples / SAMPLE_RATE,
+            "sentences": [
+                {
+                    "sentence": s["sentence"],
+                    "text": s["text"],
+                    "offset": data_offset + s["start_sample"] * BYTES_PER_SAMPLE,
+                    "length": s["samples"] * BYTES_PER_SAMPLE,
+                    "start": s["start_sample"] / SAMPLE_RATE,
+                    "duration": s["samples"] / SAMPLE_RATE,
+                }
+                for s in self.sentences
+            ],
+        }
+
+
+def temp_path(path: str) -> str:
+    """A sibling temporary name unique to this process and thread, for write-then-rename."""
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def write_bytes_atomic(path: str, payload: bytes):
+    tmp = temp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def write_json_atomic(path: str, payload: dict):
+    tmp = temp_path(path)
+    with open(tmp, "w") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def open_partial(wav_path: str):
+    """
+    Start writing ``wav_path``: open its partial file, empty, with an exclusive lock.
+
+    Waits while another thread or worker is writing the same artifact.
+
+    Returns:
+        An unbuffered binary file (every write is visible to readers right
+        away), or None if the artifact was finalized in the meantime.
+    """
+    partial = partial_path(wav_path)
+    while True:
+        if is_finalized(wav_path):
+            return None
+        fd = os.open(partial, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(partial).st_ino
+            except FileNotFoundError:
+                current = None
+        except BaseException:
+            os.close(fd)
+            raise
+        if current != os.fstat(fd).st_ino:
+            # the previous writer published the file we opened; start over
+            os.close(fd)
+            continue
+        os.ftruncate(fd, 0)
+        return os.fdopen(fd, "w+b", buffering=0)
+
+
+def publish(f, wav_path: str):
+    """Rename a finished partial file into place, then release it."""
+    try:
+        os.replace(partial_path(wav_path), wav_path)
+    finally:
+        f.close()
+
+
+def abandon(f, wav_path: str):
+    """Drop a partial file whose synthesis failed."""
+    try:
+        os.unlink(partial_path(wav_path))
+    except FileNotFoundError:
+        pass
+    finally:
+        f.close()
+
+
+def _writer_active(f, path: str) -> bool:
+    if fcntl is None:
+        return os.path.exists(path)
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    return False
+
+
+def is_being_written(partial: str) -> bool:
+    """Whether a writer currently holds the lock on the partial file ``partial``."""
+    try:
+        with open(partial, "rb") as f:
+            return _writer_active(f, partial)
+    except FileNotFoundError:
+        return False
+
+
+def tail_pcm(wav_path: str, wait: float = 30.0, poll: float = 0.05, block_size: int = 1 << 16):
+    """
+    Yield the PCM samples of ``wav_path`` while it is being synthesized.
+
+    Follows the partial file until its writer publishes or abandons it (or
+    reads the finalized file if it is already there). Waits up to ``wait``
+    seconds for a writer to start. Yields whole samples only.
+    """
+    partial = partial_path(wav_path)
+    deadline = time.monotonic() + wait
+    f = None
+    while f is None:
+        for path in (partial, wav_path):
+            try:
+                f = open(path, "rb")
+                break
+            except FileNotFoundError:
+                pass
+        if f is None:
+            if time.monotonic() > deadline:
+                return
+            time.sleep(poll)
+
+    with f:
+        offset = None
+        while offset is None:
+            try:
+                offset = _find_data(f, wav_path)
+            except ValueError:
+                # header not written yet
+                if not _writer_active(f, partial) and time.monotonic() > deadline:
+                    return
+                time.sleep(poll)
+        f.seek(offset)
+        carry = b""
+        started = False
+        while True:
+            block = f.read(block_size)
+            if block:
+                started = True
+                data = carry + block
+                cut = len(data) - len(data) % BYTES_PER_SAMPLE
+                carry = data[cut:]
+                if cut:
+                    yield data[:cut]
+                continue
+            if not _writer_active(f, partial):
+                # the writer may not have taken the lock yet
+                if not started and os.path.exists(partial) and time.monotonic() < deadline:
+                    time.sleep(poll)
+                    continue
+                rest = carry + f.read()
+                rest = rest[: len(rest) - len(rest) % BYTES_PER_SAMPLE]
+                if rest:
+                    yield rest
+                return
+            time.sleep(poll)
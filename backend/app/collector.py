@@ -0,0 +1,469 @@
+"""
+Background garbage collection.
+
+Purges slides and student model rows of superseded lecture runs (see
+``app.runs``) in small batches, so no single statement holds locks on a
+large part of a table, and at most ``GC_MAX_BATCHES`` batches per table and
+pass, so a pass never holds the collector lock and its connection for long
+after a burst of resets; the next pass picks up the rest. A run is only collected ``RUN_RETENTION`` seconds
+after the lecture moved past it, so clients can still read it for a while.
+
+After the database, each pass sweeps storage:
+
+- ``uploads``: PDFs no lecture points at;
+- ``pages``: per-page artifacts (``app.preprocess``) of documents no lecture has;
+- ``speech``: audio artifacts (WAV and sidecars) of scripts no slide has any
+  more, plus abandoned ``.partial`` and ``.tmp`` files;
+- ``temp``: per-slide PDFs left in the temp directory when their unlink failed;
+- ``remote``: slide files uploaded to OpenAI whose delete failed.
+
+Local files are only removed ``STORAGE_RETENTION`` seconds after their last
+modification (temporary ones and remote files after ``TEMP_RETENTION``). To
+keep the I/O of a pass small, each location is scanned ``GC_BATCH_SIZE``
+entries at a time, resuming where the previous pass stopped (page files
+count against the same budget), and deletes are paced to ``GC_DELETE_RATE``
+per second. Files and bytes reclaimed are counted
+under ``collector.<location>.*`` in /metrics.
+
+One collector runs per worker; an advisory lock makes them take turns
+rather than duplicate work.
+"""
+
+import logging
+import os
+import re
+import stat
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from . import audio
+from .metrics import metrics
+from .models import ConceptEvent, ConceptMastery, Lecture, Slide
+from .singleflight import LockTimeout, advisory_lock
+from .utils import SLIDE_TEMP_PREFIX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_BATCHES = 20
+DEFAULT_STORAGE_RETENTION = 24 * 3600
+DEFAULT_TEMP_RETENTION = 3600
+DEFAULT_DELETE_RATE = 20.0
+LOCK_NAME = "deepest_learning:collector"
+
+# <lecture>-<slide>-<script digest>.<suffix>, see audio.artifact_path
+_ARTIFACT_NAME = re.compile(r"^(\d+)-(\d+)-([0-9a-f]+)\.")
+
+# location -> (directory, open os.scandir iterator): kept between passes, so each
+# pass reads on from where the previous one stopped instead of listing the directory
+_cursors = {}
+# page directories found unreferenced and stale whose files are still being removed
+_draining_pages = set()
+# files that mark a page directory complete; removed first (see app.preprocess, app.slide_images)
+_PAGE_MARKERS = ("manifest.json", "images.json")
+
+
+def purge_stale_runs(db, retention: float, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int = None) -> dict:
+    """
+    Delete rows of runs older than each lecture's current run.
+
+    Args:
+        db: An open SQLAlchemy session; committed after every batch.
+        retention: Seconds a superseded run is kept after the lecture moved on.
+        batch_size: Rows deleted per statement.
+        max_batches: Stop after this many batches per table (None: until done).
+
+    Returns:
+        Rows deleted per table.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=retention)
+    deleted = {}
+    for model in (Slide, ConceptMastery, ConceptEvent):
+        total = batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = [
+                row_id
+                for (row_id,) in db.query(model.id)
+                .join(Lecture, Lecture.id == model.lecture_id)
+                .filter(model.run < Lecture.current_run, Lecture.run_started_at < cutoff)
+                .limit(batch_size)
+                .all()
+            ]
+            if not ids:
+                break
+            db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            total += len(ids)
+            batches += 1
+        deleted[model.__tablename__] = total
+        metrics.incr(f"collector.{model.__tablename__}.deleted", total)
+    return deleted
+
+
+class Pacer:
+    """Spaces out deletes to at most ``rate`` per second (unlimited if falsy)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def _next_batch(location: str, directory: str, batch_size: int, prefix: str = "") -> list:
+    """
+    Names among the next ``batch_size`` entries of ``directory`` that start with ``prefix``.
+
+    A pass reads at most ``batch_size`` entries however large the directory
+    is: the location's ``os.scandir`` iterator stays open between passes and
+    the next pass continues it. Once it is exhausted, the following pass
+    starts over, picking up files created meanwhile.
+    """
+    cursor = _cursors.get(location)
+    if cursor is None or cursor[0] != directory:
+        if cursor is not None:
+            cursor[1].close()
+        try:
+            cursor = _cursors[location] = (directory, os.scandir(directory))
+        except FileNotFoundError:
+            return []
+    names = []
+    for _ in range(batch_size):
+        try:
+            entry = next(cursor[1], None)
+        except OSError:
+            entry = None
+        if entry is None:
+            cursor[1].close()
+            del _cursors[location]
+            break
+        if entry.name.startswith(prefix):
+            names.append(entry.name)
+    return names
+
+
+def _age(path: str, now: float):
+    """Seconds since ``path`` was modified, or None if it is gone or not a file."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return now - st.st_mtime if stat.S_ISREG(st.st_mode) else None
+
+
+def _stem(path: str) -> str:
+    """``path`` without any extensions, so an artifact and its sidecars compare equal."""
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), os.path.basename(path).split(".", 1)[0])
+
+
+def _remove(location: str, path: str, stats: dict, pacer: Pacer):
+    pacer.wait()
+    try:
+        size = os.path.getsize(path)
+        os.unlink(path)
+    except FileNotFoundError:
+        return
+    except OSError:
+        logger.warning("could not remove %s", path, exc_info=True)
+        metrics.incr(f"collector.{location}.errors")
+        return
+    stats["files"] += 1
+    stats["bytes"] += size
+
+
+def sweep_uploads(db, folder: str, retention: float, batch_size: int, pacer: Pacer) -> dict:
+    """Remove uploaded PDFs that no lecture references."""
+    stats = {"files": 0, "bytes": 0}
+    now = time.time()
+    names = []
+    for name in _next_batch("uploads", folder, batch_size):
+        age = _age(os.path.join(folder, name), now)
+        # None: gone, or not a file (the pages directory)
+        if age is not None and age > retention:
+            names.append(name)
+    if not names:
+        return stats
+    referenced = {
+        os.path.abspath(path)
+        for (path,) in db.query(Lecture.pdf_path)
+        .filter(or_(*[Lecture.pdf_path.endswith(n, autoescape=True) for n in names]))
+        .all()
+    }
+    for name in names:
+        path = os.path.join(folder, name)
+        if os.path.abspath(path) not in referenced:
+            _remove("uploads", path, stats, pacer)
+    return stats
+
+
+def sweep_pages(db, folder: str, retention: float, batch_size: int, pacer: Pacer) -> dict:
+    """
+    Remove the per-page artifacts of documents that no lecture references.
+
+    Files count against ``batch_size`` like directory entries do, so a large
+    deck is removed over several passes; directories a pass could not finish
+    are continued first in the next one.
+    """
+    stats = {"files": 0, "bytes": 0}
+    now = time.time()
+    root = os.path.join(folder, "pages")
+    digests = sorted(_draining_pages)
+    budget = batch_size - len(digests)
+    for name in _next_batch("pages", root, max(0, budget)):
+        if name in _draining_pages:
+            continue
+        try:
+            if now - os.stat(os.path.join(root, name)).st_mtime > retention:
+                digests.append(name)
+        except FileNotFoundError:
+            continue
+    if not digests:
+        return stats
+    referenced = {d for (d,) in db.query(Lecture.pdf_sha256).filter(Lecture.pdf_sha256.in_(digests)).distinct()}
+    budget = batch_size
+    for digest in digests:
+        # uploaded again meanwhile: keep what is left, preprocessing fills in the rest
+        if digest in referenced:
+            _draining_pages.discard(digest)
+            continue
+        _draining_pages.add(digest)
+        if budget <= 0:
+            continue
+        directory = os.path.join(root, digest)
+        # the markers go first, so a half-removed directory never looks complete
+        names = [n for n in _PAGE_MARKERS if os.path.exists(os.path.join(directory, n))][:budget]
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if len(names) >= budget:
+                        break
+                    if entry.name not in _PAGE_MARKERS:
+                        names.append(entry.name)
+        except FileNotFoundError:
+            _draining_pages.discard(digest)
+            continue
+        budget -= len(names)
+        for name in names:
+            _remove("pages", os.path.join(directory, name), stats, pacer)
+        if budget > 0:
+            # everything fit in this pass
+            try:
+                os.rmdir(directory)
+                _draining_pages.discard(digest)
+            except FileNotFoundError:
+                _draining_pages.discard(digest)
+            except OSError:
+                pass
+    return stats
+
+
+def _live_artifacts(db, names: list) -> tuple:
+    """Artifact keys and stored audio paths of current slides, for the lectures ``names`` belong to."""
+    lecture_ids = {int(m.group(1)) for m in map(_ARTIFACT_NAME.match, names) if m}
+    live, paths = set(), set()
+    query = db.query(Slide.lecture_id, Slide.slide_number, Slide.script, Slide.audio_path)
+    conditions = [Slide.audio_path.endswith(n, autoescape=True) for n in names if not _ARTIFACT_NAME.match(n)]
+    if lecture_ids:
+        conditions.append(Slide.lecture_id.in_(lecture_ids))
+    if not conditions:
+        return live, paths
+    for lecture_id, slide_number, script, audio_path in query.filter(or_(*conditions)):
+        if script:
+            live.add((lecture_id, slide_number, audio.script_digest(script)))
+        if audio_path:
+            paths.add(_stem(audio.resolve(audio_path)))
+    return live, paths
+
+
+def sweep_speech(db, retention: float, temp_retention: float, batch_size: int, pacer: Pacer) -> dict:
+    """Remove audio artifacts of scripts no slide has, and abandoned partial and temporary files."""
+    stats = {"files": 0, "bytes": 0}
+    now = time.time()
+    candidates = []
+    for name in _next_batch("speech", audio.SPEECH_DIR, batch_size):
+        path = os.path.join(audio.SPEECH_DIR, name)
+        age = _age(path, now)
+        if age is None:
+            continue
+        if name.endswith(".tmp") or name.endswith(".partial"):
+            if age > temp_retention and not (name.endswith(".partial") and audio.is_being_written(path)):
+                _remove("speech", path, stats, pacer)
+        elif age > retention:
+            candidates.append(name)
+    if not candidates:
+        return stats
+    live, paths = _live_artifacts(db, candidates)
+    for name in candidates:
+        path = os.path.join(audio.SPEECH_DIR, name)
+        match = _ARTIFACT_NAME.match(name)
+        if match and (int(match.group(1)), int(match.group(2)), match.group(3)) in live:
+            continue
+        # a stored audio path also keeps the sidecars next to it
+        if _stem(path) in paths:
+            continue
+        _remove("speech", path, stats, pacer)
+    return stats
+
+
+def sweep_temp(retention: float, batch_size: int, pacer: Pacer) -> dict:
+    """Remove per-slide temporary PDFs that outlived the step that created them."""
+    stats = {"files": 0, "bytes": 0}
+    now = time.time()
+    directory = tempfile.gettempdir()
+    for name in _next_batch("temp", directory, batch_size, prefix=SLIDE_TEMP_PREFIX):
+        path = os.path.join(directory, name)
+        age = _age(path, now)
+        if age is not None and age > retention:
+            _remove("temp", path, stats, pacer)
+    return stats
+
+
+def sweep_remote(retention: float, batch_size: int, pacer: Pacer) -> dict:
+    """
+    Delete slide files left on the OpenAI account by a failed delete.
+
+    Only files named like the per-slide temporary PDFs and older than
+    ``retention`` are touched; a step deletes its file as soon as the call
+    returns, so anything older is an orphan. Each pass examines one page of
+    ``batch_size`` files after the last one the previous pass saw, and starts
+    over after the last page.
+    """
+    from .ai_utils import get_client
+
+    stats = {"files": 0, "bytes": 0}
+    cutoff = time.time() - retention
+    client = get_client()
+    after = _cursors.get("remote")
+    page = client.files.list(purpose="assistants", limit=batch_size, **({"after": after} if after else {}))
+    files = list(page.data)
+    if files and page.has_more:
+        _cursors["remote"] = files[-1].id
+    else:
+        _cursors.pop("remote", None)
+    for remote in files:
+        if not (remote.filename or "").startswith(SLIDE_TEMP_PREFIX) or remote.created_at > cutoff:
+            continue
+        pacer.wait()
+        try:
+            client.files.delete(remote.id)
+        except Exception:
+            logger.warning("could not delete remote file %s", remote.id, exc_info=True)
+            metrics.incr("collector.remote.errors")
+            continue
+        stats["files"] += 1
+        stats["bytes"] += remote.bytes or 0
+    return stats
+
+
+def sweep_storage(db, config) -> dict:
+    """
+    One incremental sweep of every storage location.
+
+    Returns:
+        Files and bytes reclaimed per location.
+    """
+    retention = config.get("STORAGE_RETENTION", DEFAULT_STORAGE_RETENTION)
+    temp_retention = config.get("TEMP_RETENTION", DEFAULT_TEMP_RETENTION)
+    batch_size = config.get("GC_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    pacer = Pacer(config.get("GC_DELETE_RATE", DEFAULT_DELETE_RATE))
+
+    sweeps = {
+        "uploads": lambda: sweep_uploads(db, config.get("UPLOAD_FOLDER", "uploads"), retention, batch_size, pacer),
+        "pages": lambda: sweep_pages(db, config.get("UPLOAD_FOLDER", "uploads"), retention, batch_size, pacer),
+        "speech": lambda: sweep_speech(db, retention, temp_retention, batch_size, pacer),
+        "temp": lambda: sweep_temp(temp_retention, batch_size, pacer),
+    }
+    if config.get("GC_REMOTE_FILES", True) and os.getenv("OPENAI_API_KEY"):
+        sweeps["remote"] = lambda: sweep_remote(temp_retention, batch_size, pacer)
+
+    reclaimed = {}
+    for location, sweep in sweeps.items():
+        try:
+            stats = sweep()
+        except Exception:
+            logger.exception("sweeping %s failed", location)
+            metrics.incr(f"collector.{location}.errors")
+            continue
+        reclaimed[location] = stats
+        metrics.incr(f"collector.{location}.files_reclaimed", stats["files"])
+        metrics.incr(f"collector.{location}.bytes_reclaimed", stats["bytes"])
+        if stats["files"]:
+            logger.info("collector reclaimed %d files (%d bytes) from %s", stats["files"], stats["bytes"], location)
+    return reclaimed
+
+
+def collect_once(config) -> dict:
+    """Run one collection pass unless another worker is already running one."""
+    from .db import get_db
+
+    db_gen = get_db()
+    db = next(db_gen)
+    try:
+        try:
+            with advisory_lock(db.get_bind(), LOCK_NAME, 0):
+                started = time.perf_counter()
+                result = purge_stale_runs(
+                    db,
+                    retention=config.get("RUN_RETENTION", 3600),
+                    batch_size=config.get("GC_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+                    max_batches=config.get("GC_MAX_BATCHES", DEFAULT_MAX_BATCHES),
+                )
+                result["storage"] = sweep_storage(db, config)
+                metrics.observe("collector.pass", time.perf_counter() - started)
+                return result
+        except LockTimeout:
+            metrics.incr("collector.skipped")
+            return {}
+    finally:
+        try:
+            next(db_gen)
+        except StopIteration:
+            pass
+
+
+_running = {"config": None, "pid": None}
+_start_lock = threading.Lock()
+
+
+def start(app):
+    """
+    Run the collector in every process serving ``app`` (``GC_INTERVAL`` seconds between passes).
+
+    The thread is started on each process's first request rather than here:
+    with gunicorn's ``preload_app`` this runs in the master, whose threads do
+    not survive the fork into the workers.
+    """
+    _running["config"] = dict(app.config)
+    app.before_request(ensure_running)
+
+
+def ensure_running():
+    """Start this process's collector thread unless it is running already."""
+    if _running["pid"] == os.getpid() or _running["config"] is None:
+        return
+    with _start_lock:
+        if _running["pid"] == os.getpid():
+            return
+        _running["pid"] = os.getpid()
+        threading.Thread(target=_loop, args=(_running["config"],), name="collector", daemon=True).start()
+
+
+def _loop(config: dict):
+    interval = config.get("GC_INTERVAL", 300)
+    while True:
+        time.sleep(interval)
+        try:
+            collect_once(config)
+        except Exception:
+            logger.exception("garbage collection pass failed")
@@ -12,9 +12,88 @@ class Config:
     DB_PORT = os.environ.get("DATABASE_PORT", "3306")
     DB_NAME = os.environ.get("DATABASE_NAME", "deepest_learning")
 
-    SQLALCHEMY_DATABASE_URI = (
-        f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    )
+    # DB_BACKEND=sqlite runs on an embedded SQLite file in WAL mode (single-node
+    # deployments; safe with several gunicorn workers on one host). DATABASE_URL
+    # overrides both.
+    DB_BACKEND = os.environ.get("DB_BACKEND", "mysql")
+    SQLITE_PATH = os.environ.get("SQLITE_PATH", "instance/deepest_learning.db")
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "30"))
+
+    if os.environ.get("DATABASE_URL"):
+        SQLALCHEMY_DATABASE_URI = os.environ["DATABASE_URL"]
+    elif DB_BACKEND == "sqlite":
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.abspath(SQLITE_PATH)}"
+    else:
+        SQLALCHEMY_DATABASE_URI = (
+            f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        )
 
     # we won't use flask-sqlalchemy extension; use SQLAlchemy directly
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "./uploads")
+
+    # Startup. MODEL_LOADING is "lazy" (load the TTS model on first use),
+    # "eager" (load it in create_app) or "preload" (eager, and gunicorn loads
+    # the app in the master before forking so workers share the weights).
+    # DB_STARTUP is "blocking" or "background" (connect and create tables in a
+    # thread; /readyz reports 503 until it is done).
+    MODEL_LOADING = os.environ.get("MODEL_LOADING", "lazy")
+    DB_STARTUP = os.environ.get("DB_STARTUP", "blocking")
+    DB_CONNECT_RETRIES = int(os.environ.get("DB_CONNECT_RETRIES", "12"))
+    DB_CONNECT_DELAY = float(os.environ.get("DB_CONNECT_DELAY", "3"))
+
+    # seconds a /step request waits for another worker generating the same slide
+    STEP_LOCK_TIMEOUT = float(os.environ.get("STEP_LOCK_TIMEOUT", "120"))
+
+    # Background collection of superseded lecture runs and unreferenced storage (app/collector.py).
+    # GC_INTERVAL=0 disables the collector thread.
+    GC_INTERVAL = float(os.environ.get("GC_INTERVAL", "300"))
+    RUN_RETENTION = float(os.environ.get("RUN_RETENTION", "3600"))
+    GC_BATCH_SIZE = int(os.environ.get("GC_BATCH_SIZE", "500"))
+    # batches of superseded run rows deleted per table in one pass
+    GC_MAX_BATCHES = int(os.environ.get("GC_MAX_BATCHES", "20"))
+    # storage sweep: unreferenced uploads/audio are kept STORAGE_RETENTION seconds,
+    # partial/temporary and remote files TEMP_RETENTION; deletes are paced to GC_DELETE_RATE/s
+    STORAGE_RETENTION = float(os.environ.get("STORAGE_RETENTION", str(24 * 3600)))
+    TEMP_RETENTION = float(os.environ.get("TEMP_RETENTION", "3600"))
+    GC_DELETE_RATE = float(os.environ.get("GC_DELETE_RATE", "20"))
+    GC_REMOTE_FILES = os.environ.get("GC_REMOTE_FILES", "1") not in ("0", "false", "no")
+
+    # upload-time page splitting (app/preprocess.py): pool size (0: in-process,
+    # unset: one per CPU) and minimum pages per pool task
+    PREPROCESS_WORKERS = int(os.environ["PREPROCESS_WORKERS"]) if os.environ.get("PREPROCESS_WORKERS") else None
+    PREPROCESS_CHUNK_PAGES = int(os.environ.get("PREPROCESS_CHUNK_PAGES", "32"))
+
+    # pre-rendered page images (app/slide_images.py; needs pypdfium2 and Pillow):
+    # comma-separated widths in pixels, webp/jpeg/png and encoder quality
+    SLIDE_IMAGES = os.environ.get("SLIDE_IMAGES", "1") not in ("0", "false", "False")
+    SLIDE_IMAGE_WIDTHS = os.environ.get("SLIDE_IMAGE_WIDTHS", "240,960,1600")
+    SLIDE_IMAGE_FORMAT = os.environ.get("SLIDE_IMAGE_FORMAT", "webp")
+    SLIDE_IMAGE_QUALITY = int(os.environ.get("SLIDE_IMAGE_QUALITY", "80"))
+
+    # commands of one /lectures/session WebSocket that may run concurrently
+    WS_SESSION_CONCURRENCY = int(os.environ.get("WS_SESSION_CONCURRENCY", "4"))
+
+    # admission control (app/admission.py): per-worker slots for LLM calls and speech
+    # synthesis, per-lecture caps, and the queue delay after which requests get a 503
+    ADMISSION = os.environ.get("ADMISSION", "1") not in ("0", "false", "False")
+    ADMISSION_LLM_CONCURRENCY = int(os.environ.get("ADMISSION_LLM_CONCURRENCY", "3"))
+    ADMISSION_LLM_PER_LECTURE = int(os.environ.get("ADMISSION_LLM_PER_LECTURE", "2"))
+    ADMISSION_LLM_QUEUE_TARGET = float(os.environ.get("ADMISSION_LLM_QUEUE_TARGET", "10"))
+    ADMISSION_TTS_CONCURRENCY = int(os.environ.get("ADMISSION_TTS_CONCURRENCY", "2"))
+    ADMISSION_TTS_PER_LECTURE = int(os.environ.get("ADMISSION_TTS_PER_LECTURE", "1"))
+    ADMISSION_TTS_QUEUE_TARGET = float(os.environ.get("ADMISSION_TTS_QUEUE_TARGET", "30"))
+    ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "32"))
+
+    # request journal (app/journal.py) for bench/replay.py; unset disables it
+    JOURNAL_DIR = os.environ.get("JOURNAL_DIR", "")
+    JOURNAL_MAX_BYTES = int(os.environ.get("JOURNAL_MAX_BYTES", str(64 * 2**20)))
+    JOURNAL_BACKUPS = int(os.environ.get("JOURNAL_BACKUPS", "5"))
+    JOURNAL_FLUSH_INTERVAL = float(os.environ.get("JOURNAL_FLUSH_INTERVAL", "1"))
+    JOURNAL_MAX_PENDING = int(os.environ.get("JOURNAL_MAX_PENDING", "10000"))
+
+    # mark closed-form answers against the slide's answer key instead of calling the LLM
+    LOCAL_GRADING = os.environ.get("LOCAL_GRADING", "1") not in ("0", "false", "False")
+
+    # per call type ("step", "answer", "question") overrides of app.routing.DEFAULT_POLICIES, as a
+    # JSON object; parsed in create_app, so a typo fails the app, not every import of this module
+    MODEL_POLICIES = os.environ.get("MODEL_POLICIES", "")
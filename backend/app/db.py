@@ -1,21 +1,88 @@
+import logging
 import os
+import threading
 import time
-from sqlalchemy import create_engine as sa_create_engine
+from sqlalchemy import create_engine as sa_create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import OperationalError
 
+logger = logging.getLogger(__name__)
+
 # remove any eager engine creation at import time and make init lazy
 
 engine = None
 SessionLocal = None
 Base = declarative_base()
 
+# serializes initialization, so a request arriving while a background
+# init_db is still retrying waits for it instead of starting its own
+_init_lock = threading.Lock()
+
+DEFAULT_CONNECT_RETRIES = 12
+DEFAULT_CONNECT_DELAY = 3
+DEFAULT_SQLITE_BUSY_TIMEOUT = 30
+
+# Applied to every SQLite connection. WAL lets readers run alongside the one
+# writer (also across gunicorn workers), NORMAL sync is durable against process
+# crashes in WAL mode, and the WAL file is truncated after checkpoints.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+    "cache_size": -16000,  # KiB
+    "mmap_size": 128 * 1024 * 1024,
+    "journal_size_limit": 64 * 1024 * 1024,
+}
+
+
+def _engine_options(database_url, busy_timeout=DEFAULT_SQLITE_BUSY_TIMEOUT):
+    """
+    ``create_engine`` arguments for ``database_url``.
+
+    SQLite connections may be used from other threads than the one that
+    opened them (the pool hands them out), and wait up to ``busy_timeout``
+    seconds for the write lock instead of failing. The driver's default
+    transaction handling is kept on purpose: it only issues BEGIN before the
+    first write, so a request that reads, waits on the LLM and then writes
+    never holds a read snapshot that another worker's commit would invalidate.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return {"pool_pre_ping": True}
+    if url.database and url.database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    return {"connect_args": {"check_same_thread": False, "timeout": busy_timeout}}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
 
-def _create_engine_with_retry(database_url, max_retries=12, initial_delay=3):
+
+def create_engine(database_url, busy_timeout=DEFAULT_SQLITE_BUSY_TIMEOUT):
+    """An engine for ``database_url``, with the SQLite pragmas above where they apply."""
+    eng = sa_create_engine(database_url, **_engine_options(database_url, busy_timeout))
+    if eng.dialect.name == "sqlite" and eng.url.database not in (None, "", ":memory:"):
+        event.listen(eng, "connect", _apply_sqlite_pragmas)
+    return eng
+
+
+def _create_engine_with_retry(
+    database_url,
+    max_retries=DEFAULT_CONNECT_RETRIES,
+    initial_delay=DEFAULT_CONNECT_DELAY,
+    busy_timeout=DEFAULT_SQLITE_BUSY_TIMEOUT,
+):
     delay = initial_delay
     for attempt in range(1, max_retries + 1):
         try:
-            eng = sa_create_engine(database_url, pool_pre_ping=True)
+            eng = create_engine(database_url, busy_timeout)
             # quick connection test
             with eng.connect():
                 pass
@@ -27,16 +94,152 @@ def _create_engine_with_retry(database_url, max_retries=12, initial_delay=3):
             delay = min(delay * 2, 30)
 
 
-def init_db(app=None):
+def _column_ddl(column, dialect) -> str:
+    """``ADD COLUMN`` clause for ``column``; NOT NULL only where existing rows get a default."""
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if not column.nullable and isinstance(default, (int, float)):
+        ddl += f" NOT NULL DEFAULT {default!r}"
+    return ddl
+
+
+def upgrade_schema(eng) -> list:
+    """
+    Bring tables created by an older release up to the models.
+
+    ``create_all`` only creates missing tables, so columns and indexes added
+    to existing ones (``lectures``, ``slides``, ...) are added here with
+    ``ALTER TABLE ... ADD COLUMN`` / ``CREATE INDEX``. It is idempotent: it
+    runs on every start, and a second worker finds nothing left to do.
+    Columns that are NOT NULL in the model are added NOT NULL only when they
+    have a scalar default for the existing rows; foreign key constraints are
+    not added to existing tables.
+
+    Unique constraints whose columns changed (``concept_mastery`` went from
+    one row per concept to one per run and concept) are replaced, since the
+    old one would reject rows the model allows. SQLite cannot alter
+    constraints, so there the table is rebuilt and its rows copied over;
+    that is skipped, with a warning, for a table that has columns the model
+    no longer knows or that other tables reference. Other changes (dropped
+    or retyped columns) are not handled.
+
+    Returns:
+        The statements that were applied.
+    """
+    from sqlalchemy import inspect, text
+
+    applied = []
+    inspector = inspect(eng)
+    existing_tables = set(inspector.get_table_names())
+    with eng.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                statement = f"ALTER TABLE {eng.dialect.identifier_preparer.quote(table.name)} ADD COLUMN {_column_ddl(column, eng.dialect)}"
+                conn.execute(text(statement))
+                applied.append(statement)
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            missing, stale = _unique_changes(inspector, table)
+            if missing or stale:
+                if eng.dialect.name != "sqlite":
+                    applied.extend(_replace_unique_constraints(conn, missing, stale, table))
+                elif _rebuildable(table, columns):
+                    # the new table comes with the model's indexes
+                    applied.extend(_rebuild_sqlite_table(conn, table, indexes))
+                    continue
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(bind=conn)
+                    applied.append(f"CREATE INDEX {index.name}")
+    return applied
+
+
+def _unique_changes(inspector, table):
+    """
+    ``(missing, stale)``: the model's unique constraints the database lacks,
+    and the names of stored ones (keyed by their columns) the model no longer has.
+    """
+    from sqlalchemy import UniqueConstraint
+
+    model = {frozenset(c.columns.keys()): c for c in table.constraints if isinstance(c, UniqueConstraint)}
+    # MySQL reports unique indexes as unique constraints too
+    unique_indexes = {frozenset(i.columns.keys()) for i in table.indexes if i.unique}
+    stored = {frozenset(u["column_names"]): u["name"] for u in inspector.get_unique_constraints(table.name)}
+    missing = [c for columns, c in model.items() if columns not in stored]
+    stale = {columns: name for columns, name in stored.items() if columns not in model and columns not in unique_indexes}
+    return missing, stale
+
+
+def _replace_unique_constraints(conn, missing, stale, table) -> list:
+    """Add the missing unique constraints, then drop the stale ones (so foreign keys stay indexed)."""
+    from sqlalchemy import text
+    from sqlalchemy.schema import AddConstraint
+
+    applied = []
+    for constraint in missing:
+        conn.execute(AddConstraint(constraint))
+        applied.append(f"ADD CONSTRAINT {constraint.name}")
+    quote = conn.dialect.identifier_preparer.quote
+    drop = "DROP INDEX" if conn.dialect.name == "mysql" else "DROP CONSTRAINT"
+    for name in stale.values():
+        statement = f"ALTER TABLE {quote(table.name)} {drop} {quote(name)}"
+        conn.execute(text(statement))
+        applied.append(statement)
+    return applied
+
+
+def _rebuildable(table, columns: set) -> bool:
+    """Whether copying ``table`` into a new one loses nothing: no unknown columns, no referencing tables."""
+    referenced = any(fk.column.table is table for other in Base.metadata.sorted_tables for fk in other.foreign_keys)
+    if referenced or not columns <= set(table.columns.keys()):
+        logger.warning("the unique constraints of %s changed but it cannot be rebuilt; recreate it", table.name)
+        return False
+    return True
+
+
+def _rebuild_sqlite_table(conn, table, indexes: set) -> list:
+    """Recreate ``table`` from the model and copy its rows, for changes SQLite cannot ALTER."""
+    from sqlalchemy import text
+
+    quote = conn.dialect.identifier_preparer.quote
+    old = f"{table.name}_old"
+    statements = [f"ALTER TABLE {quote(table.name)} RENAME TO {quote(old)}"]
+    # index names are per database in SQLite; the old table's would collide with the new ones
+    statements += [f"DROP INDEX {quote(name)}" for name in indexes if name]
+    for statement in statements:
+        conn.execute(text(statement))
+    table.create(bind=conn)
+    names = ", ".join(quote(c.name) for c in table.columns)
+    copy = f"INSERT INTO {quote(table.name)} ({names}) SELECT {names} FROM {quote(old)}"
+    conn.execute(text(copy))
+    conn.execute(text(f"DROP TABLE {quote(old)}"))
+    return statements + [f"CREATE TABLE {table.name}", copy, f"DROP TABLE {old}"]
+
+
+def init_db(app=None, uri=None):
     """
     Initialize the engine and SessionLocal. Call this from run/startup (or it will
-    be called lazily from get_db).
+    be called lazily from get_db). Scripts without a Flask app can pass ``uri``.
+    The connect retry policy comes from ``DB_CONNECT_RETRIES`` and
+    ``DB_CONNECT_DELAY`` in the app config.
     """
+    with _init_lock:
+        _init_locked(app, uri)
+
+
+def _init_locked(app, uri):
     global engine, SessionLocal, Base
+    from . import startup
 
-    # Determine URI: prefer app.config then environment variables
-    uri = None
-    if app is not None:
+    startup.require("db")
+    config = app.config if app is not None else {}
+
+    # Determine URI: explicit argument, then app.config, then environment variables
+    if not uri and app is not None:
         uri = app.config.get("SQLALCHEMY_DATABASE_URI")
 
     if not uri:
@@ -47,22 +250,45 @@ def init_db(app=None):
         DB_NAME = os.getenv("DATABASE_NAME", "deepest_learning")
         uri = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-    engine = _create_engine_with_retry(uri)
+    with startup.timed("db_connect"):
+        engine = _create_engine_with_retry(
+            uri,
+            max_retries=int(config.get("DB_CONNECT_RETRIES", DEFAULT_CONNECT_RETRIES)),
+            initial_delay=float(config.get("DB_CONNECT_DELAY", DEFAULT_CONNECT_DELAY)),
+            busy_timeout=float(config.get("SQLITE_BUSY_TIMEOUT", DEFAULT_SQLITE_BUSY_TIMEOUT)),
+        )
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     # create tables if they don't exist
     from . import models  # noqa: F401
+    from .singleflight import advisory_lock
 
-    Base.metadata.create_all(bind=engine)
+    # workers start together; one creates the tables while the others wait
+    with startup.timed("db_create_all"), advisory_lock(engine, "deepest_learning:create_all", 120):
+        Base.metadata.create_all(bind=engine)
+        for statement in upgrade_schema(engine):
+            logger.info("schema upgrade: %s", statement)
+    startup.set_ready("db")
 
 
 def get_db():
     """Yield a DB session. Caller should close session."""
     global SessionLocal
     if SessionLocal is None:
-        # lazy init if not initialized yet
-        init_db()
+        # lazy init if not initialized yet (or wait for a background init)
+        with _init_lock:
+            if SessionLocal is None:
+                _init_locked(None, None)
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def dispose_after_fork():
+    """
+    Drop pooled connections inherited from a parent process without closing
+    them, so a forked worker opens its own (the parent keeps using its own).
+    """
+    if engine is not None:
+        engine.dispose(close=False)
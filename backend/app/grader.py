@@ -0,0 +1,148 @@
+"""
+Local grading of short, closed-form answers.
+
+When the slide step asks a question with a numeric or single-term answer,
+the model also returns an ``AnswerKey`` that is stored on the slide. Answers
+that can be checked against it (a number within tolerance, or just the
+expected term or an accepted synonym) are graded here without an LLM call; anything
+else, including free-form questions, returns ``None`` and goes to
+``get_answer_feedback``.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+from .student_model import ConceptDelta, normalize_concept
+
+# mastery change for a locally graded answer (the LLM is told 0.1 to 0.2)
+CORRECT_DELTA = 0.15
+INCORRECT_DELTA = -0.15
+# longer answers are explanations, not closed-form answers
+MAX_ANSWER_WORDS = 12
+
+_NUMBER_WORDS = {
+    word: value
+    for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen "
+        "fifteen sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+_NUMBER = re.compile(r"(?<![\w.])[-+]?(?:\d+(?:,\d{3})*(?:\.\d+)?|\.\d+)(?:\s*/\s*\d+)?(?:\s*%)?")
+_ARTICLES = {"a", "an", "the"}
+_NEGATIONS = {"not", "no", "never", "isn't", "isnt", "aren't", "arent", "doesn't", "doesnt", "don't", "dont", "neither", "nor"}
+# lead-ins that may precede a bare term ("it's TCP"); articles are already gone after _normalize
+_LEAD_IN = re.compile(r"^(?:(?:answer|it|that)\s+is|it's|its|that's|thats)\s+")
+
+
+class AnswerKey(BaseModel):
+    kind: Literal["numeric", "term", "free"]
+    expected: str
+    tolerance: float
+    synonyms: List[str]
+    concepts: List[str]
+
+
+@dataclass
+class Grade:
+    correct: bool
+    feedback: str
+
+
+def parse_key(raw: Optional[str]) -> Optional[AnswerKey]:
+    """Load a stored key; missing, malformed and free-form keys give None."""
+    if not raw:
+        return None
+    try:
+        key = AnswerKey.model_validate(json.loads(raw))
+    except (ValueError, TypeError):
+        return None
+    return key if key.kind != "free" else None
+
+
+def dump_key(key: Optional[AnswerKey]) -> Optional[str]:
+    if key is None or key.kind == "free":
+        return None
+    return key.model_dump_json()
+
+
+def _normalize(text: str) -> str:
+    words = re.sub(r"[^\w\s'%./-]", " ", (text or "").lower()).split()
+    return " ".join(w.strip(".") for w in words if w not in _ARTICLES)
+
+
+def _to_number(token: str) -> Optional[float]:
+    token = token.replace(",", "").replace(" ", "")
+    percent = token.endswith("%")
+    token = token.rstrip("%")
+    try:
+        value = float(Fraction(token)) if "/" in token else float(token)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value / 100 if percent else value
+
+
+def extract_number(answer: str) -> Optional[float]:
+    """The single number in a short answer ("2", "it's 2.5", "two", "1/2"), else None."""
+    numbers = _NUMBER.findall(answer or "")
+    if len(numbers) == 1:
+        return _to_number(numbers[0])
+    if not numbers:
+        words = [w for w in _normalize(answer).split() if w in _NUMBER_WORDS]
+        if len(words) == 1:
+            return float(_NUMBER_WORDS[words[0]])
+    return None
+
+
+def _negated(answer: str) -> bool:
+    return any(w in _NEGATIONS for w in _normalize(answer).split())
+
+
+def _matches_term(answer: str, terms: List[str]) -> bool:
+    """
+    True if the answer is just one of ``terms`` (optionally after "it's" and the like).
+
+    Anything more ("TCP or UDP", "I guess TCP but maybe UDP") may hedge between
+    options, so it is left to the LLM rather than matched as a substring.
+    """
+    normalized = _LEAD_IN.sub("", _normalize(answer))
+    return any(normalized == term for term in map(_normalize, terms) if term)
+
+
+def grade(key: Optional[AnswerKey], answer: str) -> Optional[Grade]:
+    """
+    Grade ``answer`` locally if ``key`` allows it.
+
+    Returns:
+        The grade, or None when the answer needs the LLM (free-form key,
+        long or negated answer, no single number found, or an answer that
+        is not exactly the expected term or a synonym).
+    """
+    if key is None or len((answer or "").split()) > MAX_ANSWER_WORDS or _negated(answer):
+        return None
+
+    if key.kind == "numeric":
+        expected = extract_number(key.expected)
+        given = extract_number(answer)
+        if expected is None or given is None:
+            return None
+        tolerance = max(abs(key.tolerance), 1e-9 * max(1.0, abs(expected)))
+        if abs(given - expected) <= tolerance:
+            return Grade(True, f"Correct, the answer is {key.expected}.")
+        return Grade(False, f"Not quite: you answered {given:g}, but the answer is {key.expected}.")
+
+    if key.kind == "term" and _matches_term(answer, [key.expected, *key.synonyms]):
+        return Grade(True, f"Correct, {key.expected}.")
+    # a term that did not match may still be a valid paraphrase
+    return None
+
+
+def concept_deltas(key: AnswerKey, slide_concepts: List[str], correct: bool) -> List[ConceptDelta]:
+    """Mastery changes for a locally graded answer: the key's concepts, else the slide's."""
+    concepts = [c for c in (key.concepts or slide_concepts) if normalize_concept(c)]
+    delta = CORRECT_DELTA if correct else INCORRECT_DELTA
+    return [ConceptDelta(concept=c, delta=delta) for c in concepts]
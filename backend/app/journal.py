@@ -0,0 +1,256 @@
+"""
+Request journal: what real sessions sent, for replaying them offline.
+
+With ``JOURNAL_DIR`` set, every API request appends one JSON line to
+``<JOURNAL_DIR>/requests.<pid>.jsonl`` (one file per worker, so workers
+never interleave or rotate each other's files)::
+
+    {"ts": 1760850000.123, "method": "POST", "route": "/lectures/step/<int:lecture_id>/<int:slide_num>",
+     "args": {"lecture_id": 7, "slide_num": 2}, "query": "", "status": 200, "duration_ms": 812.4,
+     "request_bytes": 0, "response_bytes": 1432, "streamed": false}
+
+Commands of a WebSocket session (``app/ws.py``) are recorded one by one
+as the HTTP request each stands for, with ``"transport": "ws"``.
+Uploads add ``lecture_id``, ``pages`` and ``document`` (a prefix of the PDF's
+SHA-256), so a replay can create an equivalent lecture. Request and response
+bodies are never recorded, only their sizes. Streamed responses are recorded
+when the stream closes, so their duration covers the whole body.
+
+The request path only appends the entry to an in-memory queue. A background
+thread writes the queue every ``JOURNAL_FLUSH_INTERVAL`` seconds in one
+``write`` and flushes it to the OS without fsync; a crash loses at most the
+last interval. Past ``JOURNAL_MAX_BYTES`` the file is rotated to ``.1``,
+``.2``, ... keeping ``JOURNAL_BACKUPS`` old files. If the writer falls behind
+by ``JOURNAL_MAX_PENDING`` entries, new entries are dropped and counted
+(``journal.dropped``) rather than slowing requests down.
+
+``bench/replay.py`` re-drives a journal against a server.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from flask import g, request
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 2**20
+DEFAULT_BACKUPS = 5
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 10000
+
+# operational endpoints and API docs are not session traffic
+EXCLUDED_PREFIXES = ("/metrics", "/healthz", "/readyz", "/apidocs", "/swagger", "/static")
+
+
+class Journal:
+    """Batched, rotating JSON-lines writer."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._pid = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"requests.{os.getpid()}.jsonl")
+
+    def record(self, entry: dict):
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                metrics.incr("journal.dropped")
+                return
+            self._pending.append(entry)
+            # started lazily, so a worker forked after create_app gets its own thread
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._file = None
+                self._thread = threading.Thread(target=self._loop, name="journal", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of entries written."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in batch).encode("utf-8")
+            try:
+                f = self._open()
+                f.write(data)
+                f.flush()
+                if f.tell() >= self.max_bytes:
+                    self._rotate()
+            except OSError:
+                metrics.incr("journal.failed", len(batch))
+                logger.exception("writing %d journal entries failed", len(batch))
+                self._close()
+                return 0
+            metrics.incr("journal.recorded", len(batch))
+            metrics.incr("journal.bytes", len(data))
+            metrics.observe("journal.write", time.perf_counter() - started)
+            return len(batch)
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, "ab")
+        return self._file
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        path = self.path
+        self._close()
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{n}"):
+                os.replace(f"{path}.{n}", f"{path}.{n + 1}")
+        if self.backups:
+            os.replace(path, f"{path}.1")
+        else:
+            os.unlink(path)
+        metrics.incr("journal.rotations")
+
+    def _loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+_journal: Optional[Journal] = None
+
+
+def annotate(**fields):
+    """Add fields to the journal entry of the current request (no-op when journaling is off)."""
+    if _journal is not None:
+        g.setdefault("journal_fields", {}).update(fields)
+
+
+def record(entry: dict):
+    """Journal an entry built outside a request, e.g. a WebSocket command (no-op when journaling is off)."""
+    if _journal is not None:
+        _journal.record(entry)
+
+
+def _entry(response, duration: float) -> dict:
+    size = response.content_length
+    if size is None and not response.is_streamed:
+        size = response.calculate_content_length()
+    entry = {
+        "ts": g.journal_ts,
+        "method": request.method,
+        "route": request.url_rule.rule if request.url_rule else request.path,
+        "args": request.view_args or {},
+        "query": request.query_string.decode("latin-1"),
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 2),
+        "request_bytes": request.content_length or 0,
+        "response_bytes": size,
+        "streamed": response.is_streamed,
+    }
+    entry.update(g.get("journal_fields", {}))
+    return entry
+
+
+def _before_request():
+    g.journal_ts = time.time()
+    g.journal_started = time.perf_counter()
+
+
+def _after_request(response):
+    if "journal_started" not in g or request.method == "OPTIONS" or request.path.startswith(EXCLUDED_PREFIXES):
+        return response
+    journal = _journal
+    if response.is_streamed:
+        # build the entry now, while the request context is still there
+        entry = _entry(response, 0.0)
+        started = g.journal_started
+
+        def on_close():
+            entry["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            journal.record(entry)
+
+        response.call_on_close(on_close)
+    else:
+        journal.record(_entry(response, time.perf_counter() - g.journal_started))
+    return response
+
+
+def init_app(app) -> bool:
+    """Journal ``app``'s requests if ``JOURNAL_DIR`` is set; False otherwise."""
+    global _journal
+    directory = app.config.get("JOURNAL_DIR")
+    if not directory:
+        return False
+    _journal = Journal(
+        directory,
+        max_bytes=app.config.get("JOURNAL_MAX_BYTES", DEFAULT_MAX_BYTES),
+        backups=app.config.get("JOURNAL_BACKUPS", DEFAULT_BACKUPS),
+        flush_interval=app.config.get("JOURNAL_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+        max_pending=app.config.get("JOURNAL_MAX_PENDING", DEFAULT_MAX_PENDING),
+    )
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    atexit.register(_journal.flush)
+    return True
+
+
+def read(paths) -> List[dict]:
+    """
+    Entries of journal files or directories, oldest first.
+
+    Args:
+        paths: Files, or directories whose ``requests.*.jsonl*`` files
+            (rotated ones included) are read.
+
+    Returns:
+        Entries sorted by start time; unparseable lines (a write cut short
+        by a crash) are skipped.
+    """
+    files = []
+    for path in [paths] if isinstance(paths, str) else paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "requests.*.jsonl*")))
+        else:
+            files.append(path)
+    entries = []
+    for name in files:
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    entries.sort(key=lambda entry: entry.get("ts", 0))
+    return entries
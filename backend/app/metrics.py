@@ -0,0 +1,80 @@
+"""
+In-process metrics: monotonically increasing counters and latency samples.
+
+Values are per worker and exposed as JSON at ``GET /metrics``.
+"""
+
+import threading
+from collections import defaultdict, deque
+
+# latency samples kept per timing; enough for stable p99 estimates
+SAMPLE_WINDOW = 2048
+
+
+def percentile(values, pct: float) -> float:
+    """Linear-interpolated percentile of ``values`` (``pct`` in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._timings = defaultdict(lambda: deque(maxlen=SAMPLE_WINDOW))
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self._timings[name].append(seconds)
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0.0)
+
+    def quantile(self, name: str, pct: float, default: float = None, min_samples: int = 1):
+        """Percentile of recent samples for ``name``, or ``default`` with fewer than ``min_samples``."""
+        with self._lock:
+            samples = list(self._timings.get(name, ()))
+        return percentile(samples, pct) if len(samples) >= max(1, min_samples) else default
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: list(samples) for name, samples in self._timings.items()}
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "timings": {
+                name: {
+                    "count": len(samples),
+                    "p50": percentile(samples, 50),
+                    "p95": percentile(samples, 95),
+                    "p99": percentile(samples, 99),
+                }
+                for name, samples in timings.items()
+            },
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = Metrics()
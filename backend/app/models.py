@@ -1,39 +1,123 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, DateTime, Float, Integer, String, Text, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from .db import Base
 
 
-# class Student(Base):
-#     __tablename__ = "students"
-#     id = Column(Integer, primary_key=True)
-#     student_hypothesis = Column(Text, nullable=True)
-#     lectures = relationship(
-#         "Lecture", back_populates="student", cascade="all, delete-orphan"
-#     )
+class Student(Base):
+    __tablename__ = "students"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=True)
+    # precomputed cross-lecture summary, rebuilt lazily when profile_version moves past summary_version
+    student_hypothesis = Column(Text, nullable=True)
+    profile_version = Column(Integer, nullable=False, default=0)
+    summary_version = Column(Integer, nullable=False, default=0)
+    lectures = relationship(
+        "Lecture", back_populates="student", cascade="all, delete-orphan"
+    )
+    concepts = relationship(
+        "StudentConcept", back_populates="student", cascade="all, delete-orphan"
+    )
 
 
 class Lecture(Base):
     __tablename__ = "lectures"
     id = Column(Integer, primary_key=True)
-    # student_id = Column(Integer, ForeignKey("students.id"), nullable=True)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=True, index=True)
     title = Column(String(255), nullable=True)
     pdf_filename = Column(String(512), nullable=True)
     pdf_path = Column(String(512), nullable=True)  # Path to the locally stored PDF file
+    # uploads are content-addressed; per-page artifacts live under pages/<sha256> (see app.preprocess)
+    pdf_sha256 = Column(String(64), nullable=True, index=True)
+    page_count = Column(Integer, nullable=True)
+    preprocess_status = Column(String(16), nullable=True)
+    pages_ready = Column(Integer, nullable=False, default=0)
+    preprocess_error = Column(Text, nullable=True)
     script = Column(Text, nullable=True)
     lecture_hypothesis = Column(Text, nullable=True)
+    # slides and the student model of older runs are stale (see app.runs)
+    current_run = Column(Integer, nullable=False, default=0)
+    run_started_at = Column(DateTime, nullable=True)
 
+    student = relationship("Student", back_populates="lectures")
     slides = relationship(
         "Slide", back_populates="lecture", cascade="all, delete-orphan"
     )
+    concepts = relationship(
+        "ConceptMastery", back_populates="lecture", cascade="all, delete-orphan"
+    )
+    concept_events = relationship(
+        "ConceptEvent", back_populates="lecture", cascade="all, delete-orphan"
+    )
 
 
 class Slide(Base):
     __tablename__ = "slides"
+    __table_args__ = (Index("ix_slides_lecture_run_slide", "lecture_id", "run", "slide_number"),)
     id = Column(Integer, primary_key=True)
     lecture_id = Column(Integer, ForeignKey("lectures.id"), nullable=False)
+    run = Column(Integer, nullable=False, default=0)
     slide_number = Column(Integer, nullable=False)
     script = Column(Text, nullable=True)
     audio_path = Column(String(512), nullable=True)
     question = Column(Text, nullable=True)
+    concepts = Column(Text, nullable=True)  # JSON list of concept names covered by the slide
+    answer_key = Column(Text, nullable=True)  # JSON AnswerKey for closed-form questions (app.grader)
+    # the rest of the stored /step payload, so reading a slide never regenerates it
+    hypothesis = Column(Text, nullable=True)
+    hypothesis_use = Column(Text, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
 
     lecture = relationship("Lecture", back_populates="slides")
+
+
+class ConceptMastery(Base):
+    """Structured student model: one row per concept the student has shown evidence on."""
+
+    __tablename__ = "concept_mastery"
+    __table_args__ = (UniqueConstraint("lecture_id", "run", "concept", name="uq_concept_mastery_lecture_run_concept"),)
+    id = Column(Integer, primary_key=True)
+    lecture_id = Column(Integer, ForeignKey("lectures.id"), nullable=False)
+    run = Column(Integer, nullable=False, default=0)
+    concept = Column(String(255), nullable=False)
+    mastery = Column(Float, nullable=False, default=0.5)
+    evidence = Column(Integer, nullable=False, default=0)
+
+    lecture = relationship("Lecture", back_populates="concepts")
+
+
+class ConceptEvent(Base):
+    """Append-only history of the deltas applied to a lecture's student model."""
+
+    __tablename__ = "concept_events"
+    id = Column(Integer, primary_key=True)
+    lecture_id = Column(Integer, ForeignKey("lectures.id"), nullable=False, index=True)
+    run = Column(Integer, nullable=False, default=0)
+    concept = Column(String(255), nullable=False)
+    delta = Column(Float, nullable=False)
+    mastery = Column(Float, nullable=False)  # mastery after the delta was applied
+    source = Column(String(32), nullable=True)  # e.g. "answer", "question"
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    lecture = relationship("Lecture", back_populates="concept_events")
+
+
+class StudentConcept(Base):
+    """Cross-lecture aggregate of ``ConceptMastery``, weighted by evidence."""
+
+    __tablename__ = "student_concepts"
+    __table_args__ = (
+        UniqueConstraint("student_id", "concept", name="uq_student_concepts_student_concept"),
+        Index("ix_student_concepts_concept_mastery", "concept", "mastery"),
+        # keyset pages of students_by_concept walk (concept, id)
+        Index("ix_student_concepts_concept_id", "concept", "id"),
+    )
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    concept = Column(String(255), nullable=False)
+    # sum over lectures of mastery * evidence, so updates can be folded in without a rescan
+    weighted_mastery = Column(Float, nullable=False, default=0.0)
+    evidence = Column(Integer, nullable=False, default=0)
+    mastery = Column(Float, nullable=False, default=0.5)
+    lectures = Column(Integer, nullable=False, default=0)
+
+    student = relationship("Student", back_populates="concepts")
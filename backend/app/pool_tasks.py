@@ -0,0 +1,97 @@
+"""
+Tasks run by the preprocessing process pool.
+
+The pool's processes are started by a fork server (``preprocess._get_pool``)
+rather than forked from the gunicorn worker: a worker runs request, collector
+and journal threads, and a child forked while one of them holds a lock (the
+logging lock, an allocator lock inside a C library) can hang on it forever.
+The fork server is a fresh, single-threaded process that preloads this
+module (and with it the ``app`` package, but no app is created); PyPDF2,
+PDFium and Pillow are imported inside the tasks, once per pool process.
+Pool processes also import the main script as ``__mp_main__``, which is why
+``run.py`` only builds its app when it is not one.
+
+Tasks take every setting as an argument; pool processes never see the
+parent's ``configure`` calls.
+"""
+
+import hashlib
+import os
+
+
+def _write(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def split_pages(pdf_path: str, out_dir: str, first: int, last: int) -> list:
+    """
+    Write pages ``first`` to ``last`` (1-indexed, inclusive) and their text.
+
+    Returns:
+        ``(page number, sha256 of the page PDF)`` for each page.
+    """
+    from io import BytesIO
+
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_path)
+    done = []
+    for number in range(first, last + 1):
+        page = reader.pages[number - 1]
+        writer = PdfWriter()
+        writer.add_page(page)
+        buffer = BytesIO()
+        writer.write(buffer)
+        payload = buffer.getvalue()
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            text = ""
+        _write(os.path.join(out_dir, f"{number}.pdf"), payload)
+        _write(os.path.join(out_dir, f"{number}.txt"), text.encode("utf-8"))
+        done.append((number, hashlib.sha256(payload).hexdigest()))
+    return done
+
+
+def render_pages(pdf_path: str, out_dir: str, first: int, last: int, encoder: str, ext: str, widths, quality: int) -> list:
+    """
+    Render pages ``first`` to ``last`` (1-indexed, inclusive) at every width.
+
+    Args:
+        encoder: Pillow encoder name (``"WEBP"``, ``"JPEG"``, ``"PNG"``).
+        ext: File extension of the images.
+        widths: Image widths in pixels.
+        quality: Encoder quality.
+
+    Returns:
+        ``(page number, width / height)`` for each page.
+    """
+    import pypdfium2
+    from PIL import Image
+
+    sizes = sorted(widths, reverse=True)
+    document = pypdfium2.PdfDocument(pdf_path)
+    done = []
+    try:
+        for number in range(first, last + 1):
+            page = document[number - 1]
+            try:
+                page_width, page_height = page.get_size()
+                bitmap = page.render(scale=sizes[0] / page_width)
+                image = bitmap.to_pil().convert("RGB")
+            finally:
+                page.close()
+            for width in sizes:
+                if image.width != width:
+                    image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+                path = os.path.join(out_dir, f"{number}.w{width}.{ext}")
+                tmp = f"{path}.{os.getpid()}.tmp"
+                image.save(tmp, encoder, quality=quality)
+                os.replace(tmp, path)
+            done.append((number, round(page_width / page_height, 4)))
+    finally:
+        document.close()
+    return done
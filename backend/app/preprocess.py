@@ -0,0 +1,232 @@
+"""
+Upload-time preprocessing of lecture PDFs.
+
+Uploads are stored content-addressed (``<upload folder>/<sha256>.pdf``).
+Right after an upload, the document is split into per-page artifacts under
+``<upload folder>/pages/<sha256>/``:
+
+- ``<n>.pdf``: page ``n`` as a single-page PDF, what ``lecture_step`` sends
+  to the model;
+- ``<n>.txt``: the page's extracted text;
+- ``manifest.json``: page count and per-page SHA-256, written last, so its
+  presence means the pages are complete.
+
+Pages are split in chunks across a process pool (``PREPROCESS_WORKERS``
+processes, at least ``PREPROCESS_CHUNK_PAGES`` pages per task), so a deck of
+hundreds of pages is ready in seconds and ``/step`` no longer parses the
+whole PDF for every slide. Progress is stored on the lecture
+(``preprocess_status``, ``pages_ready``) and served by
+``GET /lectures/preprocess/<lecture_id>``. Lectures sharing a document share
+its pages; a document is only processed once per process at a time.
+Once split, the pages are rendered to images (``app/slide_images.py``).
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+from . import pool_tasks
+from .metrics import metrics
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# every task parses the document again, so tasks should not be much smaller than this
+DEFAULT_CHUNK_PAGES = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+_flight = SingleFlight()
+_settings = {"upload_folder": "uploads", "workers": None, "chunk_pages": DEFAULT_CHUNK_PAGES}
+
+
+def configure(upload_folder: str = None, workers: Optional[int] = None, chunk_pages: int = None):
+    """Set where uploads live and how preprocessing fans out (``workers=0`` runs in-process)."""
+    if upload_folder is not None:
+        _settings["upload_folder"] = upload_folder
+    if workers is not None:
+        _settings["workers"] = workers
+    if chunk_pages:
+        _settings["chunk_pages"] = chunk_pages
+
+
+def pages_dir(digest: str) -> str:
+    return os.path.join(_settings["upload_folder"], "pages", digest)
+
+
+def page_path(lecture, slide_num: int) -> Optional[str]:
+    """The preprocessed single-page PDF for ``slide_num``, or None if it is not there (yet)."""
+    if not lecture.pdf_sha256:
+        return None
+    path = os.path.join(pages_dir(lecture.pdf_sha256), f"{slide_num}.pdf")
+    return path if os.path.isfile(path) else None
+
+
+def is_complete(digest: str) -> bool:
+    return os.path.isfile(os.path.join(pages_dir(digest), "manifest.json"))
+
+
+def store_upload(stream, upload_folder: str, block_size: int = 1 << 20):
+    """
+    Save an uploaded file under its SHA-256, hashing while it is written.
+
+    Returns:
+        ``(path, sha256 hex digest)``.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    sha = hashlib.sha256()
+    tmp = os.path.join(upload_folder, f".upload-{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            for block in iter(lambda: stream.read(block_size), b""):
+                sha.update(block)
+                f.write(block)
+        digest = sha.hexdigest()
+        path = os.path.join(upload_folder, f"{digest}.pdf")
+        # identical uploads share one file
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return path, digest
+
+
+def count_pages(pdf_path: str) -> int:
+    """Number of pages; raises ValueError if the file is not a readable PDF."""
+    from PyPDF2 import PdfReader
+    from PyPDF2.errors import PyPdfError
+
+    try:
+        with open(pdf_path, "rb") as f:
+            return len(PdfReader(f).pages)
+    except (PyPdfError, OSError) as exc:
+        raise ValueError(f"not a readable PDF: {exc}") from exc
+
+
+def _get_pool(workers: Optional[int]) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # never fork this process: it runs threads, and a child forked while one
+                # holds a lock can deadlock (see app/pool_tasks.py)
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload(["app.pool_tasks"])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                _pool = ProcessPoolExecutor(max_workers=workers or None, mp_context=context)
+    return _pool
+
+
+def _page_ranges(page_count: int) -> list:
+    """``(first, last)`` page ranges, one per pool task."""
+    workers = _settings["workers"]
+    if workers == 0:
+        chunk = page_count
+    else:
+        # about two tasks per process for load balance, but never below the configured size
+        chunk = max(_settings["chunk_pages"], -(-page_count // (2 * (workers or os.cpu_count() or 1))))
+    return [(first, min(page_count, first + chunk - 1)) for first in range(1, page_count + 1, chunk)]
+
+
+def preprocess_document(pdf_path: str, digest: str, page_count: int, progress=None) -> int:
+    """
+    Split ``pdf_path`` into per-page artifacts unless that was done already.
+
+    Args:
+        pdf_path: The stored upload.
+        digest: Its SHA-256 (names the pages directory).
+        page_count: Number of pages, from ``count_pages``.
+        progress: Called with the number of pages written so far.
+
+    Returns:
+        The number of pages.
+    """
+    if is_complete(digest):
+        return page_count
+    out_dir = pages_dir(digest)
+    os.makedirs(out_dir, exist_ok=True)
+    ranges = _page_ranges(page_count)
+    hashes = {}
+    if len(ranges) == 1:
+        results = (pool_tasks.split_pages(pdf_path, out_dir, first, last) for first, last in ranges)
+    else:
+        pool = _get_pool(_settings["workers"])
+        futures = [pool.submit(pool_tasks.split_pages, pdf_path, out_dir, first, last) for first, last in ranges]
+        results = (future.result() for future in as_completed(futures))
+    for pages in results:
+        hashes.update(pages)
+        if progress is not None:
+            progress(len(hashes))
+
+    manifest = {"sha256": digest, "pages": page_count, "page_sha256": [hashes[n] for n in range(1, page_count + 1)]}
+    path = os.path.join(out_dir, "manifest.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+    return page_count
+
+
+def _update(digest: str, **values):
+    from sqlalchemy import or_
+
+    from .db import get_db
+    from .models import Lecture
+
+    db_gen = get_db()
+    db = next(db_gen)
+    try:
+        pending = or_(Lecture.preprocess_status.is_(None), Lecture.preprocess_status != DONE)
+        db.query(Lecture).filter(Lecture.pdf_sha256 == digest, pending).update(
+            values, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        try:
+            next(db_gen)
+        except StopIteration:
+            pass
+
+
+def _run(pdf_path: str, digest: str, page_count: int):
+    started = time.perf_counter()
+    _update(digest, preprocess_status=RUNNING)
+    try:
+        _flight.do(
+            digest,
+            lambda: preprocess_document(pdf_path, digest, page_count, lambda n: _update(digest, pages_ready=n)),
+        )
+    except Exception as exc:
+        logger.exception("preprocessing %s failed", pdf_path)
+        metrics.incr("preprocess.failed")
+        _update(digest, preprocess_status=FAILED, preprocess_error=str(exc)[:1000])
+        return
+    metrics.observe("preprocess.document", time.perf_counter() - started)
+    metrics.incr("preprocess.pages", page_count)
+    _update(digest, preprocess_status=DONE, pages_ready=page_count, preprocess_error=None)
+
+    from . import slide_images
+
+    # after the split, so rendering never holds up /step
+    slide_images.render(pdf_path, digest, page_count)
+
+
+def submit(pdf_path: str, digest: str, page_count: int) -> threading.Thread:
+    """Preprocess a stored upload in the background; every lecture with its digest tracks progress."""
+    thread = threading.Thread(target=_run, args=(pdf_path, digest, page_count), name="preprocess", daemon=True)
+    thread.start()
+    return thread
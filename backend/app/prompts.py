@@ -1,77 +1,167 @@
-def lecture_intro_prompt(student_hypothesis: str, lecture_hypothesis: str) -> str:
-    """
-    Generate a prompt for a university lecturer to give an introduction to a lecture.
+"""
+Prompt templates.
+
+Every prompt is laid out as a static instruction prefix followed by the
+dynamic context, most stable section first. The prefixes are built once at
+import time, so consecutive calls of the same kind share a byte-identical
+prefix and providers can serve it from their prompt cache. Each function
+returns a ``Prompt``: a plain ``str`` that also knows which of its leading
+characters repeat across calls and estimates how many tokens are cacheable.
+"""
 
-    Args:
-        student_hypothesis: The general hypothesis of the student (aggregated over multiple lectures)
-        lecture_hypothesis: The specific hypothesis of student's understanding of this lectures content.
+# rough characters-per-token ratio for English prose; good enough for reporting
+CHARS_PER_TOKEN = 4
+# OpenAI only caches prompts whose prefix is at least this long, in 128 token steps
+MIN_CACHEABLE_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
 
-    Returns:
-        A prompt for a university lecturer to give an introduction to a lecture.
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Prompt(str):
     """
-    return f"""
-You're a university lecturer whose giving a lecture to a student with this being the introductory slide.
+    A prompt string laid out as ``prefix + stable + volatile``.
+
+    ``prefix`` is the precompiled instruction text shared by every prompt of the
+    same kind; ``stable`` is context that repeats across consecutive calls in a
+    session (or only grows by appending); ``volatile`` changes every call.
+    Instances are ordinary strings (they can be passed straight to the API) with
+    token estimates attached for reporting.
+    """
+
+    kind: str
+    prefix_length: int
+    cacheable_length: int
+
+    def __new__(cls, kind: str, prefix: str, stable: str = "", volatile: str = ""):
+        prompt = super().__new__(cls, prefix + stable + volatile)
+        prompt.kind = kind
+        prompt.prefix_length = len(prefix)
+        prompt.cacheable_length = len(prefix) + len(stable)
+        return prompt
 
-We're also keeping track of some extra information, to help you tailor you're lecture style. Do not mention any of this context in your response.
+    @property
+    def prefix(self) -> str:
+        return self[: self.prefix_length]
 
-*Context about the student you're teaching*
-<student context>
-{student_hypothesis}
-</student context>
+    @property
+    def estimated_tokens(self) -> int:
+        return estimate_tokens(self)
 
-*What the student understands about this topic*
-<understanding context>
-{lecture_hypothesis}
-</understanding context>
+    @property
+    def estimated_cached_tokens(self) -> int:
+        """Tokens a warm provider-side cache could serve: whole blocks of prefix and stable context."""
+        cacheable = estimate_tokens(self[: self.cacheable_length])
+        if cacheable < MIN_CACHEABLE_TOKENS:
+            return 0
+        return cacheable - cacheable % CACHE_BLOCK_TOKENS
 
-Attached is the first slide of your pdf presentation. Write a brief friendly introduction to the lecture. Make sure your keep your lecture conversational and engaging (avoid bullet points and lists where possible). Do not end your lecturing over this slide with a question or summary line.
+    @property
+    def estimated_uncached_tokens(self) -> int:
+        return self.estimated_tokens - self.estimated_cached_tokens
+
+
+def _section(tag: str, body: str) -> str:
+    return f"<{tag}>\n{body}\n</{tag}>\n\n"
+
+
+_CONTEXT_NOTE = """We're also keeping track of some extra information, to help you tailor you're lecture style. Do not mention any of this context in your response.
+The student context describes the student across previous lectures. The understanding context lists what the student understands about this topic (concept: mastery from 0 to 1, with the number of observations).
+"""
+
+_SLIDE_RULES = """Make sure your keep your lecture conversational and engaging (avoid bullet points and lists where possible). Do not end your lecturing over this slide with a question or summary line.
 Also, if there is an appropriate technical question to ask, set ask_question to True and provide the question in the question field. Otherwise, set ask_question to False and leave the question field as an empty string.
+If the question has a closed-form answer, fill answer_key so it can be marked automatically: kind "numeric" (expected is the number, tolerance the accepted absolute error) or "term" (expected is the short answer, synonyms other accepted wordings, tolerance 0), and concepts the concepts the question tests. Otherwise set kind to "free" with empty fields.
+List the key concepts this slide covers in the concepts field as short noun phrases (at most five), reusing names from the understanding context where they apply.
 Only include details that are essential to keep the lecture concise.
 """
 
+_INTRO_PREFIX = f"""
+You're a university lecturer whose giving a lecture to a student with this being the introductory slide.
+
+{_CONTEXT_NOTE}
+Attached is the first slide of your pdf presentation. Write a brief friendly introduction to the lecture. {_SLIDE_RULES}
+"""
+
+_STEP_PREFIX = f"""
+You're a university lecturer whose given a lecture up to the point shown in the lecture section below.
+
+{_CONTEXT_NOTE}
+Attached is the next slide of your pdf presentation. Please continue your lecture from the exact point you left off to cover the content in this slide. {_SLIDE_RULES}Can you also give an explanation of how you used the lecture hypothesis to guide your lecture style and points you made? What did you do differently to specifically target the student's level of understanding?
+"""
+
+_QUESTION_PREFIX = """
+Below, we have a lecture that is being delivered to a student and a hypothesis of what we believe we know about the student.
+
+Ask the student a question about the content discussed in the later parts of the lecture that will help provide insight into their level of understanding. Make the question have a short written response. Only ask the question, nothing else.
+"""
+
+_ANSWER_FEEDBACK_PREFIX = """
+Analyse the correctness of the following student's answer to a question, and provide a brief summary addressed to them on what they did well and what they could improve on.
+Also analyse how the student answers the question - does this change our model of the student's understanding? Do not refer in anyway to the meta understanding of the student model.
+Return concept_updates: one entry per concept the answer gives evidence on, with delta being the change in mastery between -1 and 1. A single answer should usually move mastery by 0.1 to 0.2. Reuse concept names from the student model where they apply.
+If the user makes any claims about their own level of understanding (without necessarily providing evidence of this) you MUST take this as truth and use deltas large enough to reflect it.
+"""
+
+_USER_QUESTION_PREFIX = """
+Below, we have a lecture that is being delivered to a student and a question they're asking about the lecture.
+
+Give the user an answer to the question.
+Also analyse the question the student is asking - does this change our model of the student's understanding? Do not refer in anyway to the meta understanding of the student model. Return concept_updates: one entry per concept the question gives evidence on, with delta being the change in mastery between -1 and 1. Please ensure that you do not focus too much on the most recent response, deltas should be small (around 0.05 to 0.1). However, If they make claims about their own level of understanding (without necessarily providing evidence of this) you MUST take this as truth and use deltas large enough to reflect it.
+
+Additionally, explain briefly how the current hypothesis influenced the style and content of your answer (tone, level of detail, examples). Provide this in a single short field named hypothesis_use.
+"""
+
+
+def lecture_intro_prompt(student_hypothesis: str, lecture_hypothesis: str) -> Prompt:
+    """
+    Generate a prompt for a university lecturer to give an introduction to a lecture.
+
+    Args:
+        student_hypothesis: The general hypothesis of the student (aggregated over multiple lectures)
+        lecture_hypothesis: The rendered student model (per-concept mastery) for this lecture's content.
+
+    Returns:
+        A prompt for a university lecturer to give an introduction to a lecture.
+    """
+    return Prompt(
+        "intro",
+        _INTRO_PREFIX,
+        stable=_section("student context", student_hypothesis),
+        volatile=_section("understanding context", lecture_hypothesis),
+    )
+
 
 def lecture_step_prompt(
     lecture: str, student_hypothesis: str, lecture_hypothesis: str
-) -> str:
+) -> Prompt:
     """
     Generate a prompt for a university lecturer to continue a lecture for the next slide.
 
+    The lecture so far only ever grows by appending, so it goes before the
+    understanding context: the cacheable prefix then extends slide by slide.
+
     Args:
         lecture: The lecture so far.
         student_hypothesis: The general hypothesis of the student (aggregated over multiple lectures)
-        lecture_hypothesis: The specific hypothesis of student's understanding of this lectures content.
+        lecture_hypothesis: The rendered student model (per-concept mastery) for this lecture's content.
 
     Returns:
         A prompt for a university lecturer to continue a lecture for the next slide.
     """
-    return f"""
-You're a university lecturer whose given a lecture this point:
-<lecture>
-{lecture}
-</lecture>
-
-We're also keeping track of some extra information, to help you tailor you're lecture style. Do not mention any of this context in your response.
-
-*Context about the student you're teaching*
-<student context>
-{student_hypothesis}
-</student context>
-
-*What the student understands about this topic*
-<understanding context>
-{lecture_hypothesis}
-</understanding context>
-
-Attached is the next slide of your pdf presentation. Please continue your lecture from the exact point you left off to cover the content in this slide. Make sure your keep your lecture conversational and engaging (avoid bullet points and lists where possible). Do not end your lecturing over this slide with a question or summary line.
-Also, if there is an appropriate technical question to ask, set ask_question to True and provide the question in the question field. Otherwise, set ask_question to False and leave the question field as an empty string.
-Can you also give an explanation of how you used the lecture hypothesis to guide your lecture style and points you made? What did you do differently to specifically target the student's level of understanding?
-Only include details that are essential to keep the lecture concise.
-"""
+    return Prompt(
+        "step",
+        _STEP_PREFIX,
+        stable=_section("student context", student_hypothesis) + _section("lecture", lecture),
+        volatile=_section("understanding context", lecture_hypothesis),
+    )
 
 
 def question_prompt(
     lecture: str, student_hypothesis: str, lecture_hypothesis: str
-) -> str:
+) -> Prompt:
     """
     Generate a prompt for a university lecturer to ask a question about the content of a lecture.
 
@@ -83,26 +173,15 @@ def question_prompt(
     Returns:
         A prompt for a university lecturer to ask a question about the content of a lecture.
     """
-    return f"""
-Below, we have a lecture that is being delivered to a student and a hypothesis of what we believe we know about the student.
-
-<lecture>
-{lecture}
-</lecture>
-
-<student hypothesis>
-{student_hypothesis}
-</student hypothesis>
+    return Prompt(
+        "question",
+        _QUESTION_PREFIX,
+        stable=_section("student hypothesis", student_hypothesis) + _section("lecture", lecture),
+        volatile=_section("understanding hypothesis", lecture_hypothesis),
+    )
 
-<understanding hypothesis>
-{lecture_hypothesis}
-</understanding hypothesis>
-
-Ask the student a question about the content discussed in the later parts of the lecture that will help provide insight into their level of understanding. Make the question have a short written response. Only ask the question, nothing else.
-"""
 
-
-def answer_feedback_prompt(question: str, answer: str, hypothesis: str) -> str:
+def answer_feedback_prompt(question: str, answer: str, hypothesis: str) -> Prompt:
     """
     Generate a prompt for a university lecturer to provide feedback on a student's answer to a question.
     NOTE: This prompt expects the use of structured outputs.
@@ -110,59 +189,34 @@ def answer_feedback_prompt(question: str, answer: str, hypothesis: str) -> str:
     Args:
         question: The question that was asked.
         answer: The student's answer to the question.
-        hypothesis: The hypothesis of the student's understanding of the topic.
+        hypothesis: The rendered student model (per-concept mastery) relevant to the question.
 
     Returns:
         A prompt for a university lecturer to provide feedback on a student's answer to a question.
     """
-    return f"""
-Analyse the correctness of the following student's answer to a question, and provide a brief summary addressed to them on what they did well and what they could improve on.
-Also analyse how the student answers the question - does this change our hypothesis of the student's understanding of the topic? Provide the updated hypothesis. Do not refer in anyway to the meta understanding of the hypothesis.
-If the user makes any claims about their own level of understanding (without necessarily providing evidence of this) you MUST take this as truth and overwrite previous hypotheses.
-
-<question>
-{question}
-</question>
+    return Prompt(
+        "answer",
+        _ANSWER_FEEDBACK_PREFIX,
+        stable=_section("question", question),
+        volatile=_section("student model", hypothesis) + _section("answer", answer),
+    )
 
-<answer>
-{answer}
-</answer>
-
-<hypothesis>
-{hypothesis}
-</hypothesis>
-"""
 
-
-def user_question_prompt(script: str, question: str, hypothesis: str) -> str:
+def user_question_prompt(script: str, question: str, hypothesis: str) -> Prompt:
     """
     Generate a prompt for a university lecturer to ask a question to the user.
 
     Args:
         script: The script of the lecture so far.
         question: The question that was asked.
-        hypothesis: The hypothesis of the student's understanding of the topic.
+        hypothesis: The rendered student model (per-concept mastery) relevant to the question.
 
     Returns:
         A prompt for a university lecturer to ask a question to the user.
     """
-    return f"""
-Below, we have a lecture that is being delivered to a student and a question they're asking about the lecture.
-
-<lecture>
-{script}
-</lecture>
-
-<question>
-{question}
-</question>
-
-<student hypothesis>
-{hypothesis}
-</student hypothesis>
-
-Give the user an answer to the question.
-Also analyse the question the student is asking - does this change our hypothesis of the student's understanding of the topic? Provide the updated hypothesis. Do not refer in anyway to the meta understanding of the hypothesis. Please ensure that you do not focus too much on the most recent response, it should only impact the hypothesis in a small way. However, If they make claims about their own level of understanding (without necessarily providing evidence of this) you MUST take this as truth and overwrite previous hypotheses.
-
-Additionally, explain briefly how the current hypothesis influenced the style and content of your answer (tone, level of detail, examples). Provide this in a single short field named hypothesis_use.
-"""
+    return Prompt(
+        "user_question",
+        _USER_QUESTION_PREFIX,
+        stable=_section("lecture", script),
+        volatile=_section("student model", hypothesis) + _section("question", question),
+    )
@@ -0,0 +1,197 @@
+"""
+Model routing and hedged requests.
+
+Each LLM call type ("step", "answer", "question") has a ``Policy`` naming the
+model to use and, optionally, a hedge model: by default a cheap, fast model
+first and a larger tier as the hedge, so a hedge is a second opinion from a
+different deployment rather than the same request twice. If the primary
+attempt has not returned a valid structured parse after the recent p95
+latency of that call type's primary attempts (clamped to the policy's
+bounds), a second attempt is started against the hedge model; the first
+valid parse wins and the other request is cancelled.
+
+The delay is estimated from primary attempts only, never from whole calls:
+hedging shortens calls, so their latency would pull the delay down, which
+hedges more, which shortens calls further. A primary cancelled because the
+hedge won still counts, with the time it had run (a lower bound of its
+latency), so the slow attempts that trigger hedges stay in the estimate.
+
+Attempts run on one background asyncio loop with ``AsyncOpenAI`` so a
+cancelled attempt really closes its connection. The loop thread and the
+client are created on the first call, or up front by ``warm``; a forked
+process must call ``warm`` itself, since threads do not survive a fork.
+
+Metrics (``GET /metrics``), per call type:
+
+- ``llm.<type>.calls``, ``.hedged``, ``.cancelled``, ``.errors``;
+- ``llm.<type>.wins.<primary|hedge>.<model>``: which attempt won;
+- timings ``llm.<type>.latency`` (whole call, what the student waits),
+  ``llm.<type>.<primary|hedge>.latency`` (attempts by role; the primary one
+  sets the hedge delay) and ``llm.<type>.<model>.latency`` (each finished
+  attempt).
+
+Policies are configured with ``MODEL_POLICIES``, a JSON object of per-type
+overrides, e.g. ``{"step": {"hedge_model": null}}`` to stop hedging steps.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Optional
+
+from .metrics import metrics
+
+# hedging needs a stable tail estimate before it trusts the observed p95
+MIN_LATENCY_SAMPLES = 20
+
+
+@dataclass(frozen=True)
+class Policy:
+    model: str
+    hedge_model: Optional[str] = None  # None disables hedging
+    hedge_percentile: float = 95.0
+    default_hedge_delay: float = 10.0  # used until enough latencies are recorded
+    min_hedge_delay: float = 1.0
+    max_hedge_delay: float = 30.0
+    timeout: float = 120.0
+
+
+DEFAULT_POLICIES = {
+    "step": Policy("gpt-5-nano", hedge_model="gpt-5-mini", default_hedge_delay=12.0, min_hedge_delay=3.0),
+    "answer": Policy("gpt-5-nano", hedge_model="gpt-5-mini", default_hedge_delay=5.0, timeout=60.0),
+    "question": Policy("gpt-5-nano", hedge_model="gpt-5-mini", default_hedge_delay=6.0, timeout=60.0),
+}
+
+
+def build_policies(overrides: Optional[Dict[str, dict]] = None) -> Dict[str, Policy]:
+    """Apply per-call-type overrides (plain dicts, as in ``MODEL_POLICIES``) to the defaults."""
+    known = {f.name for f in fields(Policy)}
+    policies = dict(DEFAULT_POLICIES)
+    for call_type, values in (overrides or {}).items():
+        unknown = set(values) - known
+        if unknown:
+            raise ValueError(f"unknown policy fields for {call_type}: {sorted(unknown)}")
+        base = policies.get(call_type) or Policy(values.get("model") or DEFAULT_POLICIES["step"].model)
+        policies[call_type] = replace(base, **values)
+    return policies
+
+
+class EmptyParse(Exception):
+    """The model answered but produced no structured output."""
+
+
+class Router:
+    def __init__(self, policies: Optional[Dict[str, Policy]] = None):
+        self.policies = policies or dict(DEFAULT_POLICIES)
+        self._loop = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def configure(self, overrides: Optional[Dict[str, dict]] = None):
+        self.policies = build_policies(overrides)
+
+    def policy(self, call_type: str) -> Policy:
+        return self.policies.get(call_type) or DEFAULT_POLICIES["step"]
+
+    def hedge_delay(self, call_type: str, policy: Policy) -> float:
+        observed = metrics.quantile(
+            f"llm.{call_type}.primary.latency", policy.hedge_percentile, min_samples=MIN_LATENCY_SAMPLES
+        )
+        delay = policy.default_hedge_delay if observed is None else observed
+        return min(policy.max_hedge_delay, max(policy.min_hedge_delay, delay))
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-router", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def warm(self):
+        """Start the loop thread and create the async client now instead of on the first call."""
+        asyncio.run_coroutine_threadsafe(self._warm(), self._ensure_loop()).result()
+
+    async def _warm(self):
+        self._async_client()
+
+    def _async_client(self):
+        # only touched from the loop thread
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def parse(self, call_type: str, **kwargs):
+        """
+        ``client.responses.parse(**kwargs)`` routed by the policy for ``call_type``.
+
+        Args:
+            call_type: Which policy to use ("step", "answer", "question").
+            **kwargs: Passed to ``responses.parse``, except ``model``, which
+                the policy picks.
+
+        Returns:
+            The winning response (its ``output_parsed`` is not None).
+        """
+        policy = self.policy(call_type)
+        future = asyncio.run_coroutine_threadsafe(self._hedged(call_type, policy, kwargs), self._ensure_loop())
+        try:
+            return future.result(timeout=policy.timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def _attempt(self, call_type: str, role: str, model: str, kwargs: dict):
+        started = time.perf_counter()
+        response = await self._async_client().responses.parse(model=model, **kwargs)
+        elapsed = time.perf_counter() - started
+        metrics.observe(f"llm.{call_type}.{role}.latency", elapsed)
+        metrics.observe(f"llm.{call_type}.{model}.latency", elapsed)
+        if response.output_parsed is None:
+            raise EmptyParse(model)
+        return response
+
+    async def _hedged(self, call_type: str, policy: Policy, kwargs: dict):
+        started = time.perf_counter()
+        metrics.incr(f"llm.{call_type}.calls")
+        attempts = {
+            asyncio.ensure_future(self._attempt(call_type, "primary", policy.model, kwargs)): ("primary", policy.model)
+        }
+        hedge_at = started + self.hedge_delay(call_type, policy) if policy.hedge_model else None
+        error = None
+        try:
+            while attempts:
+                wait = None if hedge_at is None else max(0.0, hedge_at - time.perf_counter())
+                done, _ = await asyncio.wait(attempts, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    label, model = attempts.pop(task)
+                    if task.exception() is None:
+                        metrics.incr(f"llm.{call_type}.wins.{label}.{model}")
+                        metrics.observe(f"llm.{call_type}.latency", time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+                    metrics.incr(f"llm.{call_type}.errors")
+                # hedge once: when the primary is slow, or straight away if it failed
+                if hedge_at is not None and (not attempts or time.perf_counter() >= hedge_at):
+                    hedge_at = None
+                    metrics.incr(f"llm.{call_type}.hedged")
+                    attempts[asyncio.ensure_future(self._attempt(call_type, "hedge", policy.hedge_model, kwargs))] = (
+                        "hedge",
+                        policy.hedge_model,
+                    )
+            raise error
+        finally:
+            for task, (label, _) in attempts.items():
+                task.cancel()
+                metrics.incr(f"llm.{call_type}.cancelled")
+                if label == "primary":
+                    # censored at cancellation: at least this slow
+                    metrics.observe(f"llm.{call_type}.primary.latency", time.perf_counter() - started)
+
+
+router = Router()
@@ -0,0 +1,90 @@
+"""
+Lecture runs.
+
+Each pass through a lecture is a run. Slides and the lecture's student model
+(``ConceptMastery`` / ``ConceptEvent``) are keyed by ``(lecture_id, run)``
+and only rows of ``Lecture.current_run`` are live. Starting over just bumps
+the counter, so a reset costs the same however long the lecture was; the
+superseded rows stay queryable until ``app.collector`` purges them.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import func, insert, literal, select
+
+from .models import ConceptMastery, Lecture, Slide
+
+
+def start_run(db, lecture: Lecture, carry_concepts: bool = False) -> int:
+    """
+    Make a new, empty run current for ``lecture`` (caller commits).
+
+    Args:
+        db: An open SQLAlchemy session.
+        lecture: The lecture to restart.
+        carry_concepts: Copy the current run's concept mastery into the new
+            run instead of starting the student model from scratch.
+
+    Returns:
+        The new run number.
+    """
+    old_run = lecture.current_run or 0
+    # atomic bump, so two concurrent resets still produce distinct runs
+    db.query(Lecture).filter(Lecture.id == lecture.id).update(
+        {Lecture.current_run: Lecture.current_run + 1, Lecture.run_started_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.refresh(lecture)
+    if carry_concepts:
+        db.execute(
+            insert(ConceptMastery).from_select(
+                ["lecture_id", "run", "concept", "mastery", "evidence"],
+                select(
+                    ConceptMastery.lecture_id,
+                    literal(lecture.current_run),
+                    ConceptMastery.concept,
+                    ConceptMastery.mastery,
+                    ConceptMastery.evidence,
+                ).where(ConceptMastery.lecture_id == lecture.id, ConceptMastery.run == old_run),
+            )
+        )
+    lecture.script = ""
+    return lecture.current_run
+
+
+def current_slide(db, lecture_id: int, slide_number: int, run: int = None):
+    """The slide in ``run``, or in the lecture's current run when ``run`` is None."""
+    query = db.query(Slide).filter(Slide.lecture_id == lecture_id, Slide.slide_number == slide_number)
+    if run is not None:
+        return query.filter(Slide.run == run).first()
+    return query.join(Lecture, Lecture.id == Slide.lecture_id).filter(Slide.run == Lecture.current_run).first()
+
+
+def has_slides(db, lecture: Lecture) -> bool:
+    return (
+        db.query(Slide.id)
+        .filter(Slide.lecture_id == lecture.id, Slide.run == lecture.current_run)
+        .first()
+        is not None
+    )
+
+
+def list_runs(db, lecture_id: int) -> list:
+    """Runs of a lecture that still have slides, newest first."""
+    rows = (
+        db.query(Slide.run, func.count(Slide.id))
+        .filter(Slide.lecture_id == lecture_id)
+        .group_by(Slide.run)
+        .order_by(Slide.run.desc())
+        .all()
+    )
+    return [{"run": run, "slides": count} for run, count in rows]
+
+
+def run_slides(db, lecture_id: int, run: int) -> list:
+    return (
+        db.query(Slide)
+        .filter(Slide.lecture_id == lecture_id, Slide.run == run)
+        .order_by(Slide.slide_number)
+        .all()
+    )
@@ -0,0 +1,151 @@
+"""
+Coalescing of duplicate work.
+
+``SingleFlight`` makes concurrent callers with the same key in one process
+share a single execution: the first caller runs the function, the others
+wait for it and get the same result (or exception).
+
+``advisory_lock`` extends that across workers: a named lock held in the
+database (MySQL ``GET_LOCK``) or, for SQLite and other single-host setups,
+an ``flock`` on a file in the temp directory. It reports whether the
+caller had to wait, so the caller can check whether the work it was about
+to do has just been done by someone else.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+LOCK_DIR = os.path.join(tempfile.gettempdir(), "deepest_learning-locks")
+FILE_LOCK_POLL = 0.05
+
+
+class LockTimeout(Exception):
+    """The advisory lock could not be acquired in time."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key de-duplication of concurrent calls within one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run ``fn()`` unless a call for ``key`` is already in flight, in which
+        case wait for that call instead.
+
+        Returns:
+            ``(result, shared)``, where ``shared`` is True if the result came
+            from another caller's execution.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+@contextmanager
+def _mysql_lock(engine, name: str, timeout: float):
+    with engine.connect() as conn:
+        # GET_LOCK belongs to the connection, so hold this one until release
+        if conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name}).scalar() == 1:
+            waited = False
+        elif conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": timeout}).scalar() == 1:
+            waited = True
+        else:
+            raise LockTimeout(name)
+        try:
+            yield waited
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+
+@contextmanager
+def _file_lock(scope: str, name: str, timeout: float):
+    if fcntl is None:
+        yield False
+        return
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    digest = hashlib.sha1(f"{scope}\0{name}".encode()).hexdigest()
+    fd = os.open(os.path.join(LOCK_DIR, f"{digest}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        waited = False
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(name)
+                waited = True
+                time.sleep(FILE_LOCK_POLL)
+        try:
+            yield waited
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def advisory_lock(engine, name: str, timeout: float):
+    """
+    Hold a lock named ``name`` shared by all workers using ``engine``'s database.
+
+    Args:
+        engine: The SQLAlchemy engine; MySQL uses ``GET_LOCK``, anything
+            else a file lock scoped to the database URL (one host only).
+        name: Lock name (at most 64 characters for MySQL).
+        timeout: Seconds to wait before raising ``LockTimeout``.
+
+    Yields:
+        True if another holder had to be waited for.
+    """
+    if engine.dialect.name == "mysql":
+        with _mysql_lock(engine, name, timeout) as waited:
+            yield waited
+    else:
+        with _file_lock(str(engine.url), name, timeout) as waited:
+            yield waited
@@ -0,0 +1,203 @@
+"""
+Pre-rendered slide images.
+
+Light clients (phones, the lecture list's thumbnails) should not have to
+download and parse a whole PDF to show one slide. After an upload has been
+split into pages (``app/preprocess.py``), every page is rasterized once and
+stored next to its other artifacts in ``<upload folder>/pages/<sha256>/``:
+
+- ``<n>.w<width>.<ext>``: page ``n`` scaled to ``width`` pixels, for each of
+  ``SLIDE_IMAGE_WIDTHS`` (a thumbnail, a screen size and a large size by
+  default), encoded as ``SLIDE_IMAGE_FORMAT`` (WebP by default);
+- ``images.json``: widths, format and each page's aspect ratio, written
+  last, so its presence means every image is there.
+
+A page is rendered once, at the largest width, and scaled down for the
+others. Rendering uses the preprocessing process pool and the same chunks;
+it starts after the split, so it never delays ``/step``.
+
+Image URLs name the document by digest, so they never change meaning and are
+served with ``Cache-Control: immutable``: browsers and CDNs keep them for a
+year without revalidating. An image requested before the background render
+reached it is rendered on the spot. ``GET /lectures/slide-images/<id>``
+tells clients the URLs and whether everything is rendered.
+
+Rendering needs ``pypdfium2`` and ``Pillow``; without them (or with
+``SLIDE_IMAGES=0``) ``available()`` is False, ``/slide-images`` says so and
+image requests answer 501, while the rest of the API works as before.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import as_completed
+from typing import Optional
+
+from . import pool_tasks, preprocess
+from .metrics import metrics
+from .singleflight import SingleFlight
+
+try:
+    import pypdfium2
+    from PIL import Image
+except ImportError:  # optional: rendering is off without them
+    pypdfium2 = None
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (240, 960, 1600)
+# format -> (Pillow encoder, mimetype, file extension)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "png": ("PNG", "image/png", "png"),
+}
+MANIFEST = "images.json"
+
+_settings = {"enabled": True, "widths": DEFAULT_WIDTHS, "format": "webp", "quality": 80}
+_flight = SingleFlight()
+# PDFium is not thread-safe: renders in this process (on demand, small decks) take turns
+_render_lock = threading.Lock()
+
+
+def configure(enabled: bool = None, widths=None, fmt: str = None, quality: int = None):
+    """Set the rendered widths, image format and encoder quality."""
+    if enabled is not None:
+        _settings["enabled"] = enabled
+    if widths:
+        if isinstance(widths, str):
+            widths = [int(w) for w in widths.split(",") if w.strip()]
+        _settings["widths"] = tuple(sorted(set(widths)))
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown slide image format {fmt!r}; use one of {sorted(FORMATS)}")
+        _settings["format"] = fmt
+    if quality:
+        _settings["quality"] = quality
+
+
+def available() -> bool:
+    return _settings["enabled"] and pypdfium2 is not None
+
+
+def widths() -> tuple:
+    return _settings["widths"]
+
+
+def extension() -> str:
+    return FORMATS[_settings["format"]][2]
+
+
+def mimetype() -> str:
+    return FORMATS[_settings["format"]][1]
+
+
+def image_path(digest: str, page: int, width: int) -> str:
+    return os.path.join(preprocess.pages_dir(digest), f"{page}.w{width}.{extension()}")
+
+
+def manifest(digest: str) -> Optional[dict]:
+    """The document's ``images.json`` if it matches the current settings, else None."""
+    try:
+        with open(os.path.join(preprocess.pages_dir(digest), MANIFEST)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format") != _settings["format"] or tuple(data.get("widths", ())) != _settings["widths"]:
+        return None
+    return data
+
+
+def _render_args(settings: dict) -> tuple:
+    """Encoder, extension, widths and quality for ``pool_tasks.render_pages``."""
+    encoder, _, ext = FORMATS[settings["format"]]
+    return encoder, ext, settings["widths"], settings["quality"]
+
+
+def render_document(pdf_path: str, digest: str, page_count: int) -> int:
+    """
+    Render every page of a preprocessed upload unless that was done already.
+
+    Args:
+        pdf_path: The stored upload.
+        digest: Its SHA-256 (names the pages directory).
+        page_count: Number of pages.
+
+    Returns:
+        The number of pages rendered.
+    """
+    if manifest(digest) is not None:
+        return 0
+    out_dir = preprocess.pages_dir(digest)
+    os.makedirs(out_dir, exist_ok=True)
+    settings = dict(_settings)
+    args = _render_args(settings)
+    ranges = preprocess._page_ranges(page_count)
+    aspect = {}
+    if len(ranges) == 1:
+        with _render_lock:
+            results = [pool_tasks.render_pages(pdf_path, out_dir, first, last, *args) for first, last in ranges]
+    else:
+        pool = preprocess._get_pool(preprocess._settings["workers"])
+        futures = [pool.submit(pool_tasks.render_pages, pdf_path, out_dir, first, last, *args) for first, last in ranges]
+        results = (future.result() for future in as_completed(futures))
+    for pages in results:
+        aspect.update(pages)
+
+    data = {
+        "sha256": digest,
+        "pages": page_count,
+        "format": settings["format"],
+        "widths": list(settings["widths"]),
+        "aspect": [aspect[n] for n in range(1, page_count + 1)],
+    }
+    path = os.path.join(out_dir, MANIFEST)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+    return page_count
+
+
+def render(pdf_path: str, digest: str, page_count: int):
+    """Render a document's images after preprocessing; failures are logged, never raised."""
+    if not available():
+        return
+    started = time.perf_counter()
+    try:
+        rendered, _ = _flight.do(digest, lambda: render_document(pdf_path, digest, page_count))
+    except Exception:
+        logger.exception("rendering slide images of %s failed", pdf_path)
+        metrics.incr("slide_images.failed")
+        return
+    if rendered:
+        metrics.observe("slide_images.document", time.perf_counter() - started)
+        metrics.incr("slide_images.pages", rendered)
+
+
+def ensure_image(pdf_path: str, digest: str, page: int, width: int) -> str:
+    """
+    Path of one page image, rendering that page now if the background render has not.
+
+    ``width`` must be one of ``widths()`` and ``page`` within the document.
+    """
+    path = image_path(digest, page, width)
+    if os.path.isfile(path):
+        metrics.incr("slide_images.hit")
+        return path
+
+    def render_page():
+        if not os.path.isfile(path):
+            out_dir = preprocess.pages_dir(digest)
+            os.makedirs(out_dir, exist_ok=True)
+            with _render_lock:
+                pool_tasks.render_pages(pdf_path, out_dir, page, page, *_render_args(_settings))
+            metrics.incr("slide_images.rendered_on_demand")
+
+    started = time.perf_counter()
+    _flight.do((digest, page), render_page)
+    metrics.observe("slide_images.on_demand", time.perf_counter() - started)
+    return path
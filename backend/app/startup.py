@@ -0,0 +1,57 @@
+"""
+Startup timing and readiness state.
+
+``create_app`` and the lazy loaders record how long each startup phase took
+(``timed``) and flag components as ready (``set_ready``). ``/healthz`` only
+says the process is alive; ``/readyz`` uses ``readiness`` to say whether it
+can serve traffic.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import metrics
+
+PROCESS_START = time.time()
+
+_lock = threading.Lock()
+_phases = {}
+_components = {}
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def record(phase: str, seconds: float):
+    with _lock:
+        _phases[phase] = seconds
+    metrics.gauge(f"startup.{phase}_seconds", seconds)
+
+
+def phases() -> dict:
+    with _lock:
+        return dict(_phases)
+
+
+def require(component: str):
+    """Declare a component that must be ready before ``/readyz`` reports ready."""
+    with _lock:
+        _components.setdefault(component, False)
+
+
+def set_ready(component: str, ready: bool = True):
+    with _lock:
+        _components[component] = ready
+
+
+def readiness() -> dict:
+    with _lock:
+        components = dict(_components)
+    return {"ready": all(components.values()), "components": components}
@@ -0,0 +1,261 @@
+"""
+Compact, structured model of what a student understands in a lecture.
+
+Instead of a free-form hypothesis that the LLM rewrites on every call, we keep
+one ``ConceptMastery`` row per concept (mastery in ``[0, 1]`` plus an evidence
+count). The LLM returns small ``ConceptDelta`` updates that are applied here,
+and prompts only see a bounded rendering of the concepts relevant to the
+current slide, so prompt size stays constant over a long session.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from .metrics import metrics
+from .models import ConceptEvent, ConceptMastery
+
+logger = logging.getLogger(__name__)
+
+# upper bound on concepts rendered into any single prompt
+MAX_RENDERED_CONCEPTS = 8
+PRIOR_MASTERY = 0.5
+NO_EVIDENCE_TEXT = "We have no knowledge of the user's understanding"
+
+
+class ConceptDelta(BaseModel):
+    concept: str
+    delta: float
+
+
+def normalize_concept(name: str) -> str:
+    """Canonical form of a concept name, used as the lookup key."""
+    return re.sub(r"\s+", " ", (name or "").strip().lower())[:255]
+
+
+def parse_concepts(raw: Optional[str]) -> List[str]:
+    """Decode a ``Slide.concepts`` JSON column."""
+    if not raw:
+        return []
+    try:
+        return [c for c in json.loads(raw) if isinstance(c, str)]
+    except ValueError:
+        return []
+
+
+def dump_concepts(concepts: Iterable[str]) -> str:
+    """Encode concept names for ``Slide.concepts``, normalized and de-duplicated."""
+    seen = []
+    for concept in concepts or []:
+        key = normalize_concept(concept)
+        if key and key not in seen:
+            seen.append(key)
+    return json.dumps(seen)
+
+
+def merge_deltas(deltas: Iterable[ConceptDelta]) -> dict:
+    """Sum deltas per normalized concept, each clamped to ``[-1, 1]``."""
+    merged = {}
+    for delta in deltas or []:
+        key = normalize_concept(delta.concept)
+        if key:
+            merged[key] = merged.get(key, 0.0) + max(-1.0, min(1.0, float(delta.delta)))
+    return merged
+
+
+def apply_deltas(
+    db,
+    lecture_id: int,
+    deltas: Iterable[ConceptDelta],
+    student_id: Optional[int] = None,
+    source: Optional[str] = None,
+    run: int = 0,
+) -> List[ConceptMastery]:
+    """
+    Apply LLM-proposed deltas to the lecture's concept table (caller commits).
+
+    Args:
+        db: An open SQLAlchemy session.
+        lecture_id: The lecture whose student model is updated.
+        deltas: Changes in mastery; each is clamped to ``[-1, 1]`` and the
+            resulting mastery to ``[0, 1]``.
+        student_id: If the lecture belongs to a student, the changes are also
+            folded into their cross-lecture profile.
+        source: What produced the deltas, recorded in the ``ConceptEvent`` history.
+        run: The lecture run the deltas belong to (``Lecture.current_run``).
+
+    Returns:
+        The updated (or newly created) rows.
+    """
+    merged = merge_deltas(deltas)
+    if not merged:
+        return []
+
+    rows = {
+        row.concept: row
+        for row in db.query(ConceptMastery)
+        .filter(
+            ConceptMastery.lecture_id == lecture_id,
+            ConceptMastery.run == run,
+            ConceptMastery.concept.in_(list(merged)),
+        )
+        .all()
+    }
+    updated = []
+    changes = []
+    for key, change in merged.items():
+        row = rows.get(key)
+        if row is None:
+            row = ConceptMastery(lecture_id=lecture_id, run=run, concept=key, mastery=PRIOR_MASTERY, evidence=0)
+            db.add(row)
+        old_mastery = row.mastery if row.mastery is not None else PRIOR_MASTERY
+        old_evidence = row.evidence or 0
+        row.mastery = max(0.0, min(1.0, old_mastery + change))
+        row.evidence = old_evidence + 1
+        updated.append(row)
+        changes.append((key, old_mastery, old_evidence, row.mastery, row.evidence))
+        db.add(ConceptEvent(lecture_id=lecture_id, run=run, concept=key, delta=change, mastery=row.mastery, source=source))
+
+    if student_id is not None:
+        from .student_profile import fold
+
+        fold(db, student_id, changes, lecture_id=lecture_id, run=run)
+    return updated
+
+
+def relevant_concepts(
+    db, lecture_id: int, focus: Iterable[str] = (), limit: int = MAX_RENDERED_CONCEPTS, run: int = 0
+) -> List[ConceptMastery]:
+    """
+    Pick at most ``limit`` concepts for a prompt.
+
+    Concepts named in ``focus`` (typically the slide's concepts) come first; any
+    remaining room goes to the concepts with the least mastery.
+    """
+    focus_keys = [normalize_concept(c) for c in focus or [] if normalize_concept(c)]
+    chosen = []
+    if focus_keys:
+        by_key = {
+            row.concept: row
+            for row in db.query(ConceptMastery)
+            .filter(
+                ConceptMastery.lecture_id == lecture_id,
+                ConceptMastery.run == run,
+                ConceptMastery.concept.in_(focus_keys),
+            )
+            .all()
+        }
+        chosen = [by_key[k] for k in dict.fromkeys(focus_keys) if k in by_key][:limit]
+    if len(chosen) < limit:
+        taken = [row.concept for row in chosen]
+        query = db.query(ConceptMastery).filter(ConceptMastery.lecture_id == lecture_id, ConceptMastery.run == run)
+        if taken:
+            query = query.filter(ConceptMastery.concept.notin_(taken))
+        chosen += (
+            query.order_by(ConceptMastery.mastery.asc(), ConceptMastery.evidence.desc())
+            .limit(limit - len(chosen))
+            .all()
+        )
+    return chosen
+
+
+def pick_relevant(rows: Iterable, focus: Iterable[str] = (), limit: int = MAX_RENDERED_CONCEPTS) -> list:
+    """``relevant_concepts`` over rows already in memory: same selection and order."""
+    by_key = {row.concept: row for row in rows}
+    focus_keys = [normalize_concept(c) for c in focus or [] if normalize_concept(c)]
+    chosen = [by_key[k] for k in dict.fromkeys(focus_keys) if k in by_key][:limit]
+    taken = {row.concept for row in chosen}
+    rest = sorted((row for row in by_key.values() if row.concept not in taken), key=lambda r: (r.mastery, -r.evidence))
+    return chosen + rest[: limit - len(chosen)]
+
+
+def render(rows: Iterable[ConceptMastery]) -> str:
+    """Render concept rows as the compact text block the prompts expect."""
+    lines = [
+        f"- {row.concept}: mastery {row.mastery:.2f} ({row.evidence} observation{'s' if row.evidence != 1 else ''})"
+        for row in rows
+    ]
+    return "\n".join(lines) if lines else NO_EVIDENCE_TEXT
+
+
+def render_for(db, lecture_id: int, focus: Iterable[str] = (), run: int = 0) -> str:
+    """Shortcut for ``render(relevant_concepts(...))``."""
+    return render(relevant_concepts(db, lecture_id, focus, run=run))
+
+
+class DeferredDeltas:
+    """
+    Concept updates applied off the request path, in batches.
+
+    Locally graded answers queue their deltas here instead of writing them
+    before responding; a background thread applies everything queued every
+    ``interval`` seconds in one transaction. Code that is about to read a
+    lecture's model calls ``flush(lecture_id)`` first.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, lecture_id: int, run: int, deltas: Iterable[ConceptDelta], student_id=None, source=None):
+        with self._lock:
+            self._pending.append((lecture_id, run, list(deltas), student_id, source))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="deferred-deltas", daemon=True)
+                self._thread.start()
+        metrics.incr("student_model.deferred")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, lecture_id: Optional[int] = None) -> int:
+        """Apply queued updates (all of them, or one lecture's); returns how many were applied."""
+        from .db import get_db
+
+        with self._flush_lock:
+            with self._lock:
+                if lecture_id is None:
+                    batch, self._pending = self._pending, []
+                else:
+                    batch = [p for p in self._pending if p[0] == lecture_id]
+                    self._pending = [p for p in self._pending if p[0] != lecture_id]
+            if not batch:
+                return 0
+            db_gen = get_db()
+            db = next(db_gen)
+            try:
+                for queued_lecture, run, deltas, student_id, source in batch:
+                    apply_deltas(db, queued_lecture, deltas, student_id=student_id, source=source, run=run)
+                    # later entries may touch the same concepts
+                    db.flush()
+                db.commit()
+                metrics.incr("student_model.deferred_applied", len(batch))
+            except Exception:
+                db.rollback()
+                metrics.incr("student_model.deferred_failed", len(batch))
+                logger.exception("applying %d deferred concept updates failed", len(batch))
+                return 0
+            finally:
+                try:
+                    next(db_gen)
+                except StopIteration:
+                    pass
+            return len(batch)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            if self.pending():
+                self.flush()
+
+
+deferred = DeferredDeltas()
@@ -0,0 +1,240 @@
+"""
+Cross-lecture student profile.
+
+Per-lecture ``ConceptMastery`` changes are folded into ``StudentConcept`` rows
+as they happen (an evidence-weighted mean, kept as a running sum), so the
+profile is never rebuilt by scanning a student's lectures. The prose summary
+passed to the prompts as ``student_hypothesis`` is stored on ``Student`` and
+only rebuilt after the profile changed, with an in-process cache in front.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from .cache import LRUCache
+from .models import ConceptMastery, Student, StudentConcept
+from .student_model import PRIOR_MASTERY, normalize_concept
+
+SUMMARY_CONCEPTS = 4
+NO_PROFILE_TEXT = "No prior lectures with this student."
+
+# student_id -> (profile_version, summary)
+_summaries = LRUCache(maxsize=4096)
+
+# (concept, old_mastery, old_evidence, new_mastery, new_evidence)
+ConceptChange = Tuple[str, float, int, float, int]
+
+
+def fold(db, student_id: int, changes: Iterable[ConceptChange], lecture_id: int = None, run: int = 0):
+    """
+    Fold per-lecture concept changes into the student's aggregate (caller commits).
+
+    Args:
+        db: An open SQLAlchemy session.
+        student_id: The student the lecture belongs to.
+        changes: Before/after mastery and evidence of each changed lecture concept.
+        lecture_id: The lecture the changes come from. A concept's first
+            evidence in a run only counts as another lecture if no earlier
+            run of the lecture had evidence on it, so resets do not inflate
+            ``StudentConcept.lectures``.
+        run: The run the changes belong to.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    seen_before = set()
+    first_evidence = [c[0] for c in changes if not c[2]]
+    if lecture_id is not None and first_evidence:
+        seen_before = {
+            concept
+            for (concept,) in db.query(ConceptMastery.concept)
+            .filter(
+                ConceptMastery.lecture_id == lecture_id,
+                ConceptMastery.run != run,
+                ConceptMastery.concept.in_(first_evidence),
+                ConceptMastery.evidence > 0,
+            )
+            .distinct()
+        }
+    rows = {
+        row.concept: row
+        for row in db.query(StudentConcept)
+        .filter(
+            StudentConcept.student_id == student_id,
+            StudentConcept.concept.in_([c[0] for c in changes]),
+        )
+        .all()
+    }
+    for concept, old_mastery, old_evidence, new_mastery, new_evidence in changes:
+        row = rows.get(concept)
+        if row is None:
+            row = StudentConcept(
+                student_id=student_id, concept=concept, weighted_mastery=0.0, evidence=0, lectures=0
+            )
+            db.add(row)
+            rows[concept] = row
+        row.weighted_mastery = (row.weighted_mastery or 0.0) + new_mastery * new_evidence - old_mastery * old_evidence
+        row.evidence = (row.evidence or 0) + new_evidence - old_evidence
+        if not old_evidence and concept not in seen_before:
+            row.lectures = (row.lectures or 0) + 1
+        row.mastery = row.weighted_mastery / row.evidence if row.evidence > 0 else PRIOR_MASTERY
+
+    db.execute(
+        update(Student)
+        .where(Student.id == student_id)
+        .values(profile_version=Student.profile_version + 1)
+    )
+    _summaries.invalidate(student_id)
+
+
+def _build_summary(db, student_id: int) -> str:
+    base = db.query(StudentConcept).filter(
+        StudentConcept.student_id == student_id, StudentConcept.evidence > 0
+    )
+    strong = (
+        base.filter(StudentConcept.mastery >= 0.5)
+        .order_by(StudentConcept.mastery.desc(), StudentConcept.evidence.desc())
+        .limit(SUMMARY_CONCEPTS)
+        .all()
+    )
+    weak = (
+        base.filter(StudentConcept.mastery < 0.5)
+        .order_by(StudentConcept.mastery.asc(), StudentConcept.evidence.desc())
+        .limit(SUMMARY_CONCEPTS)
+        .all()
+    )
+    return _format_summary(strong, weak)
+
+
+def _build_summaries(db, student_ids: List[int]) -> dict:
+    """``_build_summary`` for several students, from one query."""
+    rows = {student_id: [] for student_id in student_ids}
+    if student_ids:
+        for row in db.query(StudentConcept).filter(
+            StudentConcept.student_id.in_(student_ids), StudentConcept.evidence > 0
+        ):
+            rows[row.student_id].append(row)
+    summaries = {}
+    for student_id, concepts in rows.items():
+        strong = sorted((r for r in concepts if r.mastery >= 0.5), key=lambda r: (-r.mastery, -r.evidence))
+        weak = sorted((r for r in concepts if r.mastery < 0.5), key=lambda r: (r.mastery, -r.evidence))
+        summaries[student_id] = _format_summary(strong[:SUMMARY_CONCEPTS], weak[:SUMMARY_CONCEPTS])
+    return summaries
+
+
+def _format_summary(strong, weak) -> str:
+    if not strong and not weak:
+        return NO_PROFILE_TEXT
+
+    def fmt(rows):
+        return ", ".join(f"{r.concept} ({r.mastery:.2f} over {r.lectures} lecture{'s' if r.lectures != 1 else ''})" for r in rows)
+
+    lines = []
+    if strong:
+        lines.append(f"Strengths from previous lectures: {fmt(strong)}")
+    if weak:
+        lines.append(f"Needs work from previous lectures: {fmt(weak)}")
+    return "\n".join(lines)
+
+
+def get_summary(db, student_id: Optional[int]) -> str:
+    """
+    Return the student's cross-lecture summary, rebuilding it only if stale.
+
+    Args:
+        db: An open SQLAlchemy session; a rebuilt summary is written back and
+            committed with the caller's transaction.
+        student_id: The student, or ``None`` for anonymous lectures.
+
+    Returns:
+        The summary text, or an empty string for anonymous lectures.
+    """
+    if student_id is None:
+        return ""
+    versions = (
+        db.query(Student.profile_version, Student.summary_version)
+        .filter(Student.id == student_id)
+        .first()
+    )
+    if versions is None:
+        return ""
+    profile_version, summary_version = versions
+
+    cached = _summaries.get(student_id)
+    if cached is not None and cached[0] == profile_version:
+        return cached[1]
+
+    if summary_version == profile_version:
+        summary = db.query(Student.student_hypothesis).filter(Student.id == student_id).scalar()
+    else:
+        summary = None
+    if summary is None:
+        summary = _build_summary(db, student_id)
+        db.execute(
+            update(Student)
+            .where(Student.id == student_id, Student.profile_version == profile_version)
+            .values(student_hypothesis=summary, summary_version=profile_version)
+        )
+    _summaries.set(student_id, (profile_version, summary))
+    return summary
+
+
+def list_students(db, after_id: int = 0, limit: int = 50) -> List[dict]:
+    """Keyset-paginated page of students with their summaries, ordered by id."""
+    students = (
+        db.query(Student)
+        .filter(Student.id > after_id)
+        .order_by(Student.id.asc())
+        .limit(limit)
+        .all()
+    )
+    # summaries come from the loaded rows; only stale ones are rebuilt, all in one query
+    summaries = {}
+    stale = []
+    for s in students:
+        cached = _summaries.get(s.id)
+        if cached is not None and cached[0] == s.profile_version:
+            summaries[s.id] = cached[1]
+        elif s.summary_version == s.profile_version and s.student_hypothesis is not None:
+            summaries[s.id] = s.student_hypothesis
+            _summaries.set(s.id, (s.profile_version, s.student_hypothesis))
+        else:
+            stale.append(s)
+    rebuilt = _build_summaries(db, [s.id for s in stale])
+    for s in stale:
+        summaries[s.id] = rebuilt[s.id]
+        db.execute(
+            update(Student)
+            .where(Student.id == s.id, Student.profile_version == s.profile_version)
+            .values(student_hypothesis=rebuilt[s.id], summary_version=s.profile_version)
+        )
+        _summaries.set(s.id, (s.profile_version, rebuilt[s.id]))
+    return [{"id": s.id, "name": s.name, "profile": summaries[s.id]} for s in students]
+
+
+def students_by_concept(
+    db, concept: str, max_mastery: float = 1.0, after_id: int = 0, limit: int = 50
+) -> List[dict]:
+    """Keyset-paginated students with evidence on ``concept`` at or below ``max_mastery``."""
+    rows = (
+        db.query(StudentConcept)
+        .filter(
+            StudentConcept.concept == normalize_concept(concept),
+            StudentConcept.mastery <= max_mastery,
+            StudentConcept.id > after_id,
+        )
+        .order_by(StudentConcept.id.asc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "cursor": r.id,
+            "student_id": r.student_id,
+            "mastery": r.mastery,
+            "evidence": r.evidence,
+            "lectures": r.lectures,
+        }
+        for r in rows
+    ]
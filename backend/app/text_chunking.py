@@ -0,0 +1,186 @@
+"""
+Planning of text-to-speech synthesis units.
+
+Every call into the Kokoro pipeline has a fixed cost on top of the text it
+synthesizes, and a single segment is capped at 510 phoneme tokens. Splitting
+a script naively on ``[.!?]`` gets both ends wrong: "Dr. Smith" and "e.g. a
+tensor" become extra calls, a slide of short sentences becomes many tiny
+calls, and a long run-on sentence goes to the model in one piece.
+
+``split_sentences`` finds sentence boundaries that survive abbreviations,
+initials, decimals ("2.4 GHz") and version numbers; ``plan_chunks`` then packs
+consecutive sentences into units close to a target length and splits
+sentences that are too long at clause boundaries (then at word boundaries).
+
+Lengths are measured in characters by default. For English, characters and
+Kokoro phonemes are close enough that the default ``max_length`` keeps a unit
+well under the phoneme cap; pass ``measure`` to plan by another length.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+# a unit shorter than this is merged with its neighbour when possible
+DEFAULT_MIN_LENGTH = 40
+# units are packed up to about this length
+DEFAULT_TARGET_LENGTH = 200
+# hard limit for one unit, below Kokoro's 510 phoneme segment cap
+DEFAULT_MAX_LENGTH = 350
+
+# lowercase words that are usually followed by a period without ending a sentence
+ABBREVIATIONS = frozenset(
+    """
+    mr mrs ms dr prof sr jr st mt vs etc al fig figs eq eqs no nos vol vols ch sec secs approx
+    dept est min max avg ref refs p pp ed eds cf ca inc ltd co corp jan feb mar apr jun jul aug
+    sep sept oct nov dec mon tue wed thu fri sat sun
+    """.split()
+)
+# abbreviations after which a sentence usually continues, whatever follows
+_CONTINUING = frozenset("mr mrs ms dr prof st mt vs fig figs eq eqs no nos vol vols ch sec secs ref refs p pp cf ca approx".split())
+
+# end punctuation, then optional closing quotes/brackets, then whitespace
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)")
+# clause boundaries for splitting long sentences, strongest first
+_CLAUSE_BREAKS = (re.compile(r"[;:—](?=\s)|\s[–—-]\s"), re.compile(r",(?=\s)"))
+_LIST_MARKER = re.compile(r"\s*(?:\d+|[a-zA-Z])[.)]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class Chunk:
+    """
+    One synthesis unit: ``text`` covers sentences ``first`` to ``last`` (inclusive).
+
+    ``parts`` are the ``(sentence number, text)`` pieces ``text`` was joined
+    from, so the unit's audio can be split at sentence boundaries again.
+    """
+
+    text: str
+    first: int
+    last: int
+    parts: List[Tuple[int, str]] = field(default_factory=list)
+
+
+def _is_boundary(text: str, match: re.Match) -> bool:
+    """Whether the punctuation in ``match`` ends a sentence."""
+    if match.group().rstrip("\"'”’)]")[-1] in "!?…":
+        return True
+    word = re.search(r"(\S+)\.*$", text[: match.start() + 1].rstrip("."))
+    token = word.group(1) if word else ""
+    rest = text[match.end() :].lstrip()
+    next_char = rest[:1]
+    bare = token.lower().strip("(\"'“‘")
+
+    # "e.g.", "i.e.", "U.S.": dotted abbreviations (a missed boundary only
+    # makes one unit longer, a false one splits a phrase)
+    if re.fullmatch(r"(?:[a-z]\.)+[a-z]", bare):
+        return False
+    # "J. Smith": an initial
+    if len(bare) == 1 and bare.isalpha() and token[-1:].isupper() and token != "I":
+        return False
+    if bare in _CONTINUING:
+        return False
+    if bare in ABBREVIATIONS:
+        # "etc." ends a sentence only when a new one visibly starts
+        return next_char.isupper()
+    # a sentence does not continue in lowercase or with a closing bracket/comma
+    if next_char and (next_char.islower() or next_char in ",;:)]"):
+        return False
+    return True
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split ``text`` into sentences.
+
+    Abbreviations, initials, decimals and list markers ("1.") do not end a
+    sentence; blank lines and line breaks before list items always do.
+
+    Args:
+        text: The text to split.
+
+    Returns:
+        The sentences, whitespace-normalized, without empty ones.
+    """
+    sentences = []
+    for block in re.split(r"\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)", text or ""):
+        start = 0
+        for match in _BOUNDARY.finditer(block):
+            if _is_boundary(block, match) and not _LIST_MARKER.fullmatch(block[start : match.end()]):
+                sentences.append(block[start : match.end()])
+                start = match.end()
+        sentences.append(block[start:])
+    return [s for s in (_WHITESPACE.sub(" ", s).strip() for s in sentences) if s]
+
+
+def _split_long(sentence: str, max_length: int, target_length: int, measure: Callable[[str], int]) -> List[str]:
+    """Split one sentence longer than ``max_length`` at clause, then word, boundaries."""
+    if measure(sentence) <= max_length:
+        return [sentence]
+    for pattern in _CLAUSE_BREAKS:
+        # the break closest to the middle, so the pieces come out even
+        cuts = [m.end() for m in pattern.finditer(sentence) if 0 < m.end() < len(sentence)]
+        if cuts:
+            middle = min(len(sentence) // 2, target_length)
+            cut = min(cuts, key=lambda c: abs(c - middle))
+            head, tail = sentence[:cut].strip(), sentence[cut:].strip()
+            if head and tail:
+                return _split_long(head, max_length, target_length, measure) + _split_long(
+                    tail, max_length, target_length, measure
+                )
+    words = sentence.split(" ")
+    pieces, current = [], ""
+    for word in words:
+        candidate = f"{current} {word}".strip()
+        if current and measure(candidate) > target_length:
+            pieces.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def plan_chunks(
+    text: str,
+    target_length: int = DEFAULT_TARGET_LENGTH,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    min_length: int = DEFAULT_MIN_LENGTH,
+    measure: Callable[[str], int] = len,
+) -> List[Chunk]:
+    """
+    Plan the synthesis units for ``text``.
+
+    Consecutive sentences are packed into one unit while it stays within
+    ``target_length``; a sentence longer than ``max_length`` is split on its
+    own. A piece shorter than ``min_length`` (or following a unit that short)
+    is merged up to ``max_length`` instead, so short sentences never become a
+    call of their own when they have a neighbour.
+
+    Args:
+        text: The script to synthesize.
+        target_length: Length a unit is packed up to.
+        max_length: Length no unit exceeds (unless a single word does).
+        min_length: Units shorter than this are merged where possible.
+        measure: Length of a piece of text (characters by default).
+
+    Returns:
+        The units in order, each with the range of sentences it covers. Unit
+        text never contains line breaks, which Kokoro would split on again.
+    """
+    chunks: List[Chunk] = []
+    for number, sentence in enumerate(split_sentences(text)):
+        for piece in _split_long(sentence, max_length, target_length, measure):
+            if chunks:
+                last = chunks[-1]
+                merged = f"{last.text} {piece}"
+                short = measure(last.text) < min_length or measure(piece) < min_length
+                if measure(merged) <= target_length or (short and measure(merged) <= max_length):
+                    last.text = merged
+                    last.last = number
+                    last.parts.append((number, piece))
+                    continue
+            chunks.append(Chunk(piece, number, number, [(number, piece)]))
+    return chunks
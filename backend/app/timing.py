@@ -0,0 +1,237 @@
+"""
+Sentence and word timing tracks for synthesized slide audio.
+
+Kokoro yields ``(graphemes, phonemes, audio)`` per chunk, and newer versions
+also attach per-token timestamps. ``TimingTrack`` records sentence and word
+start/end sample offsets from those chunks while synthesis runs, in flat
+``array('I')`` buffers, and serializes them to a compact little-endian
+binary file (see ``to_bytes``) that the API can also render as JSON.
+``SentenceSplitter`` cuts a unit of several sentences back into sentences
+first, so both keep one entry per sentence.
+"""
+
+import struct
+import sys
+from array import array
+from types import SimpleNamespace
+
+MAGIC = b"DLTT"
+VERSION = 1
+_HEADER = struct.Struct("<4sHIII")  # magic, version, sample_rate, n_sentences, n_words
+
+
+def _word_spans(text: str):
+    return [w for w in (text or "").split() if w]
+
+
+class TimingTrack:
+    """
+    Binary layout (all integers little-endian uint32 unless noted)::
+
+        header    "DLTT", version (uint16), sample_rate, n_sentences, n_words
+        sentences n_sentences x (start_sample, end_sample)
+        words     n_words x (start_sample, end_sample, sentence)
+        text      UTF-8 words joined by "\\n"
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.sentences = array("I")  # start, end pairs
+        self.words = array("I")  # start, end, sentence triples
+        self.word_text = []
+        self.total_samples = 0
+        self._current_sentence = None
+
+    def add_chunk(self, sentence: int, graphemes: str, samples: int, tokens=None):
+        """
+        Record one synthesized chunk.
+
+        Args:
+            sentence: Index of the sentence the chunk belongs to.
+            graphemes: Text of the chunk.
+            samples: Number of audio samples produced for it.
+            tokens: Optional Kokoro tokens with ``text``/``start_ts``/``end_ts``
+                (seconds, relative to the chunk); when missing, word timings
+                are spread across the chunk in proportion to word length.
+        """
+        start = self.total_samples
+        end = start + samples
+        if sentence != self._current_sentence:
+            self.sentences.extend((start, end))
+            self._current_sentence = sentence
+        else:
+            self.sentences[-1] = end
+        sentence_slot = len(self.sentences) // 2 - 1
+
+        timed = [
+            t for t in tokens or []
+            if getattr(t, "start_ts", None) is not None and getattr(t, "end_ts", None) is not None and (t.text or "").strip()
+        ]
+        if timed:
+            for token in timed:
+                word_start = min(end, start + int(token.start_ts * self.sample_rate))
+                word_end = min(end, max(word_start, start + int(token.end_ts * self.sample_rate)))
+                self.words.extend((word_start, word_end, sentence_slot))
+                self.word_text.append(token.text.strip())
+        else:
+            words = _word_spans(graphemes)
+            weights = [len(w) + 1 for w in words]
+            total = sum(weights) or 1
+            cursor = 0
+            for word, weight in zip(words, weights):
+                word_start = start + samples * cursor // total
+                cursor += weight
+                self.words.extend((word_start, start + samples * cursor // total, sentence_slot))
+                self.word_text.append(word)
+        self.total_samples = end
+
+    def to_bytes(self) -> bytes:
+        sentences, words = array("I", self.sentences), array("I", self.words)
+        if sys.byteorder == "big":
+            sentences.byteswap()
+            words.byteswap()
+        return (
+            _HEADER.pack(MAGIC, VERSION, self.sample_rate, len(self.sentences) // 2, len(self.words) // 3)
+            + sentences.tobytes()
+            + words.tobytes()
+            + "\n".join(self.word_text).encode()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TimingTrack":
+        magic, version, sample_rate, n_sentences, n_words = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a timing track")
+        track = cls(sample_rate)
+        offset = _HEADER.size
+        track.sentences.frombytes(data[offset : offset + n_sentences * 8])
+        offset += n_sentences * 8
+        track.words.frombytes(data[offset : offset + n_words * 12])
+        offset += n_words * 12
+        if sys.byteorder == "big":
+            track.sentences.byteswap()
+            track.words.byteswap()
+        text = data[offset:].decode()
+        track.word_text = text.split("\n") if n_words else []
+        track.total_samples = track.sentences[-1] if n_sentences else 0
+        return track
+
+    def to_dict(self) -> dict:
+        s, w = self.sentences, self.words
+        return {
+            "sample_rate": self.sample_rate,
+            "sentences": [{"start": s[i], "end": s[i + 1]} for i in range(0, len(s), 2)],
+            "words": [
+                {"text": text, "start": w[i], "end": w[i + 1], "sentence": w[i + 2]}
+                for text, i in zip(self.word_text, range(0, len(w), 3))
+            ],
+        }
+
+
+def _chars(text: str) -> int:
+    return sum(1 for c in text or "" if not c.isspace())
+
+
+class SentenceSplitter:
+    """
+    Splits the audio of one synthesis unit at the sentences it covers.
+
+    ``plan_chunks`` packs short sentences into one unit, but the seek index
+    and the timing track need an entry per sentence. Kokoro's graphemes and
+    token texts are the unit's text, so sentence ends are found by counting
+    non-space characters: with token timestamps a sentence ends in the gap
+    after its last token, without them the audio is divided in proportion
+    to characters. A unit can come back as several Kokoro chunks; the
+    splitter keeps its place across them.
+
+    Args:
+        parts: ``(sentence number, text)`` pieces of the unit (``Chunk.parts``).
+        sample_rate: Samples per second of the audio.
+    """
+
+    def __init__(self, parts, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.ends = []  # (sentence, characters of the unit up to its end)
+        total = 0
+        for sentence, text in parts:
+            total += _chars(text)
+            if self.ends and self.ends[-1][0] == sentence:
+                self.ends[-1] = (sentence, total)
+            else:
+                self.ends.append((sentence, total))
+        self.consumed = 0
+
+    def _sentence_at(self, position: int) -> int:
+        for sentence, end in self.ends:
+            if position < end:
+                return sentence
+        return self.ends[-1][0]
+
+    def split(self, graphemes: str, samples: int, tokens=None) -> list:
+        """
+        The pieces of one Kokoro chunk, in order.
+
+        Returns:
+            ``(sentence, text, samples, tokens)`` per piece, with token
+            timestamps relative to the piece, ready for ``SentenceIndex.add``
+            and ``TimingTrack.add_chunk``.
+        """
+        start = self.consumed
+        length = _chars(graphemes)
+        self.consumed += length
+        timed = [
+            t for t in tokens or []
+            if getattr(t, "start_ts", None) is not None and getattr(t, "end_ts", None) is not None and (t.text or "").strip()
+        ]
+        cuts = [end - start for _, end in self.ends if start < end < start + length]
+        if not cuts:
+            return [(self._sentence_at(start), graphemes, samples, tokens)]
+
+        # cumulative characters after each token, to find the token that ends each sentence
+        token_ends, total = [], 0
+        for token in timed:
+            total += _chars(token.text)
+            token_ends.append(total)
+
+        pieces = []
+        text_from, sample_from, token_from = 0, 0, 0
+        for cut in cuts + [length]:
+            if cut == length:
+                text_to, sample_to, token_to = len(graphemes), samples, len(timed)
+            else:
+                text_to = _char_index(graphemes, cut)
+                token_to = next((i + 1 for i, end in enumerate(token_ends) if end >= cut), len(timed))
+                if timed and 0 < token_to < len(timed):
+                    seconds = (timed[token_to - 1].end_ts + timed[token_to].start_ts) / 2
+                    sample_to = int(seconds * self.sample_rate)
+                elif timed and token_to == len(timed):
+                    sample_to = int(timed[-1].end_ts * self.sample_rate)
+                else:
+                    sample_to = samples * cut // length
+                sample_to = max(sample_from, min(samples, sample_to))
+            offset = sample_from / self.sample_rate
+            piece_tokens = [
+                SimpleNamespace(text=t.text, start_ts=max(0.0, t.start_ts - offset), end_ts=max(0.0, t.end_ts - offset))
+                for t in timed[token_from:token_to]
+            ]
+            pieces.append(
+                (
+                    self._sentence_at(start + (cut - 1 if cut else 0)),
+                    graphemes[text_from:text_to].strip(),
+                    sample_to - sample_from,
+                    piece_tokens or None,
+                )
+            )
+            text_from, sample_from, token_from = text_to, sample_to, token_to
+        return pieces
+
+
+def _char_index(text: str, count: int) -> int:
+    """Index in ``text`` just after its ``count``-th non-space character."""
+    seen = 0
+    for index, char in enumerate(text):
+        if not char.isspace():
+            seen += 1
+            if seen == count:
+                return index + 1
+    return len(text)
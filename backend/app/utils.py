@@ -7,6 +7,9 @@ from tempfile import NamedTemporaryFile
 
 from .models import Lecture
 
+# prefix of the per-slide temporary PDFs, so the collector can find leftovers
+SLIDE_TEMP_PREFIX = "deepest_learning-slide-"
+
 def load_slide(lecture, slide_number: int) -> BytesIO:
     """
     Extract a specific slide from a PDF stored in a SQLAlchemy binary column.
@@ -75,7 +78,7 @@ def load_slide_as_named_tempfile(lecture: Lecture, slide_num: int):
         writer = PdfWriter()
         writer.add_page(reader.pages[slide_num - 1])
 
-    temp_file = NamedTemporaryFile(delete=False, suffix=".pdf")
+    temp_file = NamedTemporaryFile(delete=False, prefix=SLIDE_TEMP_PREFIX, suffix=".pdf")
     writer.write(temp_file)
     temp_file.flush()
     temp_file.close()
@@ -0,0 +1,445 @@
+"""
+WebSocket session channel: ``/lectures/session/<lecture_id>``.
+
+One connection carries a whole lecture session. The client sends JSON
+commands, each with an ``id`` it chooses; replies carry the same ``id``, so
+several commands can be in flight at once (a question while the next slide
+is generated, audio while an answer is graded):
+
+- ``{"id": 1, "type": "step", "slide": 2}`` -> ``step.result`` (the /step payload);
+- ``{"id": 2, "type": "answer", "slide": 2, "answer": "..."}`` -> ``answer.result``;
+- ``{"id": 3, "type": "question", "slide": 2, "question": "..."}`` -> ``question.result``;
+- ``{"id": 4, "type": "audio", "slide": 2}`` -> ``audio.start``, binary frames,
+  ``audio.end``;
+- ``{"id": 5, "type": "ping"}`` -> ``ping.result``.
+
+Failures reply ``{"id", "type": "error", "status", "message"}`` with the
+status the HTTP endpoint would have used (a 503 from admission control also
+carries ``retry_after``). Binary frames are the 4-byte
+big-endian command id followed by WAV bytes (header first, then PCM as it is
+synthesized), so audio of several slides can interleave.
+
+The session keeps the lecture's current run, its slides and its concept
+mastery in memory, loaded when the connection opens and reloaded after each
+step. Answers and questions are graded and rendered from that state; their
+concept updates are applied to it right away. As over HTTP, an answer marked
+locally leaves its updates to the background writer
+(``student_model.deferred``), while one graded by the LLM, and every
+question, writes its updates and the new hypothesis before replying, so a
+dropped connection or a restarted worker loses no more than an HTTP client
+would. Steps go through the same coalesced generation as
+POST /lectures/step.
+
+Each command is journaled (``app/journal.py``) as the HTTP request it
+stands for, e.g. an ``answer`` as POST /lectures/answer/<id>/<slide>, so
+``bench/replay.py`` replays WebSocket sessions over HTTP.
+
+Requires ``flask-sock``; without it the endpoint is not registered.
+"""
+
+import json
+import logging
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from werkzeug.exceptions import HTTPException
+
+from . import admission, audio, grader, journal, student_model
+from .db import get_db
+from .metrics import metrics
+from .models import ConceptMastery, Lecture, Slide
+
+logger = logging.getLogger(__name__)
+
+try:
+    from flask_sock import Sock
+except ImportError:  # optional dependency
+    Sock = None
+
+# commands of one session that may run at the same time
+DEFAULT_SESSION_CONCURRENCY = 4
+AUDIO_FRAME_BYTES = 1 << 15
+# command type -> (method, route) of the equivalent HTTP request, for the journal
+JOURNAL_ROUTES = {
+    "step": ("POST", "/lectures/step/<int:lecture_id>/<int:slide_num>"),
+    "answer": ("POST", "/lectures/answer/<int:lecture_id>/<int:slide_num>"),
+    "question": ("POST", "/lectures/user-question/<int:lecture_id>/<int:slide_num>"),
+    "audio": ("GET", "/lectures/audio-stream/<int:lecture_id>/<int:slide_num>"),
+}
+# command type -> the field its HTTP request carries in a JSON body
+_BODY_FIELDS = {"answer": "answer", "question": "question"}
+
+
+class CommandError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LectureSession:
+    """Warm state of one lecture for the lifetime of a connection."""
+
+    def __init__(self, lecture_id: int):
+        self.lecture_id = lecture_id
+        self.student_id = None
+        self.run = 0
+        self.hypothesis = None
+        self.slides = {}  # slide number -> SimpleNamespace of the stored slide
+        self.concepts = {}  # concept -> SimpleNamespace(concept, mastery, evidence)
+        self._lock = threading.Lock()
+        self._hypothesis_dirty = False
+
+    def load(self):
+        """(Re)load the lecture, the slides of its current run and its student model."""
+        student_model.deferred.flush(self.lecture_id)
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            lecture = db.get(Lecture, self.lecture_id)
+            if lecture is None:
+                raise CommandError(404, "lecture not found")
+            slides = db.query(Slide).filter(Slide.lecture_id == lecture.id, Slide.run == lecture.current_run).all()
+            rows = (
+                db.query(ConceptMastery)
+                .filter(ConceptMastery.lecture_id == lecture.id, ConceptMastery.run == lecture.current_run)
+                .all()
+            )
+            with self._lock:
+                self.student_id = lecture.student_id
+                self.run = lecture.current_run
+                self.hypothesis = lecture.lecture_hypothesis
+                self.slides = {slide.slide_number: _snapshot(slide) for slide in slides}
+                self.concepts = {
+                    row.concept: SimpleNamespace(concept=row.concept, mastery=row.mastery, evidence=row.evidence or 0)
+                    for row in rows
+                }
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+    def slide(self, number) -> SimpleNamespace:
+        slide = self.slides.get(number)
+        if slide is None or not slide.script:
+            raise CommandError(404, "slide not found")
+        return slide
+
+    def render(self, focus) -> str:
+        with self._lock:
+            return student_model.render(student_model.pick_relevant(list(self.concepts.values()), focus))
+
+    def apply(self, deltas, source: str):
+        """Apply concept deltas to the warm model now and to the database in the background."""
+        deltas = list(deltas or [])
+        with self._lock:
+            for key, change in student_model.merge_deltas(deltas).items():
+                row = self.concepts.get(key)
+                if row is None:
+                    row = self.concepts[key] = SimpleNamespace(
+                        concept=key, mastery=student_model.PRIOR_MASTERY, evidence=0
+                    )
+                row.mastery = max(0.0, min(1.0, row.mastery + change))
+                row.evidence += 1
+        if deltas:
+            student_model.deferred.add(self.lecture_id, self.run, deltas, student_id=self.student_id, source=source)
+
+    def set_hypothesis(self, hypothesis: str):
+        with self._lock:
+            self.hypothesis = hypothesis
+            self._hypothesis_dirty = True
+
+    def persist(self):
+        """Write what only lives in memory: queued concept updates and the rendered hypothesis."""
+        student_model.deferred.flush(self.lecture_id)
+        with self._lock:
+            if not self._hypothesis_dirty:
+                return
+            hypothesis = self.hypothesis
+            self._hypothesis_dirty = False
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            db.query(Lecture).filter(Lecture.id == self.lecture_id, Lecture.current_run == self.run).update(
+                {Lecture.lecture_hypothesis: hypothesis}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            try:
+                next(db_gen)
+            except StopIteration:
+                pass
+
+    def close(self):
+        """Persist whatever the last commands left in memory."""
+        self.persist()
+
+
+def _snapshot(slide: Slide) -> SimpleNamespace:
+    from .api import _step_payload
+
+    return SimpleNamespace(
+        lecture_id=slide.lecture_id,
+        slide_number=slide.slide_number,
+        script=slide.script,
+        question=slide.question,
+        concepts=student_model.parse_concepts(slide.concepts),
+        answer_key=grader.parse_key(slide.answer_key),
+        payload=_step_payload(slide),
+    )
+
+
+class Connection:
+    """Dispatches the commands of one socket and serializes its outgoing frames."""
+
+    def __init__(self, ws, app, session: LectureSession):
+        self.ws = ws
+        self.app = app
+        self.session = session
+        self._send_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=app.config.get("WS_SESSION_CONCURRENCY", DEFAULT_SESSION_CONCURRENCY),
+            thread_name_prefix=f"ws-{session.lecture_id}",
+        )
+
+    def send(self, message: dict) -> int:
+        data = json.dumps(message, separators=(",", ":"))
+        with self._send_lock:
+            self.ws.send(data)
+        return len(data)
+
+    def send_binary(self, command_id: int, payload: bytes):
+        with self._send_lock:
+            self.ws.send(struct.pack(">I", command_id & 0xFFFFFFFF) + payload)
+
+    def serve(self):
+        try:
+            while True:
+                raw = self.ws.receive()
+                if raw is None:
+                    break
+                try:
+                    command = json.loads(raw)
+                    if not isinstance(command, dict):
+                        raise ValueError("command must be an object")
+                except ValueError as exc:
+                    self.send({"id": None, "type": "error", "status": 400, "message": f"invalid command: {exc}"})
+                    continue
+                self._pool.submit(self._run, command)
+        finally:
+            # drop queued commands but let running ones finish: the caller closes the
+            # session next, and a hypothesis or delta set after that would be lost
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, command: dict):
+        command_id = command.get("id")
+        kind = command.get("type")
+        handler = HANDLERS.get(kind)
+        ts = time.time()
+        started = time.perf_counter()
+        status, sent = 200, None
+        try:
+            if handler is None:
+                raise CommandError(400, f"unknown command type {kind!r}")
+            with self.app.app_context():
+                result = handler(self, command_id, command)
+            if result is not None:
+                sent = self.send({"id": command_id, "type": f"{kind}.result", **result})
+            metrics.observe(f"ws.{kind}", time.perf_counter() - started)
+        except CommandError as exc:
+            status = exc.status
+            self._error(command_id, exc.status, exc.message)
+        except admission.Overloaded as exc:
+            status = 503
+            self._error(command_id, 503, "server busy, retry later", retry_after=exc.retry_after)
+        except HTTPException as exc:
+            status = exc.code or 500
+            message = (getattr(exc, "data", None) or {}).get("message") or exc.description
+            self._error(command_id, status, message)
+        except Exception:
+            status = 500
+            logger.exception("websocket command %s failed", kind)
+            self._error(command_id, 500, "internal error")
+        self._journal(command, ts, time.perf_counter() - started, status, sent)
+
+    def _journal(self, command: dict, ts: float, duration: float, status: int, response_bytes):
+        kind = command.get("type")
+        if kind not in JOURNAL_ROUTES:
+            return
+        method, route = JOURNAL_ROUTES[kind]
+        field = _BODY_FIELDS.get(kind)
+        journal.record(
+            {
+                "ts": ts,
+                "method": method,
+                "route": route,
+                "args": {"lecture_id": self.session.lecture_id, "slide_num": command.get("slide")},
+                "query": "",
+                "status": status,
+                "duration_ms": round(duration * 1000, 2),
+                "request_bytes": len(json.dumps({field: command.get(field) or ""})) if field else 0,
+                "response_bytes": response_bytes,
+                "streamed": kind == "audio",
+                "transport": "ws",
+            }
+        )
+
+    def _error(self, command_id, status: int, message: str, **extra):
+        metrics.incr("ws.errors")
+        try:
+            self.send({"id": command_id, "type": "error", "status": status, "message": message, **extra})
+        except Exception:
+            pass  # the socket is gone
+
+
+def _slide_number(command) -> int:
+    try:
+        number = int(command.get("slide"))
+    except (TypeError, ValueError):
+        raise CommandError(400, "slide required")
+    if number < 1:
+        raise CommandError(400, "slide must be positive")
+    return number
+
+
+def handle_step(conn: Connection, command_id, command):
+    from .api import _generate_step, _step_flight
+
+    number = _slide_number(command)
+    lecture_id = conn.session.lecture_id
+    result, shared = _step_flight.do((lecture_id, number), lambda: _generate_step(lecture_id, number))
+    if shared:
+        metrics.incr("step.coalesced")
+    # slide 1 may have started a new run, and the step flushed queued updates
+    conn.session.load()
+    return result
+
+
+def handle_answer(conn: Connection, command_id, command):
+    from .ai_utils import get_answer_feedback
+
+    answer = command.get("answer")
+    if not answer:
+        raise CommandError(400, "answer required")
+    session = conn.session
+    slide = session.slide(_slide_number(command))
+
+    key = slide.answer_key if conn.app.config.get("LOCAL_GRADING", True) else None
+    grade = grader.grade(key, answer)
+    if grade is not None:
+        metrics.incr("answer.local")
+        session.apply(grader.concept_deltas(key, slide.concepts, grade.correct), "answer")
+        return {"feedback": grade.feedback, "correct": grade.correct, "hypothesis": session.hypothesis}
+
+    metrics.incr("answer.llm")
+    with admission.slot("llm", session.lecture_id):
+        result = get_answer_feedback(slide.question, answer, session.render(slide.concepts))
+    session.apply(result["concept_updates"], "answer")
+    session.set_hypothesis(session.render(slide.concepts))
+    # like POST /answer after an LLM grade: stored before the reply
+    session.persist()
+    return {"feedback": result["feedback"], "correct": result["correct"], "hypothesis": session.hypothesis}
+
+
+def handle_question(conn: Connection, command_id, command):
+    from .ai_utils import user_ask_question
+
+    question = command.get("question")
+    if not question:
+        raise CommandError(400, "question required")
+    session = conn.session
+    slide = session.slide(_slide_number(command))
+    with admission.slot("llm", session.lecture_id):
+        result = user_ask_question(slide.script, question, session.render(slide.concepts))
+    session.apply(result["concept_updates"], "question")
+    session.set_hypothesis(session.render(slide.concepts))
+    session.persist()
+    return {
+        "answer": result["answer"],
+        "hypothesis": session.hypothesis,
+        "hypothesis_use": result.get("hypothesis_use", ""),
+    }
+
+
+def handle_audio(conn: Connection, command_id, command):
+    from .api import _synthesize_in_background, generate_audio_stream
+
+    slide = conn.session.slide(_slide_number(command))
+    wav_path = audio.artifact_path(slide)
+    finalized = audio.is_finalized(wav_path)
+    conn.send(
+        {
+            "id": command_id,
+            "type": "audio.start",
+            "slide": slide.slide_number,
+            "sample_rate": audio.SAMPLE_RATE,
+            "etag": audio.script_digest(slide.script),
+            "final": finalized,
+        }
+    )
+    if finalized:
+        stream = _read_file(wav_path)
+    else:
+        # same single synthesis as /audio-stream: follow the partial file
+        _synthesize_in_background(slide)
+        stream = generate_audio_stream(wav_path)
+
+    sent = 0
+    for chunk in stream:
+        for start in range(0, len(chunk), AUDIO_FRAME_BYTES):
+            piece = chunk[start : start + AUDIO_FRAME_BYTES]
+            conn.send_binary(command_id, piece)
+            sent += len(piece)
+    metrics.incr("ws.audio_bytes", sent)
+    conn.send({"id": command_id, "type": "audio.end", "bytes": sent})
+    return None
+
+
+def _read_file(path: str):
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(AUDIO_FRAME_BYTES), b"")
+
+
+def handle_ping(conn: Connection, command_id, command):
+    return {}
+
+
+HANDLERS = {
+    "step": handle_step,
+    "answer": handle_answer,
+    "question": handle_question,
+    "audio": handle_audio,
+    "ping": handle_ping,
+}
+
+
+def init_app(app) -> bool:
+    """Register the session route on ``app``; False if flask-sock is not installed."""
+    if Sock is None:
+        app.logger.info("flask-sock is not installed; /lectures/session is disabled")
+        return False
+    sock = Sock(app)
+
+    @sock.route("/lectures/session/<int:lecture_id>")
+    def lecture_session(ws, lecture_id):
+        from flask import current_app
+
+        session = LectureSession(lecture_id)
+        try:
+            session.load()
+        except CommandError as exc:
+            ws.send(json.dumps({"id": None, "type": "error", "status": exc.status, "message": exc.message}))
+            return
+        metrics.incr("ws.sessions")
+        conn = Connection(ws, current_app._get_current_object(), session)
+        conn.send({"id": None, "type": "session", "lecture_id": lecture_id, "run": session.run, "slides": sorted(session.slides)})
+        try:
+            conn.serve()
+        finally:
+            session.close()
+
+    return True
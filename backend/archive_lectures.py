@@ -0,0 +1,55 @@
+"""
+Export or import lectures as a single archive (see app/archive.py).
+
+Usage:
+    python archive_lectures.py export lectures.tar [--lecture-id 3 --lecture-id 7]
+    python archive_lectures.py import lectures.tar
+"""
+
+import argparse
+
+from app.archive import export_lectures, import_lectures, preprocess_imported
+from app.config import Config
+from app import db as app_db, preprocess, slide_images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import lectures")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="write lectures to an archive")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--lecture-id", type=int, action="append", dest="lecture_ids")
+    export_parser.add_argument("--batch-size", type=int, default=100)
+    import_parser = sub.add_parser("import", help="load lectures from an archive")
+    import_parser.add_argument("path")
+    args = parser.parse_args()
+
+    app_db.init_db(uri=Config.SQLALCHEMY_DATABASE_URI)
+    db = app_db.SessionLocal()
+    try:
+        if args.command == "export":
+            manifest = export_lectures(db, args.path, args.lecture_ids, batch_size=args.batch_size)
+            print("Exported:", manifest["counts"], "pdfs:", manifest["pdfs"])
+        else:
+            id_map = import_lectures(db, args.path, Config.UPLOAD_FOLDER)
+            print(f"Imported {len(id_map)} lectures:", id_map)
+            # same page preprocessing as POST /lectures/import; wait for it before exiting
+            preprocess.configure(
+                upload_folder=Config.UPLOAD_FOLDER,
+                workers=Config.PREPROCESS_WORKERS,
+                chunk_pages=Config.PREPROCESS_CHUNK_PAGES,
+            )
+            slide_images.configure(
+                enabled=Config.SLIDE_IMAGES,
+                widths=Config.SLIDE_IMAGE_WIDTHS,
+                fmt=Config.SLIDE_IMAGE_FORMAT,
+                quality=Config.SLIDE_IMAGE_QUALITY,
+            )
+            for thread in preprocess_imported(db, id_map.values()):
+                thread.join()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
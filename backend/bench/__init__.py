@@ -0,0 +1,7 @@
+"""
+Offline benchmarking tools for the backend.
+
+Everything in this package runs without network access: the OpenAI API is
+replaced by a local HTTP stub and Kokoro by a fake pipeline, both with
+configurable latency. See ``python -m bench.loadtest --help``.
+"""
@@ -0,0 +1,358 @@
+"""
+Offline load test for the lecture API.
+
+Boots ``create_app`` against SQLite (default) or any SQLAlchemy URL, with the
+OpenAI API replaced by ``bench.stubs.StubOpenAIServer`` and Kokoro replaced by
+``bench.stubs.FakeKPipeline``. N simulated students then run full sessions
+(upload, step through every slide, answer questions, ask questions, stream
+audio) concurrently, and latency percentiles, throughput and memory are
+reported per endpoint.
+
+Usage (from ``backend/``)::
+
+    python -m bench.loadtest --users 8 --slides 5 --llm-latency 0.5
+    python -m bench.loadtest --json results.json
+    python -m bench.loadtest --baseline results.json --max-regression 0.2
+
+With ``--baseline`` the process exits with status 1 if any endpoint's p95
+latency regressed by more than ``--max-regression`` (a fraction).
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .stubs import Latency, StubOpenAIServer, install_fake_kokoro
+
+ENDPOINTS = ("upload", "step", "answer", "question", "audio-stream", "step-read")
+
+
+def percentile(values, pct: float) -> float:
+    """Linear-interpolated percentile of ``values`` (``pct`` in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def make_pdf(pages: int) -> bytes:
+    """Build an in-memory PDF with ``pages`` blank pages."""
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=720, height=540)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class Stats:
+    """Thread-safe per-endpoint latency, error and memory bookkeeping."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        self.rss_peak = defaultdict(int)
+        self.process_rss_peak = 0
+
+    def begin(self, endpoint: str):
+        with self._lock:
+            self.in_flight[endpoint] += 1
+
+    def end(self, endpoint: str, seconds: float, ok: bool, size: int):
+        with self._lock:
+            self.in_flight[endpoint] -= 1
+            self.latencies[endpoint].append(seconds)
+            self.bytes[endpoint] += size
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def sample_memory(self):
+        rss = current_rss_bytes()
+        with self._lock:
+            self.process_rss_peak = max(self.process_rss_peak, rss)
+            for endpoint, count in self.in_flight.items():
+                if count:
+                    self.rss_peak[endpoint] = max(self.rss_peak[endpoint], rss)
+
+    def report(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            values = self.latencies.get(endpoint, [])
+            if not values:
+                continue
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+                "throughput_rps": len(values) / wall_seconds if wall_seconds else 0.0,
+                "bytes": self.bytes[endpoint],
+                "rss_peak_mb": self.rss_peak[endpoint] / 2**20,
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "wall_seconds": wall_seconds,
+            "requests": total,
+            "throughput_rps": total / wall_seconds if wall_seconds else 0.0,
+            "process_rss_peak_mb": self.process_rss_peak / 2**20,
+            "endpoints": endpoints,
+        }
+
+
+class Client:
+    """Minimal HTTP client that records every call in ``Stats``."""
+
+    def __init__(self, base_url: str, stats: Stats):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.stats = stats
+
+    def call(self, endpoint: str, method: str, path: str, body: bytes = None, headers: dict = None):
+        self.stats.begin(endpoint)
+        start = time.perf_counter()
+        status, payload = 0, b""
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                status = response.status
+                payload = response.read()
+            finally:
+                conn.close()
+        except OSError:
+            pass
+        finally:
+            ok = 200 <= status < 300
+            self.stats.end(endpoint, time.perf_counter() - start, ok, len(payload))
+        return status, payload
+
+    def call_json(self, endpoint: str, method: str, path: str, data: dict = None):
+        body = json.dumps(data).encode() if data is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        status, payload = self.call(endpoint, method, path, body, headers)
+        try:
+            return status, json.loads(payload or b"null")
+        except ValueError:
+            return status, None
+
+    def upload(self, pdf: bytes):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file_obj"; filename="lecture.pdf"\r\n'
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode() + pdf + f"\r\n--{boundary}--\r\n".encode()
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        status, payload = self.call("upload", "POST", "/lectures/instantiate-lecture", body, headers)
+        try:
+            return status, json.loads(payload or b"null")
+        except ValueError:
+            return status, None
+
+
+def run_session(client: Client, pdf: bytes, slides: int, question_rate: float, rng: random.Random):
+    """One student: upload a deck, step through it slide by slide, then re-open it."""
+    status, created = client.upload(pdf)
+    if status != 201 or not created:
+        return
+    lecture_id = created["id"]
+
+    for slide in range(1, slides + 1):
+        status, step = client.call_json("step", "POST", f"/lectures/step/{lecture_id}/{slide}")
+        if status != 200 or not step:
+            return
+        if step.get("question"):
+            client.call_json(
+                "answer", "POST", f"/lectures/answer/{lecture_id}/{slide}",
+                {"answer": "I think it is the physical layer."},
+            )
+        if rng.random() < question_rate:
+            client.call_json(
+                "question", "POST", f"/lectures/user-question/{lecture_id}/{slide}",
+                {"question": "Could you explain that part again?"},
+            )
+        client.call("audio-stream", "GET", f"/lectures/audio-stream/{lecture_id}/{slide}")
+
+    # re-opening the lecture only reads stored slides
+    for slide in range(1, slides + 1):
+        client.call("step-read", "GET", f"/lectures/step/{lecture_id}/{slide}")
+
+
+def build_app(database_url: str):
+    """Create the Flask app. Stubs must already be installed."""
+    from app import create_app
+
+    return create_app({"SQLALCHEMY_DATABASE_URI": database_url, "TESTING": True})
+
+
+def serve(app):
+    """Serve ``app`` on a random local port in a background thread."""
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def print_report(report: dict, out=sys.stdout):
+    header = f"{'endpoint':<13}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'rss MB':>9}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for name, row in report["endpoints"].items():
+        print(
+            f"{name:<13}{row['requests']:>6}{row['errors']:>5}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+            f"{row['throughput_rps']:>9.2f}{row['rss_peak_mb']:>9.1f}",
+            file=out,
+        )
+    print(
+        f"\n{report['requests']} requests in {report['wall_seconds']:.2f}s "
+        f"({report['throughput_rps']:.2f} req/s), peak RSS {report['process_rss_peak_mb']:.1f} MB",
+        file=out,
+    )
+
+
+def compare_to_baseline(report: dict, baseline: dict, max_regression: float):
+    """Return a list of human readable p95 regressions beyond ``max_regression``."""
+    failures = []
+    for name, row in report["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base or not base.get("p95_ms"):
+            continue
+        ratio = row["p95_ms"] / base["p95_ms"] - 1
+        if ratio > max_regression:
+            failures.append(
+                f"{name}: p95 {row['p95_ms']:.1f}ms vs baseline {base['p95_ms']:.1f}ms (+{ratio:.0%})"
+            )
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=4, help="concurrent students")
+    parser.add_argument("--sessions", type=int, default=1, help="sessions per student")
+    parser.add_argument("--slides", type=int, default=4, help="slides per lecture")
+    parser.add_argument("--question-rate", type=float, default=0.3, help="chance of a student question per slide")
+    parser.add_argument("--database-url", default=None, help="SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM base latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="stub LLM extra uniform latency (s)")
+    parser.add_argument("--file-latency", type=float, default=0.02, help="stub file upload/delete latency (s)")
+    parser.add_argument("--tts-overhead", type=float, default=0.01, help="fake Kokoro per-call overhead (s)")
+    parser.add_argument("--tts-per-char", type=float, default=0.0005, help="fake Kokoro synthesis time per char (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_out", help="write the report to this file")
+    parser.add_argument("--baseline", help="report from a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 regression vs baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix="dl-bench-")
+    database_url = args.database_url or (
+        f"sqlite:///{os.path.join(workdir, 'bench.db')}?check_same_thread=false&timeout=30"
+    )
+
+    install_fake_kokoro(args.tts_overhead, args.tts_per_char)
+    stub = StubOpenAIServer(
+        llm_latency=Latency(args.llm_latency, args.llm_jitter),
+        file_latency=Latency(args.file_latency),
+        seed=args.seed,
+    ).start()
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+
+    # uploads are written relative to the working directory
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        app = build_app(database_url)
+        server = serve(app)
+        client_stats = Stats()
+        client = Client(f"http://127.0.0.1:{server.server_port}", client_stats)
+        pdf = make_pdf(args.slides)
+
+        stop = threading.Event()
+
+        def sampler():
+            while not stop.is_set():
+                client_stats.sample_memory()
+                stop.wait(0.05)
+
+        threading.Thread(target=sampler, daemon=True).start()
+
+        def student(index: int):
+            rng = random.Random(args.seed * 1000 + index)
+            for _ in range(args.sessions):
+                run_session(client, pdf, args.slides, args.question_rate, rng)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            list(pool.map(student, range(args.users)))
+        wall = time.perf_counter() - start
+        stop.set()
+        client_stats.sample_memory()
+        server.shutdown()
+    finally:
+        os.chdir(previous_cwd)
+        stub.stop()
+
+    report = client_stats.report(wall)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("json_out", "baseline")}
+    report["config"]["database_url"] = database_url
+    report["llm_calls"] = stub.calls
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare_to_baseline(report, json.load(f), args.max_regression)
+        if failures:
+            print("\nRegressions:", *failures, sep="\n  ", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
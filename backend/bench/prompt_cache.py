@@ -0,0 +1,135 @@
+"""
+Latency and cost of the prompt layout with and without provider prefix caching.
+
+Replays simulated lecture sessions (one step, answer and question per slide)
+against ``StubOpenAIServer`` with a ``PrefixCache``, sending every prompt in
+two layouts:
+
+- ``prefix-first``: the layout produced by ``app.prompts`` (static
+  instructions, then stable context, then volatile context);
+- ``dynamic-first``: the same sections in reverse order, which is what the
+  old templates effectively did and what defeats caching.
+
+Usage (from ``backend/``)::
+
+    python -m bench.prompt_cache --lectures 4 --slides 12
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from .stubs import Latency, PrefixCache, StubOpenAIServer, _sentence
+
+# USD per million tokens
+DEFAULT_INPUT_PRICE = 0.05
+DEFAULT_CACHED_PRICE = 0.005
+DEFAULT_OUTPUT_PRICE = 0.40
+
+
+def dynamic_first(prompt) -> str:
+    """Reorder a ``Prompt`` so the volatile context leads and the instructions trail."""
+    text = str.__str__(prompt)
+    return (
+        text[prompt.cacheable_length :]
+        + text[prompt.prefix_length : prompt.cacheable_length]
+        + text[: prompt.prefix_length]
+    )
+
+
+def session_prompts(rng: random.Random, slides: int):
+    """Yield the prompts one student session sends, in order."""
+    from app.prompts import answer_feedback_prompt, lecture_intro_prompt, lecture_step_prompt, user_question_prompt
+
+    student = " ".join(_sentence(rng) for _ in range(3))
+    script = ""
+    for slide in range(1, slides + 1):
+        hypothesis = "\n".join(f"- concept {rng.randint(1, 30)}: mastery {rng.random():.2f}" for _ in range(6))
+        if slide == 1:
+            yield lecture_intro_prompt(student, hypothesis)
+        else:
+            yield lecture_step_prompt(script, student, hypothesis)
+        slide_script = " ".join(_sentence(rng) for _ in range(10))
+        script = f"{script}\n\n{slide_script}" if script else slide_script
+        question = _sentence(rng)
+        yield answer_feedback_prompt(question, _sentence(rng), hypothesis)
+        yield user_question_prompt(slide_script, _sentence(rng), hypothesis)
+
+
+def run(layout: str, args) -> dict:
+    from openai import OpenAI
+
+    stub = StubOpenAIServer(
+        llm_latency=Latency(args.llm_latency),
+        prefix_cache=PrefixCache(),
+        input_token_latency=args.input_token_latency,
+        cached_token_latency=args.cached_token_latency,
+    ).start()
+    try:
+        client = OpenAI(api_key="bench", base_url=stub.base_url, max_retries=0)
+        latencies = []
+        input_tokens = cached_tokens = output_tokens = estimated_cached = 0
+        for lecture in range(args.lectures):
+            rng = random.Random(args.seed * 1000 + lecture)
+            for prompt in session_prompts(rng, args.slides):
+                text = dynamic_first(prompt) if layout == "dynamic-first" else prompt
+                start = time.perf_counter()
+                response = client.responses.create(model="stub", input=text)
+                latencies.append(time.perf_counter() - start)
+                input_tokens += response.usage.input_tokens
+                cached_tokens += response.usage.input_tokens_details.cached_tokens
+                output_tokens += response.usage.output_tokens
+                if layout == "prefix-first":
+                    estimated_cached += prompt.estimated_cached_tokens
+    finally:
+        stub.stop()
+
+    from app.metrics import percentile
+
+    cost = (
+        (input_tokens - cached_tokens) * args.input_price
+        + cached_tokens * args.cached_price
+        + output_tokens * args.output_price
+    ) / 1e6
+    return {
+        "layout": layout,
+        "calls": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "estimated_cached_tokens": estimated_cached if layout == "prefix-first" else None,
+        "cost_usd": cost,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lectures", type=int, default=4)
+    parser.add_argument("--slides", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="stub base latency (s)")
+    parser.add_argument("--input-token-latency", type=float, default=0.00002, help="stub latency per uncached input token (s)")
+    parser.add_argument("--cached-token-latency", type=float, default=0.000002, help="stub latency per cached input token (s)")
+    parser.add_argument("--input-price", type=float, default=DEFAULT_INPUT_PRICE, help="USD per 1M uncached input tokens")
+    parser.add_argument("--cached-price", type=float, default=DEFAULT_CACHED_PRICE, help="USD per 1M cached input tokens")
+    parser.add_argument("--output-price", type=float, default=DEFAULT_OUTPUT_PRICE, help="USD per 1M output tokens")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    rows = [run(layout, args) for layout in ("dynamic-first", "prefix-first")]
+
+    print(f"{'layout':<15}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'input tok':>11}{'cached':>9}{'est.':>9}{'cost $':>11}")
+    for row in rows:
+        estimate = "-" if row["estimated_cached_tokens"] is None else row["estimated_cached_tokens"]
+        print(
+            f"{row['layout']:<15}{row['calls']:>7}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+            f"{row['input_tokens']:>11}{row['cached_tokens']:>9}{estimate:>9}{row['cost_usd']:>11.6f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Replay recorded sessions from a request journal (``app/journal.py``).
+
+Reads the journal files of one or more workers and re-sends every request at
+its original offset from the first one, divided by ``--speed`` (2 replays
+twice as fast; 0 sends as fast as the pool allows). ``--max-gap`` caps idle
+gaps, so a day of traffic with quiet hours keeps its bursts without taking a
+day to replay.
+
+Bodies are not in the journal, so equivalent ones are made up:
+
+- uploads become blank PDFs with the recorded page count. Uploads of the
+  same document get the same PDF, so preprocessing dedupes as it did;
+- answers, questions and student names become filler text of the recorded
+  size.
+
+Requests for a recorded lecture go to the lecture created by replaying its
+upload. Within a lecture, a request is not sent before the requests that had
+completed when it was recorded (a step before its audio, say), so scaling
+keeps causality and only overlaps requests that overlapped anyway. Requests
+for lectures uploaded before the journal starts and archive imports are
+skipped; WebSocket commands are journaled as their HTTP equivalents and
+replayed over HTTP (the session connection itself is skipped). A report compares recorded and replayed latency per endpoint.
+Without ``--url`` the replay runs against a local app with the stubs of
+``bench.loadtest``.
+
+Usage (from ``backend/``)::
+
+    python -m bench.replay journal/ --url http://127.0.0.1:8000
+    python -m bench.replay journal/ --speed 4 --max-gap 5 --llm-latency 0.5
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .loadtest import Client, Stats, build_app, serve
+from .stubs import Latency, StubOpenAIServer, install_fake_kokoro
+
+UPLOAD_ROUTE = "/lectures/instantiate-lecture"
+SKIPPED_ROUTES = ("/lectures/session/<int:lecture_id>", "/lectures/import")
+# route segment -> JSON field of the request body
+BODY_FIELDS = {"answer": "answer", "user-question": "question", "students": "name"}
+_PLACEHOLDER = re.compile(r"<(?:[^:<>]+:)?([^<>]+)>")
+
+
+def label(entry: dict) -> str:
+    """Endpoint name for reports: ``upload`` or ``<METHOD> <first route segment after /lectures>``."""
+    route = entry.get("route", "")
+    if route == UPLOAD_ROUTE:
+        return "upload"
+    parts = [p for p in route.split("/") if p]
+    if parts and parts[0] == "lectures":
+        parts = parts[1:]
+    return f"{entry.get('method', 'GET')} {parts[0] if parts else '/'}"
+
+
+def schedule(entries, speed: float, max_gap: float = None):
+    """``(offset in seconds, entry)`` pairs for the replay, in recorded order."""
+    planned, offset, previous = [], 0.0, None
+    for entry in entries:
+        if previous is not None:
+            gap = max(0.0, entry["ts"] - previous)
+            if max_gap is not None:
+                gap = min(gap, max_gap)
+            offset += gap / speed if speed > 0 else 0.0
+        previous = entry["ts"]
+        planned.append((offset, entry))
+    return planned
+
+
+def make_pdf(pages: int, document: str = "") -> bytes:
+    """Blank PDF with ``pages`` pages; ``document`` makes it (and its hash) distinct."""
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(max(1, pages)):
+        writer.add_blank_page(width=720, height=540)
+    writer.add_metadata({"/Title": f"replay {document}"})
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def _filler(size: int) -> str:
+    words = "could you explain how the signal is encoded at this layer again"
+    text = (words + " ") * (size // len(words) + 1)
+    return text[: max(1, size)].strip() or "ok"
+
+
+class Replayer:
+    """Sends journal entries, mapping recorded lecture ids to replayed ones."""
+
+    def __init__(self, client: Client, upload_wait: float = 120):
+        self.client = client
+        self.upload_wait = upload_wait
+        self.lectures = {}  # recorded id -> replayed id (None if the upload failed)
+        self.uploaded = {}  # recorded id -> set once its upload was replayed
+        self.done = {}  # entry index -> set once the request was replayed
+        self.after = {}  # entry index -> indices of the requests it has to wait for
+        self.skipped = defaultdict(int)
+        self.lag = []
+        self._pdfs = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, entries):
+        """Note which recorded lectures the replay creates and the order within each lecture."""
+        finished = defaultdict(list)  # recorded lecture id -> [(recorded end, index)]
+        for index, entry in enumerate(entries):
+            self.done[index] = threading.Event()
+            if entry.get("route") == UPLOAD_ROUTE and entry.get("lecture_id") is not None:
+                self.uploaded[entry["lecture_id"]] = threading.Event()
+            lecture_id = (entry.get("args") or {}).get("lecture_id")
+            if lecture_id is None:
+                continue
+            earlier = finished[lecture_id]
+            self.after[index] = [i for end, i in earlier if end <= entry["ts"]]
+            earlier.append((entry["ts"] + entry.get("duration_ms", 0.0) / 1000, index))
+
+    def issue(self, index: int, entry: dict, due: float):
+        try:
+            self._issue(index, entry, due)
+        finally:
+            self.done[index].set()
+
+    def _issue(self, index: int, entry: dict, due: float):
+        with self._lock:
+            self.lag.append(max(0.0, time.perf_counter() - due))
+        if entry.get("route") == UPLOAD_ROUTE:
+            self._upload(entry)
+            return
+        args = dict(entry.get("args") or {})
+        if "lecture_id" in args:
+            recorded = args["lecture_id"]
+            if recorded not in self.uploaded:
+                self._skip(entry, "lecture uploaded before the journal")
+                return
+            self.uploaded[recorded].wait(self.upload_wait)
+            if self.lectures.get(recorded) is None:
+                self._skip(entry, "upload failed")
+                return
+            args["lecture_id"] = self.lectures[recorded]
+            for previous in self.after.get(index, ()):
+                self.done[previous].wait()
+        path = _PLACEHOLDER.sub(lambda m: str(args.get(m.group(1), "")), entry["route"])
+        if entry.get("query"):
+            path = f"{path}?{entry['query']}"
+
+        body, headers = None, {}
+        segment = label(entry).split(" ", 1)[-1]
+        if entry.get("method") == "POST" and segment in BODY_FIELDS:
+            payload = {BODY_FIELDS[segment]: _filler(entry.get("request_bytes", 0) - len(BODY_FIELDS[segment]) - 8)}
+            body = json.dumps(payload).encode()
+            headers = {"Content-Type": "application/json"}
+        self.client.call(label(entry), entry.get("method", "GET"), path, body, headers)
+
+    def _upload(self, entry: dict):
+        key = (entry.get("pages") or 1, entry.get("document") or f"lecture-{entry.get('lecture_id')}")
+        with self._lock:
+            if key not in self._pdfs:
+                self._pdfs[key] = make_pdf(*key)
+            pdf = self._pdfs[key]
+        status, created = self.client.upload(pdf)
+        recorded = entry.get("lecture_id")
+        if recorded is not None:
+            self.lectures[recorded] = created["id"] if status == 201 and created else None
+            self.uploaded[recorded].set()
+
+    def _skip(self, entry: dict, reason: str):
+        with self._lock:
+            self.skipped[f"{label(entry)}: {reason}"] += 1
+
+
+def report(entries, stats: Stats, replayer: Replayer, wall: float, out=sys.stdout):
+    from app.metrics import percentile
+
+    recorded = defaultdict(list)
+    recorded_errors = defaultdict(int)
+    for entry in entries:
+        recorded[label(entry)].append(entry.get("duration_ms", 0.0) / 1000)
+        if not 200 <= entry.get("status", 0) < 300:
+            recorded_errors[label(entry)] += 1
+
+    header = f"{'endpoint':<22}{'rec n':>7}{'rec err':>8}{'rec p50':>9}{'rec p95':>9}{'n':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for name in sorted(set(recorded) | set(stats.latencies)):
+        before, after = recorded.get(name, []), stats.latencies.get(name, [])
+        print(
+            f"{name:<22}{len(before):>7}{recorded_errors[name]:>8}"
+            f"{percentile(before, 50) * 1000:>9.1f}{percentile(before, 95) * 1000:>9.1f}"
+            f"{len(after):>7}{stats.errors[name]:>5}"
+            f"{percentile(after, 50) * 1000:>9.1f}{percentile(after, 95) * 1000:>9.1f}",
+            file=out,
+        )
+    span = entries[-1]["ts"] - entries[0]["ts"] if entries else 0.0
+    total = sum(len(v) for v in stats.latencies.values())
+    print(
+        f"\n{total} requests in {wall:.2f}s (recorded span {span:.2f}s); "
+        f"send lag p95 {percentile(replayer.lag, 95) * 1000:.1f} ms",
+        file=out,
+    )
+    for reason, count in sorted(replayer.skipped.items()):
+        print(f"skipped {count}: {reason}", file=out)
+
+
+def replay(entries, base_url: str, args) -> tuple:
+    stats = Stats()
+    replayer = Replayer(Client(base_url, stats), upload_wait=args.upload_wait)
+    replayer.prepare(entries)
+    planned = schedule(entries, args.speed, args.max_gap)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for index, (offset, entry) in enumerate(planned):
+            due = start + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(replayer.issue, index, entry, due)
+    return stats, replayer, time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("journal", nargs="+", help="journal files or JOURNAL_DIR directories")
+    parser.add_argument("--url", help="server to replay against (default: a local app with stubs)")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale: 2 replays twice as fast, 0 without waiting")
+    parser.add_argument("--max-gap", type=float, default=None, help="cap on the wait between two requests (s)")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--upload-wait", type=float, default=120, help="how long a request waits for its lecture's upload")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="local stub LLM base latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="local stub LLM extra uniform latency (s)")
+    parser.add_argument("--json", dest="json_out", help="write replayed per-endpoint latencies to this file")
+    args = parser.parse_args(argv)
+
+    from app import journal
+
+    entries = [
+        entry for entry in journal.read(args.journal) if entry.get("route") not in SKIPPED_ROUTES and "ts" in entry
+    ]
+    if not entries:
+        parser.error("no replayable requests in the journal")
+
+    if args.url:
+        stats, replayer, wall = replay(entries, args.url, args)
+    else:
+        workdir = tempfile.mkdtemp(prefix="dl-replay-")
+        install_fake_kokoro()
+        stub = StubOpenAIServer(llm_latency=Latency(args.llm_latency, args.llm_jitter)).start()
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            app = build_app(f"sqlite:///{os.path.join(workdir, 'replay.db')}?check_same_thread=false&timeout=30")
+            server = serve(app)
+            stats, replayer, wall = replay(entries, f"http://127.0.0.1:{server.server_port}", args)
+            server.shutdown()
+        finally:
+            os.chdir(previous_cwd)
+            stub.stop()
+
+    report(entries, stats, replayer, wall)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"wall_seconds": wall, "latencies": stats.latencies, "errors": stats.errors}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
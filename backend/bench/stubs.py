@@ -0,0 +1,382 @@
+"""
+Stand-ins for the external services the backend talks to.
+
+- ``StubOpenAIServer`` is a tiny HTTP server implementing the parts of the
+  OpenAI API the app uses (``/v1/files`` and ``/v1/responses``). Structured
+  outputs are generated from the JSON schema sent with each request, so the
+  stub keeps working when the pydantic response models change.
+- ``FakeKPipeline`` mimics ``kokoro.KPipeline``: calling it yields
+  ``(graphemes, phonemes, audio)`` results with a synthesis delay proportional
+  to the text length.
+"""
+
+import hashlib
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+
+_WORDS = (
+    "signal carrier bandwidth layer network routing packet node energy radio "
+    "frequency modulation noise link protocol sensor spectrum channel power "
+    "latency throughput interference antenna receiver transmitter"
+).split()
+
+# how many sentences to generate for string fields, keyed by property name
+_SENTENCES_PER_FIELD = {
+    "script": 8,
+    "answer": 3,
+    "summary": 2,
+    "hypothesis": 2,
+    "hypothesis_use": 1,
+}
+# string fields that hold short names rather than prose
+_NAME_FIELDS = {"concept", "concepts", "expected", "synonyms"}
+# ranges for numeric fields, keyed by property name (default 0-1)
+_NUMBER_RANGES = {"delta": (-0.2, 0.2)}
+
+
+class Latency:
+    """Latency model: ``base`` seconds plus a uniform ``jitter``."""
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0):
+        self.base = base
+        self.jitter = jitter
+
+    def sample(self) -> float:
+        return self.base + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def sleep(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PrefixCache:
+    """
+    Simulates provider-side prompt caching.
+
+    Prompts are hashed in fixed blocks (128 tokens, about 512 characters) as a
+    chain, so a block is a hit only if everything before it matched too.
+    Nothing is served from cache below ``min_chars`` (the 1024 token minimum).
+    """
+
+    def __init__(self, block_chars: int = 512, min_chars: int = 4096, max_entries: int = 200_000):
+        self.block_chars = block_chars
+        self.min_chars = min_chars
+        self.max_entries = max_entries
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def lookup_and_store(self, text: str) -> int:
+        """Return how many leading characters of ``text`` were cached, then cache it."""
+        digest = b""
+        cached = 0
+        hit = True
+        data = text.encode()
+        with self._lock:
+            if len(self._seen) > self.max_entries:
+                self._seen.clear()
+            for start in range(0, len(data) - len(data) % self.block_chars, self.block_chars):
+                digest = hashlib.blake2b(digest + data[start : start + self.block_chars], digest_size=16).digest()
+                if hit and digest in self._seen:
+                    cached = start + self.block_chars
+                else:
+                    hit = False
+                    self._seen.add(digest)
+        return cached if cached >= self.min_chars else 0
+
+
+def _prompt_text(request_input) -> str:
+    """Flatten a ``/responses`` input (string or message list) to the text the model sees."""
+    if isinstance(request_input, str):
+        return request_input
+    parts = []
+    for message in request_input or []:
+        content = message.get("content", "") if isinstance(message, dict) else ""
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for item in content:
+            parts.append(item.get("text") or f"[{item.get('file_id', item.get('type'))}]")
+    return "".join(parts)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 14))]
+    return " ".join(words).capitalize() + "."
+
+
+def _fake_value(schema: dict, defs: dict, rng: random.Random, name: str = ""):
+    """Generate a value matching a (strict, OpenAI-style) JSON schema."""
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs, rng, name)
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return _fake_value(options[0] if options else {"type": "null"}, defs, rng, name)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {key: _fake_value(sub, defs, rng, key) for key, sub in props.items()}
+    if kind == "array":
+        return [
+            _fake_value(schema.get("items", {}), defs, rng, name)
+            for _ in range(rng.randint(1, 3))
+        ]
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "integer":
+        return rng.randint(0, 10)
+    if kind == "number":
+        low, high = _NUMBER_RANGES.get(name, (0.0, 1.0))
+        return round(rng.uniform(low, high), 3)
+    if kind == "null":
+        return None
+    if name in _NAME_FIELDS:
+        return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 2)))
+    sentences = _SENTENCES_PER_FIELD.get(name, 1)
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_StubHTTPServer"
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self._read_body()
+        stub = self.server.stub
+        if self.path.rstrip("/").endswith("/files"):
+            stub.file_latency.sleep()
+            file_id = f"file-{next(stub.ids)}"
+            filename = re.search(rb'filename="([^"]*)"', body)
+            stub.files[file_id] = {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(body),
+                "created_at": int(time.time()),
+                "filename": filename.group(1).decode() if filename else "slide.pdf",
+                "purpose": "assistants",
+                "status": "processed",
+            }
+            return self._send_json(stub.files[file_id])
+        if self.path.rstrip("/").endswith("/responses"):
+            return self._send_json(stub.respond(json.loads(body or b"{}")))
+        self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+    def do_GET(self):
+        stub = self.server.stub
+        if urlsplit(self.path).path.rstrip("/").endswith("/files"):
+            stub.file_latency.sleep()
+            return self._send_json({"object": "list", "data": list(stub.files.values()), "has_more": False})
+        self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+    def do_DELETE(self):
+        self._read_body()
+        stub = self.server.stub
+        stub.file_latency.sleep()
+        file_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        deleted = stub.files.pop(file_id, None) is not None
+        self._send_json({"id": file_id, "object": "file", "deleted": deleted})
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "StubOpenAIServer"
+
+    def handle_error(self, request, client_address):
+        # clients hang up on purpose (hedged requests cancel the loser)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubOpenAIServer:
+    """
+    Local fake of the OpenAI HTTP API.
+
+    Args:
+        llm_latency: Delay applied to every ``/responses`` call.
+        file_latency: Delay applied to file uploads and deletes.
+        seed: Seed for the generated content.
+        prefix_cache: Optional simulated prompt cache; hits are reported in
+            ``usage.input_tokens_details.cached_tokens``.
+        input_token_latency: Extra delay per uncached input token.
+        cached_token_latency: Extra delay per cached input token.
+    """
+
+    def __init__(
+        self,
+        llm_latency: Latency = None,
+        file_latency: Latency = None,
+        seed: int = 0,
+        prefix_cache: PrefixCache = None,
+        input_token_latency: float = 0.0,
+        cached_token_latency: float = 0.0,
+    ):
+        self.llm_latency = llm_latency or Latency()
+        self.file_latency = file_latency or Latency()
+        self.prefix_cache = prefix_cache
+        self.input_token_latency = input_token_latency
+        self.cached_token_latency = cached_token_latency
+        self.ids = itertools.count(1)
+        self.files = {}  # uploaded and not yet deleted, by id
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        self._httpd = _StubHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.stub = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, request: dict) -> dict:
+        """Build a ``Response`` payload for a ``/responses`` request."""
+        prompt = _prompt_text(request.get("input", ""))
+        input_tokens = len(prompt) // 4
+        cached_tokens = (self.prefix_cache.lookup_and_store(prompt) // 4) if self.prefix_cache else 0
+        delay = (
+            self.llm_latency.sample()
+            + (input_tokens - cached_tokens) * self.input_token_latency
+            + cached_tokens * self.cached_token_latency
+        )
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls += 1
+            rng = random.Random(self._rng.random())
+
+        fmt = (request.get("text") or {}).get("format") or {}
+        if fmt.get("type") == "json_schema":
+            schema = fmt.get("schema", {})
+            text = json.dumps(_fake_value(schema, schema.get("$defs", {}), rng))
+        else:
+            text = " ".join(_sentence(rng) for _ in range(3))
+
+        return {
+            "id": f"resp_{next(self.ids)}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": request.get("model", "stub"),
+            "status": "completed",
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_{next(self.ids)}",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            ],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": cached_tokens},
+                "output_tokens": len(text) // 4,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + len(text) // 4,
+            },
+        }
+
+
+class FakeResult:
+    """Mirrors ``kokoro.KPipeline.Result``: unpacks as ``(gs, ps, audio)``."""
+
+    def __init__(self, graphemes: str, phonemes: str, audio: np.ndarray):
+        self.graphemes = graphemes
+        self.phonemes = phonemes
+        self.audio = audio
+        self.tokens = None
+
+    def __iter__(self):
+        return iter((self.graphemes, self.phonemes, self.audio))
+
+
+class FakeKPipeline:
+    """
+    Drop-in replacement for ``kokoro.KPipeline``.
+
+    Synthesis takes ``call_overhead + len(text) * seconds_per_char`` of wall time
+    and produces ``len(text) * audio_seconds_per_char`` seconds of quiet noise.
+    """
+
+    call_overhead = 0.0
+    seconds_per_char = 0.0
+    audio_seconds_per_char = 0.065
+
+    def __init__(self, lang_code: str = "a", **kwargs):
+        self.lang_code = lang_code
+
+    def __call__(self, text: str, voice: str = None, speed: float = 1, split_pattern: str = r"\n+", **kwargs):
+        for part in [p for p in text.split("\n") if p.strip()]:
+            delay = self.call_overhead + len(part) * self.seconds_per_char
+            if delay > 0:
+                time.sleep(delay)
+            samples = max(1, int(len(part) * self.audio_seconds_per_char * SAMPLE_RATE / speed))
+            audio = (np.random.default_rng(len(part)).standard_normal(samples) * 0.01).astype(np.float32)
+            yield FakeResult(part, part.lower(), audio)
+
+
+def install_fake_kokoro(call_overhead: float = 0.0, seconds_per_char: float = 0.0):
+    """
+    Register a fake ``kokoro`` module so ``app.ai_utils`` picks up ``FakeKPipeline``.
+
+    Must run before ``app.ai_utils`` is imported.
+    """
+    FakeKPipeline.call_overhead = call_overhead
+    FakeKPipeline.seconds_per_char = seconds_per_char
+    module = types.ModuleType("kokoro")
+    module.KPipeline = FakeKPipeline
+    sys.modules["kokoro"] = module
+    return module
@@ -0,0 +1,153 @@
+"""
+Speech synthesis throughput with naive and planned text chunking.
+
+Synthesizes a corpus of lecture scripts one slide at a time, splitting each
+script either with the old ``[.!?]`` regex (``naive``) or with
+``app.text_chunking.plan_chunks`` (``planned``), and reports the number of
+pipeline calls, unit lengths and the real-time factor (synthesis wall time
+divided by audio duration; lower is better).
+
+By default the fake Kokoro pipeline from ``bench/stubs.py`` is used, with a
+per-call overhead and a per-character cost; ``--kokoro`` uses the real
+pipeline if it is installed. ``--corpus DIR`` reads ``*.txt`` scripts instead
+of generating them.
+
+Usage (from ``backend/``)::
+
+    python -m bench.tts_chunking --slides 40 --call-overhead 0.03
+"""
+
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import time
+
+from .stubs import _WORDS, SAMPLE_RATE, FakeKPipeline, _sentence
+
+# phrasing that trips a naive splitter: abbreviations, decimals, short
+# interjections and long run-on sentences
+_TEMPLATES = (
+    "Right.",
+    "Let's see.",
+    "Good.",
+    "Now, e.g. a {w} at 2.4 GHz behaves differently.",
+    "As Dr. Shannon showed, the {w} limit is about 3.5 bits per symbol, i.e. close to the bound.",
+    "See Fig. 3 and Eq. 2 for the {w} model.",
+    "The {w} and the {w2} interact, which means that when the {w} changes, the {w2} has to adapt, "
+    "and since the {w2} also feeds back into the {w}, the whole loop keeps adjusting, "
+    "sometimes for a long time, until the system settles at a new operating point where neither moves, "
+    "and only then, once the transients have died down and the {w} is stable again, can we measure it.",
+)
+
+
+def generate_corpus(rng: random.Random, slides: int):
+    """Lecture-like scripts: mostly ordinary sentences, mixed with the phrasing above."""
+    scripts = []
+    for _ in range(slides):
+        parts = []
+        for _ in range(rng.randint(6, 14)):
+            if rng.random() < 0.4:
+                parts.append(rng.choice(_TEMPLATES).format(w=rng.choice(_WORDS), w2=rng.choice(_WORDS)))
+            else:
+                parts.append(_sentence(rng))
+        scripts.append(" ".join(parts))
+    return scripts
+
+
+def naive_units(text: str):
+    """The splitter ``slide_to_speech`` used before ``app.text_chunking``."""
+    text = text.strip()
+    if not text:
+        return []
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+
+
+def planned_units(text: str, args):
+    from app.text_chunking import plan_chunks
+
+    return [c.text for c in plan_chunks(text, args.target_length, args.max_length, args.min_length)]
+
+
+def run(strategy: str, scripts, pipeline, args) -> dict:
+    from app.metrics import percentile
+
+    calls = samples = 0
+    unit_lengths, call_latencies = [], []
+    started = time.perf_counter()
+    for script in scripts:
+        units = naive_units(script) if strategy == "naive" else planned_units(script, args)
+        for unit in units:
+            call_started = time.perf_counter()
+            for _, _, chunk in pipeline(unit, voice="af_heart"):
+                samples += len(chunk)
+            call_latencies.append(time.perf_counter() - call_started)
+            unit_lengths.append(len(unit))
+            calls += 1
+    wall = time.perf_counter() - started
+    audio_seconds = samples / SAMPLE_RATE
+    return {
+        "strategy": strategy,
+        "calls": calls,
+        "mean_chars": sum(unit_lengths) / max(1, calls),
+        "max_chars": max(unit_lengths, default=0),
+        "p95_call_ms": percentile(call_latencies, 95) * 1000,
+        "wall_s": wall,
+        "audio_s": audio_seconds,
+        "rtf": wall / audio_seconds if audio_seconds else float("nan"),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=40, help="generated scripts (ignored with --corpus)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", help="directory of *.txt lecture scripts")
+    parser.add_argument("--kokoro", action="store_true", help="use the real Kokoro pipeline")
+    parser.add_argument("--call-overhead", type=float, default=0.03, help="fake pipeline cost per call (s)")
+    parser.add_argument("--seconds-per-char", type=float, default=0.0005, help="fake pipeline cost per character (s)")
+    parser.add_argument("--target-length", type=int, default=None)
+    parser.add_argument("--max-length", type=int, default=None)
+    parser.add_argument("--min-length", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from app import text_chunking
+
+    args.target_length = args.target_length or text_chunking.DEFAULT_TARGET_LENGTH
+    args.max_length = args.max_length or text_chunking.DEFAULT_MAX_LENGTH
+    args.min_length = args.min_length or text_chunking.DEFAULT_MIN_LENGTH
+
+    if args.corpus:
+        scripts = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.txt"))):
+            with open(path, encoding="utf-8") as f:
+                scripts.append(f.read())
+    else:
+        scripts = generate_corpus(random.Random(args.seed), args.slides)
+    if not scripts:
+        parser.error("no scripts to synthesize")
+
+    if args.kokoro:
+        from kokoro import KPipeline
+
+        pipeline = KPipeline(lang_code="a")
+    else:
+        FakeKPipeline.call_overhead = args.call_overhead
+        FakeKPipeline.seconds_per_char = args.seconds_per_char
+        pipeline = FakeKPipeline(lang_code="a")
+
+    rows = [run(strategy, scripts, pipeline, args) for strategy in ("naive", "planned")]
+
+    print(f"{'strategy':<10}{'calls':>7}{'mean ch':>9}{'max ch':>8}{'p95 ms':>9}{'wall s':>9}{'audio s':>9}{'RTF':>8}")
+    for row in rows:
+        print(
+            f"{row['strategy']:<10}{row['calls']:>7}{row['mean_chars']:>9.1f}{row['max_chars']:>8}"
+            f"{row['p95_call_ms']:>9.1f}{row['wall_s']:>9.2f}{row['audio_s']:>9.1f}{row['rtf']:>8.4f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn runs from backend/.
+
+With MODEL_LOADING=preload the app (and the Kokoro model) is loaded once in
+the master before forking, so workers boot in well under a second and share
+the model's memory copy-on-write instead of each loading their own copy.
+Each worker then starts its own LLM router loop and client right after the
+fork, so its first request does not pay for them.
+"""
+
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+# slide generation waits on the LLM for a while
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+preload_app = os.environ.get("MODEL_LOADING", "lazy") == "preload"
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # move everything loaded so far out of the collector's reach, so
+        # collections in the workers don't touch (and copy) the shared pages
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.ai_utils import warm_router
+        from app.db import dispose_after_fork
+
+        # connections opened in the master must not be shared between workers
+        dispose_after_fork()
+        warm_router()
@@ -1,6 +1,6 @@
 import os
 from app.config import Config
-from sqlalchemy import create_engine
+from app.db import create_engine
 
 
 def main():
@@ -8,9 +8,13 @@ def main():
     engine = create_engine(uri)
     print("Connecting to:", uri)
     # This will create tables via SQLAlchemy metadata when importing models
-    from app.db import Base
+    from app import models  # noqa: F401
+    from app.db import Base, upgrade_schema
 
     Base.metadata.create_all(bind=engine)
+    # tables from an older release get the columns and indexes added since
+    for statement in upgrade_schema(engine):
+        print("Applied:", statement)
     print("DB initialized")
 
 
@@ -0,0 +1,84 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from app import models  # noqa: F401
+    from app.db import Base, create_engine
+
+    eng = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+
+    application = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+            "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+            "DB_STARTUP": "blocking",
+            "MODEL_LOADING": "lazy",
+            "GC_INTERVAL": 0,
+            "PREPROCESS_WORKERS": 0,
+            "JOURNAL_DIR": "",
+        }
+    )
+    yield application
+    from app import db as db_module
+
+    db_module.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_db(app):
+    from app import db as db_module
+
+    session = db_module.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake_tts(tmp_path, monkeypatch):
+    """Synthesize with ``bench.stubs.FakeKPipeline`` into a temporary speech directory."""
+    from app import ai_utils, audio
+    from bench.stubs import FakeKPipeline
+
+    monkeypatch.setattr(audio, "SPEECH_DIR", str(tmp_path / "speech"))
+    monkeypatch.setattr(ai_utils, "get_pipeline", lambda: FakeKPipeline())
+    return FakeKPipeline
+
+
+@pytest.fixture
+def lecture_slide(app_db):
+    """A lecture (id 1) with a scripted slide 1 in its current run."""
+    from app.models import Lecture, Slide
+
+    lecture = Lecture(id=1, current_run=0, script="TCP is reliable. UDP is not.")
+    slide = Slide(lecture_id=1, slide_number=1, run=0, script="TCP is reliable. UDP is not. Both use ports.")
+    app_db.add_all([lecture, slide])
+    app_db.commit()
+    return slide
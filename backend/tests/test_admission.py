@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from app import admission
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_freed_slots_go_round_robin_across_lectures():
+    gate = admission.Gate("test", capacity=1, per_key=1, queue_target=5.0, hold_estimate=0.01)
+    held = gate.acquire("a")
+    order = []
+
+    def request(key):
+        ticket = gate.acquire(key)
+        order.append(key)
+        gate.release(ticket)
+
+    threads = []
+    # lecture a queues two requests before lecture b queues one
+    for key in ("a", "a", "b"):
+        threads.append(threading.Thread(target=request, args=(key,)))
+        threads[-1].start()
+        _wait_for(lambda: gate.snapshot()["queued"] == len(threads))
+    gate.release(held)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["a", "b", "a"]
+
+
+def test_sheds_on_arrival_when_the_queue_is_full():
+    gate = admission.Gate("test", capacity=1, max_queue=0, hold_estimate=2.5)
+    gate.acquire(1)
+
+    with pytest.raises(admission.Overloaded) as raised:
+        gate.acquire(2)
+
+    assert raised.value.retry_after == 3
+    assert gate.snapshot()["queued"] == 0
+
+
+def test_sheds_after_waiting_queue_target():
+    gate = admission.Gate("test", capacity=1, queue_target=0.05, hold_estimate=0.01)
+    gate.acquire(1)
+
+    with pytest.raises(admission.Overloaded) as raised:
+        gate.acquire(2)
+
+    assert raised.value.reason == "no slot within the queue delay target"
+    assert raised.value.retry_after >= 1
+    assert gate.snapshot()["queued"] == 0
+
+
+def test_shed_request_is_answered_503_with_retry_after(client, lecture_slide, monkeypatch):
+    gate = admission.Gate("llm", capacity=1, max_queue=0, hold_estimate=4.2)
+    monkeypatch.setitem(admission.gates, "llm", gate)
+    gate.acquire(1)
+
+    response = client.post("/lectures/user-question/1/1", json={"question": "Why?"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert response.get_json() == {"message": "server busy, retry later"}
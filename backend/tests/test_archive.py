@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import tarfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app import archive, preprocess
+from app.models import Lecture, Slide
+
+PDF = b"%PDF-1.4 test deck"
+DIGEST = hashlib.sha256(PDF).hexdigest()
+
+
+def _archive(tmp_path, lectures, slides=(), pdfs=None):
+    """A lecture archive with the given rows and ``pdfs`` (name -> bytes)."""
+    src = tmp_path / "src"
+    (src / "pdfs").mkdir(parents=True)
+    schemas = archive._schemas()
+    tables = {"lectures": list(lectures), "slides": list(slides), "concepts": [], "concept_events": []}
+    for name, rows in tables.items():
+        schema = schemas[name]
+        columns = {field.name: [row.get(field.name) for row in rows] for field in schema}
+        pq.write_table(pa.table(columns, schema=schema), src / f"{name}.parquet")
+    (src / "manifest.json").write_text(json.dumps({"version": archive.ARCHIVE_VERSION}))
+    path = tmp_path / "lectures.tar"
+    with tarfile.open(path, "w") as tar:
+        for name in ("manifest.json", *(f"{table}.parquet" for table in tables)):
+            tar.add(src / name, arcname=name)
+        for name, data in (pdfs or {}).items():
+            (src / "pdfs" / name).write_bytes(data)
+            tar.add(src / "pdfs" / name, arcname=f"pdfs/{name}")
+    return str(path)
+
+
+def _lecture(lecture_id=1, digest=DIGEST):
+    return {"lecture_id": lecture_id, "title": "t", "pdf_filename": "a.pdf", "pdf_sha256": digest}
+
+
+def test_import_stores_verified_pdf(db, tmp_path):
+    uploads = tmp_path / "uploads"
+    path = _archive(
+        tmp_path,
+        [_lecture()],
+        [{"lecture_id": 1, "slide_number": 1, "script": "hi"}],
+        pdfs={f"{DIGEST}.pdf": PDF},
+    )
+    id_map = archive.import_lectures(db, path, str(uploads))
+    lecture = db.get(Lecture, id_map[1])
+    assert lecture.pdf_sha256 == DIGEST
+    assert (uploads / f"{DIGEST}.pdf").read_bytes() == PDF
+    assert db.query(Slide).filter_by(lecture_id=lecture.id).count() == 1
+
+
+def test_import_rejects_path_in_digest(db, tmp_path):
+    path = _archive(tmp_path, [_lecture(digest="../../escaped")])
+    with pytest.raises(ValueError):
+        archive.import_lectures(db, path, str(tmp_path / "uploads"))
+    assert not os.path.exists(tmp_path / "escaped.pdf")
+    assert db.query(Lecture).count() == 0
+
+
+def test_import_rejects_pdf_not_matching_its_hash(db, tmp_path):
+    uploads = tmp_path / "uploads"
+    path = _archive(tmp_path, [_lecture()], pdfs={f"{DIGEST}.pdf": b"%PDF-1.4 something else"})
+    with pytest.raises(ValueError):
+        archive.import_lectures(db, path, str(uploads))
+    assert not (uploads / f"{DIGEST}.pdf").exists()
+
+
+def test_failed_import_leaves_no_lectures(db, tmp_path):
+    # the slide points at a lecture that is not in the archive
+    path = _archive(tmp_path, [_lecture(1), _lecture(2)], [{"lecture_id": 3, "slide_number": 1}], pdfs={f"{DIGEST}.pdf": PDF})
+    with pytest.raises(KeyError):
+        archive.import_lectures(db, path, str(tmp_path / "uploads"))
+    assert db.query(Lecture).count() == 0
+
+
+def test_imported_lectures_are_preprocessed(app, app_db, tmp_path):
+    from bench.replay import make_pdf
+
+    pdf = make_pdf(2, "imported")
+    digest = hashlib.sha256(pdf).hexdigest()
+    path = _archive(
+        tmp_path,
+        [_lecture(digest=digest)],
+        [{"lecture_id": 1, "slide_number": 1, "script": "hi"}],
+        pdfs={f"{digest}.pdf": pdf},
+    )
+    id_map = archive.import_lectures(app_db, path, app.config["UPLOAD_FOLDER"])
+    for thread in archive.preprocess_imported(app_db, id_map.values()):
+        thread.join()
+
+    app_db.expire_all()
+    lecture = app_db.get(Lecture, id_map[1])
+    assert lecture.page_count == 2
+    assert lecture.preprocess_status == preprocess.DONE
+    assert preprocess.is_complete(digest)
+    # a fixed modification time, so GET /step can answer 304 for imported slides
+    assert app_db.query(Slide).filter_by(lecture_id=lecture.id).one().updated_at is not None
@@ -0,0 +1,45 @@
+import json
+
+from app import api as api_module
+
+
+def test_audio_supports_range_and_revalidation(client, lecture_slide, fake_tts):
+    full = client.get("/lectures/audio/1/1")
+    assert full.status_code == 200
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert full.data[:4] == b"RIFF"
+    etag = full.headers["ETag"]
+
+    part = client.get("/lectures/audio/1/1", headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.headers["Content-Range"] == f"bytes 100-199/{len(full.data)}"
+    assert part.data == full.data[100:200]
+
+    assert client.get("/lectures/audio/1/1", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_audio_is_synthesized_once(client, lecture_slide, fake_tts, monkeypatch):
+    calls = []
+    synthesize = api_module.slide_to_speech
+    monkeypatch.setattr(api_module, "slide_to_speech", lambda slide: calls.append(slide) or synthesize(slide))
+    client.get("/lectures/audio/1/1")
+    client.get("/lectures/audio/1/1")
+    assert len(calls) == 1
+
+
+def test_sentence_index_points_into_the_wav(client, lecture_slide, fake_tts):
+    wav = client.get("/lectures/audio/1/1").data
+    index = json.loads(client.get("/lectures/audio-index/1/1").data)
+
+    assert [s["sentence"] for s in index["sentences"]] == [0, 1, 2]
+    assert index["data_offset"] + index["data_bytes"] == len(wav)
+    second = index["sentences"][1]
+    assert second["offset"] == index["sentences"][0]["offset"] + index["sentences"][0]["length"]
+    # a client seeks to a sentence with a Range request from its offset
+    seek = client.get("/lectures/audio/1/1", headers={"Range": f"bytes={second['offset']}-"})
+    assert seek.status_code == 206
+    assert seek.data == wav[second["offset"] :]
+
+
+def test_audio_of_missing_slide_is_404(client, lecture_slide, fake_tts):
+    assert client.get("/lectures/audio/1/9").status_code == 404
@@ -0,0 +1,76 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import ai_utils, audio
+
+SCRIPT = "TCP is reliable. UDP is not. Both use ports."
+
+
+def test_reader_follows_the_partial_file_until_published(tmp_path):
+    wav_path = str(tmp_path / "a.wav")
+    writer = audio.open_partial(wav_path)
+    writer.write(audio.wav_header())
+    blocks = [bytes([n]) * 1000 for n in range(1, 6)]
+
+    def write():
+        for block in blocks:
+            time.sleep(0.02)
+            writer.write(block)
+        audio.publish(writer, wav_path)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    received = b"".join(audio.tail_pcm(wav_path, poll=0.005))
+    thread.join()
+
+    assert received == b"".join(blocks)
+    assert not (tmp_path / "a.wav.partial").exists()
+
+
+def test_second_writer_waits_for_the_first(tmp_path):
+    wav_path = str(tmp_path / "a.wav")
+    first = audio.open_partial(wav_path)
+    opened = []
+    thread = threading.Thread(target=lambda: opened.append(audio.open_partial(wav_path)))
+    thread.start()
+    time.sleep(0.1)
+    assert opened == []
+
+    # the first writer finishes the artifact with its sidecars; the waiter has nothing to do
+    for path in (audio.index_path(wav_path), audio.timings_path(wav_path)):
+        open(path, "wb").close()
+    first.write(audio.wav_header(0))
+    audio.publish(first, wav_path)
+    thread.join(2)
+    assert opened == [None]
+
+
+def test_failed_synthesis_leaves_no_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "SPEECH_DIR", str(tmp_path))
+
+    def broken(text, voice=None):
+        raise RuntimeError("model crashed")
+        yield
+
+    monkeypatch.setattr(ai_utils, "get_pipeline", lambda: broken)
+    slide = SimpleNamespace(lecture_id=1, slide_number=1, script=SCRIPT)
+    with pytest.raises(RuntimeError):
+        ai_utils.slide_to_speech(slide)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stream_matches_the_finalized_file(client, lecture_slide, fake_tts):
+    streamed = client.get("/lectures/audio-stream/1/1")
+    assert streamed.status_code == 200
+    body = streamed.data
+    header = audio.wav_header()
+    assert body.startswith(header)
+
+    final = client.get("/lectures/audio-stream/1/1")
+    # the finalized file is served as a seekable artifact with the same samples
+    assert final.headers["Accept-Ranges"] == "bytes"
+    offset = audio.wav_data_offset(audio.artifact_path(lecture_slide))
+    assert final.data[offset:] == body[len(header) :]
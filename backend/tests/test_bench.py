@@ -0,0 +1,60 @@
+import json
+import urllib.request
+
+from bench import stubs
+from bench.loadtest import Stats, compare_to_baseline
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def test_stub_answers_with_the_requested_schema():
+    schema = {
+        "type": "object",
+        "properties": {
+            "script": {"type": "string"},
+            "correct": {"type": "boolean"},
+            "concept_updates": {
+                "type": "array",
+                "items": {"$ref": "#/$defs/Delta"},
+            },
+        },
+        "$defs": {"Delta": {"type": "object", "properties": {"concept": {"type": "string"}, "delta": {"type": "number"}}}},
+    }
+    with stubs.StubOpenAIServer(seed=1) as stub:
+        response = _post(
+            f"{stub.base_url}/responses",
+            {"model": "m", "input": "hello", "text": {"format": {"type": "json_schema", "schema": schema}}},
+        )
+    parsed = json.loads(response["output"][0]["content"][0]["text"])
+    assert set(parsed) == {"script", "correct", "concept_updates"}
+    assert isinstance(parsed["correct"], bool)
+    assert all(-0.2 <= item["delta"] <= 0.2 for item in parsed["concept_updates"])
+    assert stub.calls == 1
+
+
+def test_fake_pipeline_yields_audio_per_line():
+    results = list(stubs.FakeKPipeline()("First line.\n\nSecond, longer line."))
+    assert [r.graphemes for r in results] == ["First line.", "Second, longer line."]
+    assert len(results[1].audio) > len(results[0].audio)
+    graphemes, phonemes, audio = results[0]
+    assert audio.dtype.name == "float32"
+
+
+def test_report_and_baseline_regressions():
+    stats = Stats()
+    for seconds in (0.1, 0.1, 0.1, 0.5):
+        stats.begin("step")
+        stats.end("step", seconds, ok=True, size=10)
+    stats.begin("step")
+    stats.end("step", 0.1, ok=False, size=0)
+    report = stats.report(wall_seconds=1.0)
+    row = report["endpoints"]["step"]
+    assert row["requests"] == 5 and row["errors"] == 1 and row["bytes"] == 40
+
+    assert compare_to_baseline(report, {"endpoints": {"step": {"p95_ms": row["p95_ms"]}}}, 0.1) == []
+    failures = compare_to_baseline(report, {"endpoints": {"step": {"p95_ms": row["p95_ms"] / 2}}}, 0.1)
+    assert len(failures) == 1 and failures[0].startswith("step:")
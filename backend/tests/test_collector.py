@@ -0,0 +1,85 @@
+import threading
+from types import SimpleNamespace
+
+from flask import Flask
+
+from app import collector
+
+
+def _collectors():
+    return [t for t in threading.enumerate() if t.name == "collector"]
+
+
+def test_collector_starts_per_process_on_first_request(monkeypatch):
+    monkeypatch.setattr(collector, "_running", {"config": None, "pid": None})
+    app = Flask(__name__)
+    app.config["GC_INTERVAL"] = 3600
+    app.add_url_rule("/", "index", lambda: "ok")
+    before = len(_collectors())
+
+    collector.start(app)
+    # nothing runs in the process that built the app (gunicorn's master under preload)
+    assert len(_collectors()) == before
+
+    app.test_client().get("/")
+    app.test_client().get("/")
+    assert len(_collectors()) == before + 1
+
+    # a forked worker inherits the state but not the thread, and starts its own
+    collector._running["pid"] = -1
+    app.test_client().get("/")
+    assert len(_collectors()) == before + 2
+
+
+def test_next_batch_reads_on_without_listing(tmp_path, monkeypatch):
+    for i in range(10):
+        (tmp_path / f"f{i}").write_bytes(b"")
+    monkeypatch.setattr(collector, "_cursors", {})
+    monkeypatch.setattr(collector.os, "listdir", None)
+
+    batches = [collector._next_batch("t", str(tmp_path), 4) for _ in range(3)]
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert sorted(sum(batches, [])) == sorted(f"f{i}" for i in range(10))
+    # the next pass starts over
+    assert len(collector._next_batch("t", str(tmp_path), 4)) == 4
+
+
+def test_sweep_pages_spreads_a_large_directory_over_passes(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(collector, "_cursors", {})
+    monkeypatch.setattr(collector, "_draining_pages", set())
+    directory = tmp_path / "pages" / ("a" * 64)
+    directory.mkdir(parents=True)
+    for name in ["manifest.json", *(f"{n}.pdf" for n in range(1, 7))]:
+        (directory / name).write_bytes(b"x")
+
+    removed = []
+    for _ in range(4):
+        stats = collector.sweep_pages(db, str(tmp_path), retention=-1, batch_size=3, pacer=collector.Pacer(0))
+        assert stats["files"] <= 3
+        removed.append(stats["files"])
+        if removed == [3]:
+            assert not (directory / "manifest.json").exists()
+    assert sum(removed) == 7
+    assert not directory.exists()
+
+
+def test_sweep_remote_pages_through_the_account(monkeypatch):
+    from app import ai_utils
+
+    files = [
+        SimpleNamespace(id=f"file-{i}", filename="kept.pdf", created_at=0, bytes=1) for i in range(5)
+    ]
+    seen = []
+
+    class Files:
+        def list(self, purpose, limit, after=None):
+            start = next(i + 1 for i, f in enumerate(files) if f.id == after) if after else 0
+            page = files[start : start + limit]
+            seen.append([f.id for f in page])
+            return SimpleNamespace(data=page, has_more=start + limit < len(files))
+
+    monkeypatch.setattr(collector, "_cursors", {})
+    monkeypatch.setattr(ai_utils, "get_client", lambda: SimpleNamespace(files=Files()))
+    for _ in range(4):
+        collector.sweep_remote(retention=0, batch_size=2, pacer=collector.Pacer(0))
+    assert seen == [["file-0", "file-1"], ["file-2", "file-3"], ["file-4"], ["file-0", "file-1"]]
@@ -0,0 +1,36 @@
+import pytest
+
+from app import _model_policies, create_app
+from app.routing import router
+
+
+def test_policies_from_the_environment_string():
+    assert _model_policies("") == {}
+    assert _model_policies('{"step": {"hedge_model": null}}') == {"step": {"hedge_model": None}}
+
+
+@pytest.mark.parametrize("value", ["{not json", "[1, 2]"])
+def test_bad_policies_name_the_variable(tmp_path, value):
+    with pytest.raises(ValueError, match="MODEL_POLICIES"):
+        create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+                "GC_INTERVAL": 0,
+                "MODEL_POLICIES": value,
+            }
+        )
+
+
+def test_app_applies_policies(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "policies", dict(router.policies))
+    create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+            "GC_INTERVAL": 0,
+            "MODEL_POLICIES": '{"answer": {"model": "gpt-5-mini", "hedge_model": null}}',
+        }
+    )
+    assert router.policy("answer").model == "gpt-5-mini"
+    assert router.policy("answer").hedge_model is None
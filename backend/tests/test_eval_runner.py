@@ -0,0 +1,83 @@
+import importlib.util
+import os
+
+import pytest
+from openai import OpenAI
+
+from bench import stubs
+
+RUNNER = os.path.join(os.path.dirname(__file__), "..", "..", "experimental", "eval_runner.py")
+
+
+@pytest.fixture(scope="module")
+def eval_runner():
+    spec = importlib.util.spec_from_file_location("eval_runner", RUNNER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _cells(eval_runner):
+    cases = [
+        {
+            "id": "sum-wrong",
+            "task": "answer",
+            "inputs": {"question": "What's 1 + 1?", "answer": "3", "hypothesis": "- arithmetic: mastery 0.50"},
+            "expect": {"correct": False},
+        },
+        {
+            "id": "ports",
+            "task": "question",
+            "inputs": {"lecture": "TCP and UDP both use ports.", "student_hypothesis": "", "lecture_hypothesis": ""},
+        },
+    ]
+    return eval_runner.build_cells(cases, {}, ["gpt-5-mini"])
+
+
+def test_cells_cover_variants_models_and_cases(eval_runner):
+    variants = {"terse": {"question": "Ask about: {lecture}"}}
+    cells = eval_runner.build_cells(
+        [{"id": "ports", "task": "question", "inputs": {"lecture": "ports", "student_hypothesis": "", "lecture_hypothesis": ""}}],
+        variants,
+        ["a", "b"],
+    )
+
+    assert [(cell["variant"], cell["model"]) for cell in cells] == [
+        ("baseline", "a"),
+        ("baseline", "b"),
+        ("terse", "a"),
+        ("terse", "b"),
+    ]
+    assert cells[2]["prompt"] == "Ask about: ports"
+    # a variant without a template for the task falls back to the production prompt
+    assert "ports" in cells[0]["prompt"] and cells[0]["prompt"] != cells[2]["prompt"]
+
+
+def test_score_averages_the_requested_checks(eval_runner):
+    assert eval_runner.score("answer", {"correct": True}, {"parsed": {"correct": True}}) == 1.0
+    assert eval_runner.score("question", {"single_question": True, "max_words": 3}, {"text": "Why is TCP reliable?"}) == 0.5
+    assert eval_runner.score("question", {"keywords": ["TCP", "UDP"], "min_keywords": 1}, {"text": "tcp"}) == 1.0
+    assert eval_runner.score("question", {}, {"text": "anything"}) is None
+
+
+def test_responses_are_cached_and_replayed_offline(eval_runner, tmp_path):
+    cache = eval_runner.ResponseCache(str(tmp_path / "cache"))
+    first, second = _cells(eval_runner)
+
+    with stubs.StubOpenAIServer(seed=1) as api:
+        runner = eval_runner.Runner(OpenAI(api_key="test", base_url=api.base_url, max_retries=0), cache, 0, offline=False)
+        fetched = runner.run_cell(first)
+        again = runner.run_cell(first)
+        assert api.calls == 1
+    assert (fetched["source"], again["source"]) == ("api", "cache")
+    assert again["output"] == fetched["output"]
+
+    with eval_runner.RecordedStub(cache) as stub:
+        offline = eval_runner.Runner(OpenAI(api_key="offline", base_url=stub.base_url, max_retries=0), cache, 0, offline=True)
+        replayed = offline.run_cell(first)
+        faked = offline.run_cell(second)
+
+    assert replayed["source"] == "recorded" and replayed["output"] == fetched["output"]
+    assert faked["source"] == "stub"
+    # offline results are never cached
+    assert len(list((tmp_path / "cache").rglob("*.json"))) == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from app.grader import AnswerKey, extract_number, grade
+
+
+def _key(kind, expected, synonyms=(), tolerance=0.0):
+    return AnswerKey(kind=kind, expected=expected, tolerance=tolerance, synonyms=list(synonyms), concepts=["transport"])
+
+
+TERM = _key("term", "TCP", synonyms=["Transmission Control Protocol"])
+NUMERIC = _key("numeric", "2", tolerance=0.01)
+
+
+@pytest.mark.parametrize("answer", ["TCP", "tcp.", "It's TCP", "the answer is TCP", "transmission control protocol"])
+def test_term_answers_graded_locally(answer):
+    assert grade(TERM, answer).correct
+
+
+@pytest.mark.parametrize(
+    "answer",
+    ["TCP or UDP", "UDP, TCP", "I guess TCP but maybe UDP", "not TCP", "UDP", "TCP, because it is reliable"],
+)
+def test_hedged_negated_or_other_terms_go_to_the_llm(answer):
+    assert grade(TERM, answer) is None
+
+
+@pytest.mark.parametrize("answer,correct", [("2", True), ("it's two", True), ("2.0", True), ("3", False)])
+def test_numeric_answers(answer, correct):
+    assert grade(NUMERIC, answer).correct is correct
+
+
+@pytest.mark.parametrize("answer", ["not 2", "it isn't 2", "2 or 3", "two or three", "no idea"])
+def test_negated_or_ambiguous_numbers_go_to_the_llm(answer):
+    assert grade(NUMERIC, answer) is None
+
+
+def test_extract_number():
+    assert extract_number("1/2") == 0.5
+    assert extract_number("50%") == 0.5
+    assert extract_number("2 or 3") is None
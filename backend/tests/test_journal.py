@@ -0,0 +1,56 @@
+import json
+
+from app import journal
+from app.metrics import metrics
+
+
+def test_rotates_past_max_bytes_and_keeps_backups(tmp_path):
+    log = journal.Journal(str(tmp_path), max_bytes=200, backups=2)
+    for n in range(4):
+        for i in range(5):
+            log.record({"ts": n * 10 + i, "route": "/lectures/step/<int:lecture_id>/<int:slide_num>"})
+        log.flush()
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    base = f"requests.{log._pid}.jsonl"
+    assert files == [f"{base}.1", f"{base}.2"]
+    # each flush went past max_bytes and rotated; the two oldest batches were dropped
+    assert [entry["ts"] for entry in journal.read(str(tmp_path))] == [20, 21, 22, 23, 24, 30, 31, 32, 33, 34]
+
+
+def test_drops_entries_past_max_pending(tmp_path):
+    log = journal.Journal(str(tmp_path), max_pending=3)
+    dropped = metrics.counter("journal.dropped")
+    for i in range(5):
+        log.record({"ts": i})
+
+    assert metrics.counter("journal.dropped") - dropped == 2
+    assert log.flush() == 3
+    assert [entry["ts"] for entry in journal.read([log.path])] == [0, 1, 2]
+
+
+def test_read_skips_lines_cut_short(tmp_path):
+    path = tmp_path / "requests.1.jsonl"
+    path.write_text(json.dumps({"ts": 2}) + "\n" + json.dumps({"ts": 1}) + "\n" + '{"ts": 3, "rou')
+
+    assert journal.read(str(tmp_path)) == [{"ts": 1}, {"ts": 2}]
+
+
+def test_requests_are_journaled_by_route_and_operational_ones_are_not(app, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(journal, "_journal", None)
+    app.config["JOURNAL_DIR"] = str(tmp_path / "journal")
+    assert journal.init_app(app)
+
+    client.get("/metrics")
+    client.get("/students?limit=5")
+    client.get("/lectures/slide-images/999")
+    journal._journal.flush()
+
+    entries = journal.read(str(tmp_path / "journal"))
+    assert [(entry["method"], entry["route"], entry["status"]) for entry in entries] == [
+        ("GET", "/students", 200),
+        ("GET", "/lectures/slide-images/<int:lecture_id>", 404),
+    ]
+    assert entries[0]["query"] == "limit=5"
+    assert entries[1]["args"] == {"lecture_id": 999}
+    assert entries[0]["response_bytes"] > 0 and entries[0]["streamed"] is False
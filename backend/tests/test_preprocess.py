@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+import pytest
+
+from app import preprocess
+from bench.replay import make_pdf
+
+
+@pytest.fixture
+def pooled(tmp_path):
+    saved = dict(preprocess._settings)
+    preprocess.configure(upload_folder=str(tmp_path), workers=2, chunk_pages=1)
+    yield tmp_path
+    if preprocess._pool is not None:
+        preprocess._pool.shutdown()
+        preprocess._pool = None
+    preprocess._settings.update(saved)
+
+
+def test_pool_does_not_fork_the_threaded_process(pooled):
+    pool = preprocess._get_pool(2)
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+
+def test_pooled_split_writes_every_page(pooled):
+    payload = make_pdf(4, "pooled")
+    pdf_path = pooled / "deck.pdf"
+    pdf_path.write_bytes(payload)
+    digest = hashlib.sha256(payload).hexdigest()
+    seen = []
+
+    assert preprocess.preprocess_document(str(pdf_path), digest, 4, progress=seen.append) == 4
+
+    assert preprocess._pool is not None
+    assert seen[-1] == 4
+    out_dir = pooled / "pages" / digest
+    manifest = json.loads((out_dir / "manifest.json").read_text())
+    assert manifest["pages"] == 4
+    for number, sha in enumerate(manifest["page_sha256"], start=1):
+        assert hashlib.sha256((out_dir / f"{number}.pdf").read_bytes()).hexdigest() == sha
+        assert (out_dir / f"{number}.txt").exists()
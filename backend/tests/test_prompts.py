@@ -0,0 +1,33 @@
+from app import prompts
+
+
+def test_consecutive_steps_share_a_growing_prefix():
+    first = prompts.lecture_step_prompt("Slide one.", "profile", "tcp: 0.40")
+    second = prompts.lecture_step_prompt("Slide one. Slide two.", "profile", "tcp: 0.55")
+
+    assert first.kind == second.kind == "step"
+    assert first.prefix == second.prefix
+    # the lecture is appended to, so everything before the understanding context repeats
+    stable = first[: first.cacheable_length]
+    assert stable.endswith("Slide one.\n</lecture>\n\n")
+    assert second.startswith(stable[: -len("\n</lecture>\n\n")])
+    assert "tcp: 0.55" in second[second.cacheable_length :]
+
+
+def test_prompt_is_a_plain_string():
+    prompt = prompts.answer_feedback_prompt("What is TCP?", "A protocol", "tcp: 0.5")
+    assert isinstance(prompt, str)
+    assert prompt == prompt.prefix + prompt[prompt.prefix_length :]
+    assert prompt.index("What is TCP?") < prompt.index("A protocol")
+
+
+def test_cached_token_estimate_needs_the_provider_minimum():
+    short = prompts.lecture_step_prompt("x", "p", "h")
+    assert short.estimated_cached_tokens == 0
+    assert short.estimated_uncached_tokens == short.estimated_tokens
+
+    long = prompts.lecture_step_prompt("word " * 2000, "p", "h")
+    cached = long.estimated_cached_tokens
+    assert cached >= prompts.MIN_CACHEABLE_TOKENS
+    assert cached % prompts.CACHE_BLOCK_TOKENS == 0
+    assert cached <= prompts.estimate_tokens(long[: long.cacheable_length])
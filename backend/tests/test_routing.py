@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import routing
+from app.metrics import metrics
+from app.routing import MIN_LATENCY_SAMPLES, Policy, Router
+
+
+class FakeResponses:
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+
+    async def parse(self, model, **kwargs):
+        self.calls.append(model)
+        await asyncio.sleep(self.delays[model])
+        return SimpleNamespace(model=model, output_parsed={"ok": True})
+
+
+@pytest.fixture
+def fresh_metrics():
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def _router(delays, **policy):
+    router = Router({"step": Policy("small", hedge_model="large", **policy)})
+    router._client = SimpleNamespace(responses=FakeResponses(delays))
+    return router
+
+
+def test_default_policies_hedge_to_another_tier():
+    for policy in routing.DEFAULT_POLICIES.values():
+        assert policy.hedge_model and policy.hedge_model != policy.model
+
+
+def test_slow_primary_is_hedged_and_cancelled(fresh_metrics):
+    router = _router({"small": 5.0, "large": 0.01}, default_hedge_delay=0.05, min_hedge_delay=0.0)
+
+    response = router.parse("step", input="x")
+
+    assert response.model == "large"
+    assert router._client.responses.calls == ["small", "large"]
+    assert metrics.counter("llm.step.hedged") == 1
+    assert metrics.counter("llm.step.wins.hedge.large") == 1
+    assert metrics.counter("llm.step.cancelled") == 1
+    # the cancelled primary still counts, at no less than the time it ran
+    assert metrics.quantile("llm.step.primary.latency", 50) >= 0.05
+    assert metrics.quantile("llm.step.hedge.latency", 50) < 0.05
+
+
+def test_fast_primary_is_not_hedged(fresh_metrics):
+    router = _router({"small": 0.01, "large": 0.01}, default_hedge_delay=1.0, min_hedge_delay=0.0)
+
+    assert router.parse("step", input="x").model == "small"
+    assert router._client.responses.calls == ["small"]
+    assert metrics.counter("llm.step.hedged") == 0
+
+
+def test_hedge_delay_follows_primary_attempts_only(fresh_metrics):
+    policy = Policy("small", hedge_model="large", default_hedge_delay=10.0, min_hedge_delay=0.0, max_hedge_delay=30.0)
+    router = Router({"step": policy})
+    assert router.hedge_delay("step", policy) == 10.0
+
+    for _ in range(MIN_LATENCY_SAMPLES):
+        metrics.observe("llm.step.primary.latency", 4.0)
+        # short whole calls (cut short by hedges) and fast hedges do not move it
+        metrics.observe("llm.step.latency", 0.5)
+        metrics.observe("llm.step.hedge.latency", 0.5)
+    assert router.hedge_delay("step", policy) == pytest.approx(4.0)
+
+
+def test_warm_creates_the_client_on_the_loop_thread(monkeypatch):
+    import openai
+
+    threads = []
+
+    class FakeAsyncOpenAI:
+        def __init__(self, api_key=None):
+            threads.append(threading.current_thread().name)
+
+    monkeypatch.setattr(openai, "AsyncOpenAI", FakeAsyncOpenAI)
+    router = Router()
+
+    router.warm()
+
+    assert isinstance(router._client, FakeAsyncOpenAI)
+    assert threads == ["llm-router"]
+    assert router._loop.is_running()
+    router._loop.call_soon_threadsafe(router._loop.stop)
+
+
+def test_preload_before_fork_leaves_the_router_cold(monkeypatch):
+    from app import ai_utils
+
+    warmed = []
+    monkeypatch.setattr(ai_utils, "get_client", lambda: None)
+    monkeypatch.setattr(ai_utils, "get_pipeline", lambda: None)
+    monkeypatch.setattr(ai_utils.router, "warm", lambda: warmed.append(True))
+
+    ai_utils.preload_models(fork=True)
+    assert warmed == []
+    ai_utils.preload_models()
+    assert warmed == [True]
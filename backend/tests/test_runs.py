@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from app import collector, runs
+from app.models import ConceptMastery, Lecture, Slide
+
+
+def _lecture_with_slides(db, slides=3):
+    lecture = Lecture(current_run=0, script="so far")
+    db.add(lecture)
+    db.flush()
+    db.add_all(Slide(lecture_id=lecture.id, slide_number=n, run=0, script=f"slide {n}") for n in range(1, slides + 1))
+    db.add(ConceptMastery(lecture_id=lecture.id, run=0, concept="tcp", mastery=0.7, evidence=2))
+    db.commit()
+    return lecture
+
+
+def test_new_run_hides_old_slides_without_deleting_them(db):
+    lecture = _lecture_with_slides(db)
+
+    assert runs.start_run(db, lecture) == 1
+    db.commit()
+
+    assert lecture.script == ""
+    assert runs.current_slide(db, lecture.id, 1) is None
+    assert runs.current_slide(db, lecture.id, 1, run=0).script == "slide 1"
+    assert not runs.has_slides(db, lecture)
+    assert runs.list_runs(db, lecture.id) == [{"run": 0, "slides": 3}]
+
+
+def test_new_run_can_carry_the_student_model(db):
+    lecture = _lecture_with_slides(db)
+    run = runs.start_run(db, lecture, carry_concepts=True)
+    db.commit()
+    carried = db.query(ConceptMastery).filter_by(lecture_id=lecture.id, run=run).one()
+    assert (carried.concept, carried.mastery, carried.evidence) == ("tcp", 0.7, 2)
+
+
+def test_reset_endpoint_starts_a_run(client, app_db):
+    lecture = _lecture_with_slides(app_db)
+    response = client.post(f"/lectures/reset/{lecture.id}")
+    assert response.status_code == 200
+    assert response.get_json()["run"] == 1
+    listed = client.get(f"/lectures/runs/{lecture.id}").get_json()
+    assert listed == {"current_run": 1, "runs": [{"run": 0, "slides": 3}]}
+    assert client.post("/lectures/reset/999").status_code == 404
+
+
+def test_collector_purges_superseded_runs_after_retention(db):
+    lecture = _lecture_with_slides(db)
+    runs.start_run(db, lecture, carry_concepts=True)
+    db.add(Slide(lecture_id=lecture.id, slide_number=1, run=1, script="new"))
+    db.commit()
+
+    # still within the retention period
+    assert collector.purge_stale_runs(db, retention=3600)["slides"] == 0
+
+    lecture.run_started_at = datetime.utcnow() - timedelta(hours=2)
+    db.commit()
+    deleted = collector.purge_stale_runs(db, retention=3600, batch_size=2, max_batches=1)
+    assert deleted == {"slides": 2, "concept_mastery": 1, "concept_events": 0}
+    deleted = collector.purge_stale_runs(db, retention=3600, batch_size=2)
+    assert deleted["slides"] == 1
+
+    assert [s.run for s in db.query(Slide).filter_by(lecture_id=lecture.id)] == [1]
+    assert [c.run for c in db.query(ConceptMastery).filter_by(lecture_id=lecture.id)] == [1]
+
+
+def test_collection_pass_is_bounded(app, app_db, monkeypatch):
+    monkeypatch.setattr(collector, "sweep_storage", lambda db, config: {})
+    lecture = _lecture_with_slides(app_db, slides=5)
+    runs.start_run(app_db, lecture)
+    lecture.run_started_at = datetime.utcnow() - timedelta(hours=2)
+    app_db.commit()
+    config = {"RUN_RETENTION": 3600, "GC_BATCH_SIZE": 1, "GC_MAX_BATCHES": 2}
+
+    assert collector.collect_once(config)["slides"] == 2
+    assert collector.collect_once(config)["slides"] == 2
+    assert collector.collect_once(config)["slides"] == 1
@@ -0,0 +1,69 @@
+from sqlalchemy import inspect, text
+
+from app import models  # noqa: F401
+from app.db import Base, create_engine, upgrade_schema
+
+# the lectures/slides tables as the first release created them
+OLD_SCHEMA = [
+    "CREATE TABLE lectures (id INTEGER PRIMARY KEY, title VARCHAR(255), pdf_filename VARCHAR(512),"
+    " pdf_path VARCHAR(512), script TEXT, lecture_hypothesis TEXT)",
+    "CREATE TABLE slides (id INTEGER PRIMARY KEY, lecture_id INTEGER NOT NULL REFERENCES lectures(id),"
+    " slide_number INTEGER NOT NULL, script TEXT, audio_path VARCHAR(512), question TEXT)",
+    "INSERT INTO lectures (id, title) VALUES (1, 'old')",
+    "INSERT INTO slides (id, lecture_id, slide_number, script) VALUES (1, 1, 1, 'hello')",
+]
+
+
+def test_upgrade_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    Base.metadata.create_all(bind=engine)
+    assert upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    for table in ("lectures", "slides"):
+        columns = {c["name"] for c in inspector.get_columns(table)}
+        assert set(Base.metadata.tables[table].columns.keys()) <= columns
+    assert "ix_slides_lecture_run_slide" in {i["name"] for i in inspector.get_indexes("slides")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT run FROM slides WHERE id = 1")).scalar() == 0
+        assert conn.execute(text("SELECT current_run, pages_ready FROM lectures WHERE id = 1")).one() == (0, 0)
+
+    # idempotent: nothing left to do on the next start
+    assert upgrade_schema(engine) == []
+
+
+def test_upgrade_rebuilds_a_widened_unique_constraint(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+        # concept_mastery as user-027 created it: one row per lecture and concept
+        conn.execute(
+            text(
+                "CREATE TABLE concept_mastery (id INTEGER PRIMARY KEY, lecture_id INTEGER NOT NULL REFERENCES lectures(id),"
+                " concept VARCHAR(255) NOT NULL, mastery FLOAT NOT NULL, evidence INTEGER NOT NULL,"
+                " CONSTRAINT uq_concept_mastery_lecture_concept UNIQUE (lecture_id, concept))"
+            )
+        )
+        conn.execute(text("INSERT INTO concept_mastery VALUES (1, 1, 'tcp', 0.7, 3)"))
+
+    Base.metadata.create_all(bind=engine)
+    applied = upgrade_schema(engine)
+
+    assert any("RENAME" in statement for statement in applied)
+    inspector = inspect(engine)
+    assert [u["column_names"] for u in inspector.get_unique_constraints("concept_mastery")] == [
+        ["lecture_id", "run", "concept"]
+    ]
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT lecture_id, run, concept, mastery, evidence FROM concept_mastery")).all() == [
+            (1, 0, "tcp", 0.7, 3)
+        ]
+        # the same concept in a new run is what the old constraint rejected
+        conn.execute(text("INSERT INTO concept_mastery (lecture_id, run, concept, mastery, evidence) VALUES (1, 1, 'tcp', 0.5, 0)"))
+    assert "concept_mastery_old" not in inspector.get_table_names()
+    assert upgrade_schema(engine) == []
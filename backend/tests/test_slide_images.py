@@ -0,0 +1,64 @@
+import hashlib
+
+import pytest
+
+from app import slide_images
+from bench.replay import make_pdf
+
+
+@pytest.fixture
+def deck(app, app_db, tmp_path):
+    """Lecture 1, a two-page PDF whose pages have not been rendered yet."""
+    from app.models import Lecture
+
+    payload = make_pdf(2, "images")
+    pdf_path = tmp_path / "deck.pdf"
+    pdf_path.write_bytes(payload)
+    digest = hashlib.sha256(payload).hexdigest()
+    app_db.add(Lecture(id=1, current_run=0, pdf_path=str(pdf_path), pdf_sha256=digest, page_count=2))
+    app_db.commit()
+    return digest
+
+
+def test_manifest_gives_the_url_template(client, deck):
+    data = client.get("/lectures/slide-images/1").get_json()
+
+    assert data["available"] is True and data["ready"] is False
+    assert data["pages"] == 2 and data["widths"] == [240, 960, 1600]
+    assert data["url"] == f"/lectures/slide-image/{deck}/{{page}}/{{width}}.webp"
+    assert client.get("/lectures/slide-images/999").status_code == 404
+
+
+def test_image_is_rendered_on_demand_and_cached_for_good(client, deck):
+    url = f"/lectures/slide-image/{deck}/2/240.webp"
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp"
+    assert response.data[:4] == b"RIFF"
+    assert response.cache_control.immutable and response.cache_control.public
+    assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "{digest}/3/240.webp",  # past the last page
+        "{digest}/1/500.webp",  # not a rendered width
+        "{digest}/1/240.png",  # not the configured format
+        "{other}/1/240.webp",  # no lecture has this document
+        "not-a-digest/1/240.webp",
+    ],
+)
+def test_unknown_images_are_404(client, deck, path):
+    url = "/lectures/slide-image/" + path.format(digest=deck, other="0" * 64)
+
+    assert client.get(url).status_code == 404
+
+
+def test_images_are_501_without_rendering(client, deck, monkeypatch):
+    monkeypatch.setitem(slide_images._settings, "enabled", False)
+
+    assert client.get(f"/lectures/slide-image/{deck}/1/240.webp").status_code == 501
+    assert client.get("/lectures/slide-images/1").get_json()["available"] is False
@@ -0,0 +1,59 @@
+import json
+from types import SimpleNamespace
+
+from app import ai_utils, audio
+from app.text_chunking import plan_chunks
+from app.timing import SentenceSplitter, TimingTrack
+from bench.stubs import FakeKPipeline
+
+SCRIPT = "TCP is reliable. UDP is not. Both use ports. IP routes packets. That is all."
+
+
+def _token(text, start, end):
+    return SimpleNamespace(text=text, start_ts=start, end_ts=end)
+
+
+def test_short_sentences_share_a_unit():
+    chunks = plan_chunks(SCRIPT)
+    assert len(chunks) == 1
+    assert [n for n, _ in chunks[0].parts] == [0, 1, 2, 3, 4]
+
+
+def test_splitter_cuts_between_tokens():
+    splitter = SentenceSplitter([(0, "Hi there."), (1, "Bye.")], sample_rate=100)
+    tokens = [_token("Hi", 0.0, 0.2), _token("there", 0.3, 0.6), _token(".", 0.6, 0.7), _token("Bye", 0.9, 1.1), _token(".", 1.1, 1.2)]
+    pieces = splitter.split("Hi there. Bye.", 120, tokens)
+    assert [(sentence, text, samples) for sentence, text, samples, _ in pieces] == [
+        (0, "Hi there.", 80),
+        (1, "Bye.", 40),
+    ]
+    # token times are relative to their piece
+    assert pieces[1][3][0].start_ts == 0.9 - 0.8
+
+
+def test_splitter_without_tokens_divides_by_characters_across_results():
+    splitter = SentenceSplitter([(3, "aaaa bbbb."), (4, "cc.")], sample_rate=100)
+    first = splitter.split("aaaa", 40)
+    rest = splitter.split("bbbb. cc.", 80)
+    assert [(s, n) for s, _, n, _ in first] == [(3, 40)]
+    assert [(s, t, n) for s, t, n, _ in rest] == [(3, "bbbb.", 50), (4, "cc.", 30)]
+
+
+def test_slide_audio_has_one_entry_per_sentence(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "SPEECH_DIR", str(tmp_path))
+    monkeypatch.setattr(ai_utils, "get_pipeline", lambda: FakeKPipeline())
+    slide = SimpleNamespace(lecture_id=1, slide_number=1, script=SCRIPT)
+
+    ai_utils.slide_to_speech(slide)
+
+    wav = audio.artifact_path(slide)
+    with open(audio.index_path(wav)) as f:
+        index = json.load(f)
+    assert [s["sentence"] for s in index["sentences"]] == [0, 1, 2, 3, 4]
+    assert index["sentences"][1]["text"] == "UDP is not."
+    assert sum(s["length"] for s in index["sentences"]) == index["data_bytes"]
+
+    with open(audio.timings_path(wav), "rb") as f:
+        track = TimingTrack.from_bytes(f.read()).to_dict()
+    assert len(track["sentences"]) == 5
+    assert {w["sentence"] for w in track["words"]} == {0, 1, 2, 3, 4}
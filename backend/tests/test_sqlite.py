@@ -0,0 +1,56 @@
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.db import _engine_options, create_engine
+
+
+def test_file_database_runs_in_wal_mode(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nested' / 'app.db'}", busy_timeout=7)
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 7000
+    finally:
+        engine.dispose()
+
+
+def test_options_per_backend():
+    assert _engine_options("mysql+pymysql://u:p@h/db") == {"pool_pre_ping": True}
+    sqlite = _engine_options("sqlite://", busy_timeout=3)
+    assert sqlite["connect_args"] == {"check_same_thread": False, "timeout": 3}
+
+
+def test_writer_waits_for_the_lock_instead_of_failing(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    first, second = create_engine(url), create_engine(url)
+    try:
+        with first.begin() as conn:
+            conn.execute(text("CREATE TABLE t (n INTEGER)"))
+        holding = threading.Event()
+
+        def hold_write_lock():
+            with first.begin() as conn:
+                conn.execute(text("INSERT INTO t VALUES (1)"))
+                holding.set()
+                time.sleep(0.3)
+
+        thread = threading.Thread(target=hold_write_lock)
+        thread.start()
+        holding.wait(2)
+        with second.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+        thread.join()
+
+        with second.connect() as conn:
+            assert sorted(conn.execute(text("SELECT n FROM t")).scalars()) == [1, 2]
+        # readers are not blocked by a writer in WAL mode
+        with first.begin() as writer, second.connect() as reader:
+            writer.execute(text("INSERT INTO t VALUES (3)"))
+            assert reader.execute(text("SELECT count(*) FROM t")).scalar() == 2
+    finally:
+        first.dispose()
+        second.dispose()
@@ -0,0 +1,59 @@
+import pytest
+
+from app import api as api_module
+from app.models import Lecture
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    # the rendered-step cache is per process; each test has a new database
+    api_module._step_cache.clear()
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    scripts = iter(f"Script number {n}." for n in range(1, 100))
+    calls = []
+
+    def lecture_step(lecture, slide_num, hypothesis, student_hypothesis):
+        calls.append(slide_num)
+        return {"script": next(scripts), "question": "", "concepts": ["tcp"], "answer_key": None, "hypothesis_use": ""}
+
+    monkeypatch.setattr(api_module, "lecture_step", lecture_step)
+    return calls
+
+
+def test_get_never_generates(client, app_db, generated):
+    app_db.add(Lecture(id=1, current_run=0))
+    app_db.commit()
+    assert client.get("/lectures/step/1/1").status_code == 404
+    assert generated == []
+
+
+def test_get_revalidates_with_etag_and_last_modified(client, app_db, generated):
+    app_db.add(Lecture(id=1, current_run=0))
+    app_db.commit()
+    posted = client.post("/lectures/step/1/1").get_json()
+
+    first = client.get("/lectures/step/1/1")
+    assert first.status_code == 200
+    assert first.get_json() == posted
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+
+    assert client.get("/lectures/step/1/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/lectures/step/1/1", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert generated == [1]
+
+
+def test_regenerated_slide_gets_a_new_etag(client, app_db, generated):
+    app_db.add(Lecture(id=1, current_run=0))
+    app_db.commit()
+    client.post("/lectures/step/1/1")
+    etag = client.get("/lectures/step/1/1").headers["ETag"]
+
+    client.post("/lectures/reset/1")
+    client.post("/lectures/step/1/1")
+    fresh = client.get("/lectures/step/1/1", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.get_json()["text"] == "Script number 2."
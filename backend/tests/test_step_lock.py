@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app import api as api_module
+from app.db import Base, create_engine
+from app.models import Lecture, Slide
+from app.singleflight import advisory_lock
+
+
+@pytest.fixture
+def snapshot_engine(tmp_path):
+    """SQLite that, like MySQL's REPEATABLE READ, keeps a read snapshot from a transaction's first query."""
+    from app import models  # noqa: F401
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'step.db'}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    engine = create_engine(f"sqlite:///{tmp_path / 'step.db'}")
+
+    @event.listens_for(engine, "connect")
+    def _no_driver_transactions(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    yield engine
+    engine.dispose()
+
+
+def test_waiter_sees_slide_committed_by_lock_holder(snapshot_engine, monkeypatch):
+    Session = sessionmaker(bind=snapshot_engine, autoflush=False)
+    with Session() as db:
+        db.add(Lecture(id=1, current_run=0, script="earlier slides"))
+        db.commit()
+
+    def get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    read_lecture = threading.Event()
+
+    def lock_after_first_read(engine, name, timeout):
+        read_lecture.set()
+        return advisory_lock(engine, name, timeout)
+
+    generated = []
+    monkeypatch.setattr(api_module, "get_db", get_db)
+    monkeypatch.setattr(api_module, "advisory_lock", lock_after_first_read)
+    monkeypatch.setattr(api_module, "_run_step", lambda db, lecture, slide_num: generated.append(slide_num))
+
+    app = Flask(__name__)
+    result = {}
+
+    def waiter():
+        with app.app_context():
+            result["payload"] = api_module._generate_step(1, 2)
+
+    # another worker holds the slide's lock and generates it meanwhile
+    with advisory_lock(snapshot_engine, "deepest_learning:step:1:2", 5):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        assert read_lecture.wait(5)
+        # let the waiter get as far as polling the held lock
+        time.sleep(0.3)
+        with Session() as other:
+            other.add(Slide(lecture_id=1, run=0, slide_number=2, script="generated elsewhere"))
+            other.commit()
+    thread.join(10)
+
+    assert generated == []
+    assert result["payload"]["text"] == "generated elsewhere"
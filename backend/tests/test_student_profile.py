@@ -0,0 +1,85 @@
+from app import runs, student_profile
+from app.models import Lecture, Student, StudentConcept
+from app.student_model import ConceptDelta, apply_deltas
+
+
+def _concept(db, student_id, concept="tcp"):
+    return db.query(StudentConcept).filter_by(student_id=student_id, concept=concept).one()
+
+
+def test_reset_does_not_count_the_lecture_again(db):
+    student = Student(name="s")
+    db.add(student)
+    db.flush()
+    lecture = Lecture(student_id=student.id, current_run=0)
+    other = Lecture(student_id=student.id, current_run=0)
+    db.add_all([lecture, other])
+    db.flush()
+
+    apply_deltas(db, lecture.id, [ConceptDelta(concept="TCP", delta=0.2)], student_id=student.id, run=0)
+    db.commit()
+    assert _concept(db, student.id).lectures == 1
+
+    for _ in range(2):
+        run = runs.start_run(db, lecture)
+        apply_deltas(db, lecture.id, [ConceptDelta(concept="TCP", delta=0.1)], student_id=student.id, run=run)
+        db.commit()
+    assert _concept(db, student.id).lectures == 1
+
+    apply_deltas(db, other.id, [ConceptDelta(concept="TCP", delta=0.1)], student_id=student.id, run=0)
+    db.commit()
+    assert _concept(db, student.id).lectures == 2
+
+
+def test_students_by_concept_pages_by_id(db):
+    students = [Student(name=f"s{i}") for i in range(5)]
+    db.add_all(students)
+    db.flush()
+    for i, student in enumerate(students):
+        db.add(StudentConcept(student_id=student.id, concept="tcp", mastery=0.1 * i, evidence=1, lectures=1))
+    db.commit()
+
+    first = student_profile.students_by_concept(db, "TCP", max_mastery=0.35, limit=2)
+    rest = student_profile.students_by_concept(db, "TCP", max_mastery=0.35, after_id=first[-1]["cursor"], limit=2)
+    assert [r["student_id"] for r in first + rest] == [s.id for s in students[:4]]
+
+
+def test_page_limit_must_be_positive(client):
+    for path in ("/students?", "/students/by-concept?concept=tcp&"):
+        for limit in (0, -1):
+            response = client.get(f"{path}limit={limit}")
+            assert response.status_code == 400, (path, limit, response.get_json())
+    assert client.get("/students?limit=500").status_code == 200
+
+
+def test_list_students_builds_summaries_without_a_query_per_student(db, engine, monkeypatch):
+    from sqlalchemy import event
+
+    from app.cache import LRUCache
+
+    monkeypatch.setattr(student_profile, "_summaries", LRUCache(maxsize=16))
+    students = [Student(name=f"s{i}", profile_version=1) for i in range(5)]
+    db.add_all(students)
+    db.flush()
+    for i, student in enumerate(students):
+        db.add(StudentConcept(student_id=student.id, concept="tcp", mastery=0.2 * i, evidence=1, lectures=1))
+    db.commit()
+    expected = {s.id: student_profile._build_summary(db, s.id) for s in students}
+
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    page = student_profile.list_students(db)
+    db.commit()
+    assert {row["id"]: row["profile"] for row in page} == expected
+    assert len(selects) == 2
+
+    # stored summaries are read from the student rows themselves
+    monkeypatch.setattr(student_profile, "_summaries", LRUCache(maxsize=16))
+    selects.clear()
+    assert student_profile.list_students(db) == page
+    assert len(selects) == 1
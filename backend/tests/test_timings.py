@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.timing import TimingTrack
+
+
+def test_track_round_trips_through_bytes():
+    track = TimingTrack(24000)
+    tokens = [SimpleNamespace(text="Hello", start_ts=0.0, end_ts=0.5), SimpleNamespace(text="world", start_ts=0.6, end_ts=1.0)]
+    track.add_chunk(0, "Hello world", 24000, tokens)
+    track.add_chunk(1, "Again", 12000)
+    track.add_chunk(1, "and again", 12000)
+
+    data = track.to_bytes()
+    restored = TimingTrack.from_bytes(data).to_dict()
+
+    assert restored == track.to_dict()
+    assert restored["sentences"] == [{"start": 0, "end": 24000}, {"start": 24000, "end": 48000}]
+    assert restored["words"][1] == {"text": "world", "start": 14400, "end": 24000, "sentence": 0}
+    assert [w["sentence"] for w in restored["words"]] == [0, 0, 1, 1, 1]
+
+
+def test_words_without_tokens_span_the_chunk():
+    track = TimingTrack(100)
+    track.add_chunk(0, "aa bbbb", 80)
+    words = track.to_dict()["words"]
+    assert words[0]["start"] == 0 and words[-1]["end"] == 80
+    assert words[0]["end"] == words[1]["start"]
+
+
+def test_rejects_other_files():
+    with pytest.raises(ValueError):
+        TimingTrack.from_bytes(b"RIFF" + bytes(32))
+
+
+def test_timings_endpoint_serves_json_and_binary(client, lecture_slide, fake_tts):
+    as_json = client.get("/lectures/timings/1/1")
+    assert as_json.status_code == 200
+    body = as_json.get_json()
+    assert len(body["sentences"]) == 3
+    assert body["words"][-1]["text"] == "ports."
+
+    packed = client.get("/lectures/timings/1/1?format=bin")
+    assert packed.status_code == 200
+    assert TimingTrack.from_bytes(packed.data).to_dict() == body
+    assert client.get("/lectures/timings/1/1", headers={"If-None-Match": as_json.headers["ETag"]}).status_code == 304
+    assert client.get("/lectures/timings/1/1?format=xml").status_code == 400
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+
+from app import ws
+
+
+class FakeSocket:
+    def __init__(self, commands):
+        self.incoming = [json.dumps(command) for command in commands]
+        self.sent = []
+
+    def receive(self):
+        return self.incoming.pop(0) if self.incoming else None
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+def test_serve_waits_for_running_commands_and_drops_queued_ones(monkeypatch):
+    started = threading.Event()
+    ran = []
+
+    def slow(conn, command_id, command):
+        started.wait(1)
+        time.sleep(0.2)
+        conn.session.hypothesis = "after the close"
+        ran.append(command_id)
+        return {}
+
+    def mark(conn, command_id, command):
+        started.set()
+        ran.append(command_id)
+        return {}
+
+    monkeypatch.setitem(ws.HANDLERS, "slow", slow)
+    monkeypatch.setitem(ws.HANDLERS, "mark", mark)
+    app = Flask(__name__)
+    app.config["WS_SESSION_CONCURRENCY"] = 2
+    session = SimpleNamespace(lecture_id=1, hypothesis=None)
+    socket = FakeSocket([{"id": 1, "type": "mark"}, {"id": 2, "type": "slow"}, {"id": 3, "type": "slow"}, {"id": 4, "type": "slow"}])
+    conn = ws.Connection(socket, app, session)
+
+    conn.serve()
+
+    # serve() returned only after the running commands ended, so close() sees their state
+    assert session.hypothesis == "after the close"
+    assert 2 in ran and 4 not in ran
+
+
+def test_question_is_persisted_and_journaled_before_the_socket_closes(app, app_db, lecture_slide, monkeypatch, tmp_path):
+    from app import ai_utils, journal
+    from app.models import ConceptMastery, Lecture
+    from app.student_model import ConceptDelta
+
+    monkeypatch.setattr(
+        ai_utils,
+        "user_ask_question",
+        lambda script, question, hypothesis: {
+            "answer": "It retransmits.",
+            "concept_updates": [ConceptDelta(concept="TCP reliability", delta=0.3)],
+        },
+    )
+    log = journal.Journal(str(tmp_path / "journal"))
+    monkeypatch.setattr(journal, "_journal", log)
+    session = ws.LectureSession(1)
+    session.load()
+    socket = FakeSocket([{"id": 1, "type": "question", "slide": 1, "question": "Why is TCP reliable?"}])
+
+    ws.Connection(socket, app, session).serve()
+
+    reply = json.loads(socket.sent[0])
+    assert reply["type"] == "question.result"
+    app_db.expire_all()
+    # stored by the command itself, not by session.close()
+    assert app_db.get(Lecture, 1).lecture_hypothesis == reply["hypothesis"]
+    assert app_db.query(ConceptMastery).filter_by(lecture_id=1).count() == 1
+    log.flush()
+    (entry,) = journal.read([log.path])
+    assert entry["method"] == "POST"
+    assert entry["route"] == "/lectures/user-question/<int:lecture_id>/<int:slide_num>"
+    assert entry["args"] == {"lecture_id": 1, "slide_num": 1}
+    assert entry["status"] == 200 and entry["transport"] == "ws"
+    assert entry["request_bytes"] == len(json.dumps({"question": "Why is TCP reliable?"}))
+    assert entry["response_bytes"] == len(socket.sent[0])
+
+
+def test_failed_commands_are_journaled_with_their_status(app, lecture_slide, monkeypatch, tmp_path):
+    from app import journal
+
+    log = journal.Journal(str(tmp_path / "journal"))
+    monkeypatch.setattr(journal, "_journal", log)
+    session = ws.LectureSession(1)
+    session.load()
+    socket = FakeSocket([{"id": 1, "type": "answer", "slide": 9, "answer": "x"}, {"id": 2, "type": "ping"}])
+
+    ws.Connection(socket, app, session).serve()
+
+    log.flush()
+    (entry,) = journal.read([log.path])
+    assert entry["route"] == "/lectures/answer/<int:lecture_id>/<int:slide_num>"
+    assert entry["status"] == 404
@@ -0,0 +1,338 @@
+"""
+Evaluate prompt variants over a corpus of inputs, concurrently and cached.
+
+``question_experiment.py`` and ``answer_experiment.py`` try one prompt on one
+input with one blocking call. This runner evaluates the grid
+
+    prompt variants x models x corpus cases
+
+where the ``baseline`` variant is the production prompts of
+``backend/app/prompts.py`` and other variants come from a JSON file of
+templates (see ``eval_variants.json``). Cases are JSON lines (see
+``eval_corpus.jsonl``) with a task, its inputs and optional expectations:
+
+- ``answer``: ``answer_feedback_prompt`` with structured ``AnswerFeedback``
+  output; ``expect.correct`` checks the verdict;
+- ``question``: ``question_prompt``, plain text; ``expect.single_question``
+  checks it asks exactly one question;
+- ``user_question``: ``user_question_prompt`` with ``UserQuestionResponse``;
+- any task: ``expect.keywords`` (with ``min_keywords``, default all) and
+  ``expect.max_words`` check the text.
+
+Cells run on a thread pool (``--concurrency``), paced to ``--rate`` requests
+per second. Every response is cached under ``--cache`` by the hash of
+(model, prompt, output format), so re-running after changing one prompt only
+pays for the cells whose request changed. Tables report latency (p50/p95),
+tokens and estimated cost, and quality (mean check score), per variant and
+model.
+
+``--offline`` needs no API key: every request goes to a local stub that
+replays the cache's recorded response for it (after the recorded latency)
+and generates a schema-valid fake for the rest. Offline results are never
+written to the cache, and fakes are counted in the report, so their quality
+scores can be told apart.
+
+Usage (from the repository root)::
+
+    python experimental/eval_runner.py --models gpt-5-mini,gpt-5-nano --variants experimental/eval_variants.json
+    python experimental/eval_runner.py --offline --json results.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(os.path.dirname(HERE), "backend")
+sys.path.insert(0, BACKEND)
+
+from dotenv import load_dotenv  # noqa: E402
+
+from app import prompts  # noqa: E402
+from app.collector import Pacer  # noqa: E402
+from app.metrics import percentile  # noqa: E402
+from bench.prompt_cache import DEFAULT_CACHED_PRICE, DEFAULT_INPUT_PRICE, DEFAULT_OUTPUT_PRICE  # noqa: E402
+from bench.stubs import StubOpenAIServer, _prompt_text  # noqa: E402
+
+load_dotenv()
+
+
+def _formats():
+    from app.ai_utils import AnswerFeedback, UserQuestionResponse
+
+    return {"answer": AnswerFeedback, "question": None, "user_question": UserQuestionResponse}
+
+
+# task -> production prompt builder, taking the case inputs as keyword arguments
+BASELINE = {
+    "answer": prompts.answer_feedback_prompt,
+    "question": prompts.question_prompt,
+    "user_question": prompts.user_question_prompt,
+}
+
+
+def request_key(model: str, prompt: str, format_name) -> str:
+    """Cache key of one request; the offline stub computes the same one from the HTTP body."""
+    payload = json.dumps({"model": model, "input": prompt, "format": format_name}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """One JSON file per request under ``directory/<first two hex digits>/``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, record: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+
+
+class RecordedStub(StubOpenAIServer):
+    """``StubOpenAIServer`` that replays recorded responses when it has one for the request."""
+
+    def __init__(self, cache: ResponseCache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def respond(self, request: dict) -> dict:
+        fmt = (request.get("text") or {}).get("format") or {}
+        key = request_key(request.get("model"), _prompt_text(request.get("input", "")), fmt.get("name"))
+        record = self.cache.get(key)
+        if record is None:
+            return super().respond(request)
+        time.sleep(record["latency_s"])
+        return {**record["response"], "metadata": {"eval_source": "recorded"}}
+
+
+def build_prompt(variants: dict, variant: str, task: str, inputs: dict) -> str:
+    template = variants.get(variant, {}).get(task)
+    if template is None:
+        return str(BASELINE[task](**inputs))
+    return template.format(**inputs)
+
+
+def score(task: str, expect: dict, output: dict):
+    """Mean of the checks ``expect`` asks for, in [0, 1]; None without checks."""
+    checks = []
+    text = output.get("text", "")
+    if "correct" in expect and task == "answer":
+        checks.append(float(output.get("parsed", {}).get("correct") == expect["correct"]))
+    if expect.get("single_question"):
+        checks.append(float(text.count("?") == 1))
+    if expect.get("keywords"):
+        lowered = text.lower()
+        found = sum(1 for word in expect["keywords"] if word.lower() in lowered)
+        needed = expect.get("min_keywords", len(expect["keywords"]))
+        checks.append(min(1.0, found / needed) if needed else 1.0)
+    if expect.get("max_words"):
+        checks.append(float(len(text.split()) <= expect["max_words"]))
+    return sum(checks) / len(checks) if checks else None
+
+
+def _text_of(task: str, parsed) -> str:
+    """The prose of a structured output, for the text checks."""
+    if parsed is None:
+        return ""
+    if task == "answer":
+        return parsed.get("summary", "")
+    if task == "user_question":
+        return parsed.get("answer", "")
+    return ""
+
+
+class Runner:
+    def __init__(self, client, cache: ResponseCache, rate: float, offline: bool):
+        self.client = client
+        self.cache = cache
+        self.offline = offline
+        self._pacer = Pacer(rate)
+        self._pace_lock = threading.Lock()
+
+    def run_cell(self, cell: dict) -> dict:
+        task, model = cell["task"], cell["model"]
+        text_format = _formats()[task]
+        format_name = text_format.__name__ if text_format else None
+        key = request_key(model, cell["prompt"], format_name)
+
+        record = None if self.offline else self.cache.get(key)
+        source = "cache"
+        if record is None:
+            with self._pace_lock:
+                self._pacer.wait()
+            started = time.perf_counter()
+            if text_format is not None:
+                response = self.client.responses.parse(model=model, input=cell["prompt"], text_format=text_format)
+            else:
+                response = self.client.responses.create(model=model, input=cell["prompt"])
+            latency = time.perf_counter() - started
+            usage = response.usage
+            details = getattr(usage, "input_tokens_details", None)
+            parsed = getattr(response, "output_parsed", None)
+            record = {
+                "key": key,
+                "model": model,
+                "latency_s": latency,
+                "output_text": response.output_text,
+                "parsed": parsed.model_dump(mode="json") if parsed is not None else None,
+                "usage": {
+                    "input_tokens": usage.input_tokens or 0,
+                    "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+                    "output_tokens": usage.output_tokens or 0,
+                },
+                "response": response.model_dump(mode="json", exclude={"output_parsed"}),
+            }
+            if self.offline:
+                recorded = (response.metadata or {}).get("eval_source") == "recorded"
+                source = "recorded" if recorded else "stub"
+            else:
+                source = "api"
+                self.cache.put(key, record)
+
+        output = {"text": record["output_text"] if text_format is None else _text_of(task, record["parsed"])}
+        output["parsed"] = record["parsed"] or {}
+        return {
+            **{k: cell[k] for k in ("variant", "model", "case", "task")},
+            "source": source,
+            "latency_s": record["latency_s"],
+            "usage": record["usage"],
+            "score": score(task, cell["expect"], output),
+            "output": record["output_text"],
+        }
+
+
+def build_cells(cases, variants: dict, models):
+    cells = []
+    for variant in ["baseline", *variants]:
+        for model in models:
+            for case in cases:
+                cells.append(
+                    {
+                        "variant": variant,
+                        "model": model,
+                        "case": case["id"],
+                        "task": case["task"],
+                        "expect": case.get("expect", {}),
+                        "prompt": build_prompt(variants, variant, case["task"], case["inputs"]),
+                    }
+                )
+    return cells
+
+
+def print_tables(results, args, out=sys.stdout):
+    groups = defaultdict(list)
+    for result in results:
+        groups[(result["variant"], result["model"])].append(result)
+
+    header = (
+        f"{'variant':<14}{'model':<16}{'cells':>6}{'api':>5}{'cache':>6}{'stub':>5}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'in tok':>9}{'cached':>8}{'out tok':>9}{'cost $':>10}{'quality':>9}"
+    )
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for (variant, model), rows in sorted(groups.items()):
+        latencies = [r["latency_s"] for r in rows]
+        tokens = {name: sum(r["usage"][name] for r in rows) for name in ("input_tokens", "cached_tokens", "output_tokens")}
+        cost = (
+            (tokens["input_tokens"] - tokens["cached_tokens"]) * args.input_price
+            + tokens["cached_tokens"] * args.cached_price
+            + tokens["output_tokens"] * args.output_price
+        ) / 1e6
+        scores = [r["score"] for r in rows if r["score"] is not None]
+        sources = defaultdict(int)
+        for r in rows:
+            sources[r["source"]] += 1
+        quality = f"{sum(scores) / len(scores):.2f}" if scores else "-"
+        print(
+            f"{variant:<14}{model:<16}{len(rows):>6}{sources['api']:>5}{sources['cache'] + sources['recorded']:>6}"
+            f"{sources['stub']:>5}{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+            f"{tokens['input_tokens']:>9}{tokens['cached_tokens']:>8}{tokens['output_tokens']:>9}{cost:>10.5f}{quality:>9}",
+            file=out,
+        )
+
+    print(f"\n{'case':<20}" + "".join(f"{v[:12] + '/' + m[:10]:>24}" for v, m in sorted(groups)), file=out)
+    by_case = defaultdict(dict)
+    for result in results:
+        by_case[result["case"]][(result["variant"], result["model"])] = result["score"]
+    for case, row in by_case.items():
+        cells = "".join(f"{'-' if row.get(g) is None else format(row[g], '.2f'):>24}" for g in sorted(groups))
+        print(f"{case:<20}{cells}", file=out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(HERE, "eval_corpus.jsonl"), help="JSON lines of cases")
+    parser.add_argument("--variants", help="JSON file of prompt templates per variant and task")
+    parser.add_argument("--models", default="gpt-5-mini", help="comma-separated models")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second at most (0: unlimited)")
+    parser.add_argument("--cache", default=os.path.join(HERE, ".eval_cache"), help="response cache directory")
+    parser.add_argument("--offline", action="store_true", help="use the recorded-response stub instead of the API")
+    parser.add_argument("--input-price", type=float, default=DEFAULT_INPUT_PRICE, help="USD per 1M uncached input tokens")
+    parser.add_argument("--cached-price", type=float, default=DEFAULT_CACHED_PRICE, help="USD per 1M cached input tokens")
+    parser.add_argument("--output-price", type=float, default=DEFAULT_OUTPUT_PRICE, help="USD per 1M output tokens")
+    parser.add_argument("--json", dest="json_out", help="write every cell's result to this file")
+    args = parser.parse_args(argv)
+
+    from openai import OpenAI
+
+    with open(args.corpus, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    variants = {}
+    if args.variants:
+        with open(args.variants, encoding="utf-8") as f:
+            variants = json.load(f)
+    unknown = {case["task"] for case in cases} - set(BASELINE)
+    if unknown:
+        parser.error(f"unknown tasks in the corpus: {', '.join(sorted(unknown))}")
+
+    cache = ResponseCache(args.cache)
+    cells = build_cells(cases, variants, [m.strip() for m in args.models.split(",") if m.strip()])
+
+    stub = None
+    if args.offline:
+        stub = RecordedStub(cache).start()
+        client = OpenAI(api_key="offline", base_url=stub.base_url, max_retries=0)
+    else:
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    runner = Runner(client, cache, args.rate, args.offline)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(runner.run_cell, cells))
+    finally:
+        if stub is not None:
+            stub.stop()
+    wall = time.perf_counter() - started
+
+    print_tables(results, args)
+    print(f"\n{len(cells)} cells in {wall:.2f}s")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
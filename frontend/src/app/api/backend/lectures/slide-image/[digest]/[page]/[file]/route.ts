@@ -0,0 +1,36 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { BACKEND_URL } from '@/lib/config'
+
+// Proxy pre-rendered slide images. The URLs are content-addressed, so unlike audio
+// the backend's immutable Cache-Control and ETag are passed through.
+export async function GET(
+  req: NextRequest,
+  { params }: { params: { digest: string; page: string; file: string } }
+) {
+  const { digest, page, file } = params
+  const url = `${BACKEND_URL}/lectures/slide-image/${encodeURIComponent(digest)}/${encodeURIComponent(page)}/${encodeURIComponent(file)}`
+  try {
+    const headers: Record<string, string> = {}
+    const ifNoneMatch = req.headers.get('if-none-match')
+    if (ifNoneMatch) headers['If-None-Match'] = ifNoneMatch
+
+    const res = await fetch(url, { method: 'GET', headers })
+
+    if (!res.ok && res.status !== 304) {
+      return NextResponse.json({ error: 'image not found' }, { status: res.status })
+    }
+
+    const outHeaders = new Headers()
+    for (const name of ['content-type', 'content-length', 'cache-control', 'etag', 'last-modified']) {
+      const value = res.headers.get(name)
+      if (value) outHeaders.set(name, value)
+    }
+
+    return new NextResponse(res.status === 304 ? null : (res.body as any), {
+      status: res.status,
+      headers: outHeaders,
+    })
+  } catch (e) {
+    return NextResponse.json({ error: 'proxy failed' }, { status: 502 })
+  }
+}
@@ -6,12 +6,42 @@ export const dynamic = 'force-dynamic'
 export const revalidate = 0
 export const fetchCache = 'force-no-store'
 
+function stepUrl(params: { lectureId: string; slide: string }) {
+  return `${BACKEND_URL}/lectures/step/${encodeURIComponent(params.lectureId)}/${encodeURIComponent(params.slide)}`
+}
+
+// GET reads the stored slide; conditional headers pass through so revalidation can end in a 304
 export async function GET(req: NextRequest, { params }: { params: { lectureId: string; slide: string } }) {
-  const { lectureId, slide } = params
-  const url = `${BACKEND_URL}/lectures/step/${encodeURIComponent(lectureId)}/${encodeURIComponent(slide)}`
+  const url = stepUrl(params)
+  const headers = new Headers()
+  for (const name of ['if-none-match', 'if-modified-since']) {
+    const value = req.headers.get(name)
+    if (value) headers.set(name, value)
+  }
+  try {
+    const res = await fetch(url, { method: 'GET', headers, cache: 'no-store' })
+    const out = new Headers({ 'Cache-Control': 'no-cache' })
+    for (const name of ['etag', 'last-modified']) {
+      const value = res.headers.get(name)
+      if (value) out.set(name, value)
+    }
+    if (res.status === 304) {
+      return new NextResponse(null, { status: 304, headers: out })
+    }
+    out.set('Content-Type', 'application/json')
+    return new NextResponse(await res.text(), { status: res.status, headers: out })
+  } catch (e) {
+    console.error('[step proxy] Proxy error:', e)
+    return NextResponse.json({ error: 'proxy failed'+String(e) }, { status: 502 })
+  }
+}
+
+// POST generates the slide
+export async function POST(_req: NextRequest, { params }: { params: { lectureId: string; slide: string } }) {
+  const url = stepUrl(params)
   console.log('[step proxy] Proxying to:', url)
   try {
-    const res = await fetch(url, { method: 'GET', cache: 'no-store' })
+    const res = await fetch(url, { method: 'POST', cache: 'no-store' })
     console.log('[step proxy] Backend response status:', res.status)
   const body = await res.json()
   console.log('[step proxy] Backend response body:', body)
@@ -152,6 +152,7 @@ function ViewerPageInner() {
           <PdfCarousel
             ref={pdfCarouselRef}
             pdfUrl={pdfUrl}
+            lectureId={lectureId ? Number(lectureId) : undefined}
             showControls={false}
             disableControls={disableControls}
             onPageChange={handlePageChange}
@@ -2,11 +2,23 @@
 
 import { useState, useImperativeHandle, forwardRef, useEffect, useRef } from 'react'
 import { Document, Page, pdfjs } from 'react-pdf'
+import { fetchSlideImages, type SlideImages } from '@/lib/agent/backendApi'
 
 // Configure worker - react-pdf v9 requires explicit setup
 // Using version 4.4.168 which is bundled with react-pdf 9.1.1
 pdfjs.GlobalWorkerOptions.workerSrc = `https://unpkg.com/pdfjs-dist@4.4.168/build/pdf.worker.min.mjs`
 
+// Devices that struggle with PDF.js (little memory, few cores, data saver on)
+// show the backend's pre-rendered page images instead of parsing the PDF.
+function prefersImages(): boolean {
+  const nav = navigator as Navigator & { deviceMemory?: number; connection?: { saveData?: boolean } }
+  return (
+    (nav.deviceMemory !== undefined && nav.deviceMemory <= 2) ||
+    (nav.hardwareConcurrency !== undefined && nav.hardwareConcurrency <= 2) ||
+    !!nav.connection?.saveData
+  )
+}
+
 export interface PdfCarouselRef {
   nextPage: () => void
   prevPage: () => void
@@ -17,6 +29,8 @@ export interface PdfCarouselRef {
 
 interface PdfCarouselProps {
   pdfUrl: string
+  // Backend lecture whose page images can stand in for the PDF
+  lectureId?: number
   showControls?: boolean
   disableControls?: boolean
   onPageChange?: (currentPage: number, totalPages: number) => void
@@ -32,6 +46,7 @@ const PdfCarousel = forwardRef<PdfCarouselRef, PdfCarouselProps>(
   (
     {
       pdfUrl,
+      lectureId,
       showControls = true,
       disableControls = false,
       onPageChange,
@@ -49,6 +64,9 @@ const PdfCarousel = forwardRef<PdfCarouselRef, PdfCarouselProps>(
   const [pageHeight, setPageHeight] = useState<number | null>(null)
   const [pageWidth, setPageWidth] = useState<number | null>(null)
     const [isTransitioning, setIsTransitioning] = useState(false)
+    const [images, setImages] = useState<SlideImages | null>(null)
+    // Light clients hold off loading the PDF until they know whether page images exist
+    const [awaitingImages, setAwaitingImages] = useState(() => !!lectureId && prefersImages())
   const containerRef = useRef<HTMLDivElement>(null)
   const resizeTimeoutRef = useRef<number | null>(null)
   const lastUpdateTimeRef = useRef<number>(0)
@@ -102,6 +120,13 @@ const PdfCarousel = forwardRef<PdfCarouselRef, PdfCarouselProps>(
       }
     }, [])
 
+    // Light clients: use the page images when the backend has them, else keep the PDF
+    useEffect(() => {
+      if (!awaitingImages || !lectureId) return
+      loadImages(lectureId).finally(() => setAwaitingImages(false))
+      // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [lectureId])
+
     // Expose methods to parent via ref for programmatic control
     useImperativeHandle(ref, () => ({
       nextPage: () => {
@@ -125,7 +150,22 @@ const PdfCarousel = forwardRef<PdfCarouselRef, PdfCarouselProps>(
       onPageChange?.(1, numPages)
     }
 
-    const handleDocumentLoadError = (error: Error) => {
+    const loadImages = async (id: number): Promise<boolean> => {
+      try {
+        const info = await fetchSlideImages(id)
+        if (!info.available || !info.pages) return false
+        setImages(info)
+        onDocumentLoad({ numPages: info.pages })
+        return true
+      } catch (err) {
+        console.warn('[PdfCarousel] Slide images unavailable:', err)
+        return false
+      }
+    }
+
+    const handleDocumentLoadError = async (error: Error) => {
+      // A PDF that will not load can still be shown from the backend's page images
+      if (lectureId && (await loadImages(lectureId))) return
       console.error('Error loading PDF:', error)
       setError('Failed to load PDF document')
       setIsLoading(false)
@@ -168,6 +208,13 @@ const PdfCarousel = forwardRef<PdfCarouselRef, PdfCarouselProps>(
       }
     }
 
+    // The smallest rendered width that fills the space at the screen's pixel density
+    const imageUrl = (info: SlideImages) => {
+      const aspect = info.aspect?.[pageNumber - 1] ?? 4 / 3
+      const cssWidth = fitMode === 'height' ? (pageHeight ?? 0) * aspect : pageWidth ?? 0
+      return info.urlFor(pageNumber, Math.ceil(cssWidth * (window.devicePixelRatio || 1)))
+    }
+
     return (
       <div className="flex flex-col items-center justify-start w-full h-full overflow-hidden" ref={containerRef}>
         {/* PDF Document Display */}
@@ -183,6 +230,24 @@ const PdfCarousel = forwardRef<PdfCarouselRef, PdfCarouselProps>(
               <p className="text-lg font-semibold">{error}</p>
               <p className="text-sm mt-2">Please try uploading a different file</p>
             </div>
+          ) : awaitingImages ? (
+            <div className="p-8 text-center">
+              <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600 mx-auto"></div>
+              <p className="mt-4 text-gray-600">Loading slides...</p>
+            </div>
+          ) : images ? (
+            <div className="w-full h-full flex items-center justify-center overflow-auto">
+              <img
+                src={imageUrl(images) ?? undefined}
+                alt={`Slide ${pageNumber}`}
+                className="mx-auto object-contain"
+                style={
+                  fitMode === 'height'
+                    ? { height: pageHeight ?? undefined, maxWidth: '100%' }
+                    : { width: pageWidth ?? undefined, maxHeight: '100%' }
+                }
+              />
+            </div>
           ) : (
             <div 
               className="w-full h-full flex items-center justify-center overflow-auto"
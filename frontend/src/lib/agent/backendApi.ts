@@ -4,8 +4,9 @@ import type { AgentStep } from './types'
 import { loggedFetch } from '@/lib/dev/apiLog'
 
 /**
- * Fetch a single step (slide) from the backend.
+ * Generate a single step (slide) on the backend.
  * Pages are loaded sequentially on-demand as the user progresses through the lecture.
+ * (GET on the same URL only reads a slide that was already generated.)
  */
 export async function fetchStepFromBackend(
   lectureId: number,
@@ -21,7 +22,7 @@ export async function fetchStepFromBackend(
   console.log('[fetchStepFromBackend] Fetching step for page:', pageNumber, 'lectureId:', lectureId)
   const url = `/api/backend/lectures/step/${encodeURIComponent(String(lectureId))}/${pageNumber}`
   console.log('[fetchStepFromBackend] Calling proxy URL:', url)
-  const res = await loggedFetch(url)
+  const res = await loggedFetch(url, { method: 'POST' })
   if (!res.ok) {
     const errorText = await res.text()
     console.error('[fetchStepFromBackend] Failed to fetch step for page', pageNumber, 'status:', res.status, 'response:', errorText)
@@ -58,3 +59,40 @@ export async function fetchStepFromBackend(
       source: hypothesis || hypothesisUse ? 'slide' : undefined,
   }
 }
+
+export type SlideImages = {
+  available: boolean
+  ready: boolean
+  pages: number
+  widths: number[]
+  aspect: number[] | null
+  /** Image URL for a page at the smallest rendered width >= `width` (the largest if none is). */
+  urlFor: (page: number, width: number) => string | null
+}
+
+/**
+ * Where the backend's pre-rendered page images are, so light clients can show slides
+ * without loading the PDF. Image URLs are immutable and safe to cache indefinitely.
+ */
+export async function fetchSlideImages(lectureId: number): Promise<SlideImages> {
+  const res = await loggedFetch(`/api/backend/lectures/slide-images/${encodeURIComponent(String(lectureId))}`)
+  if (!res.ok) {
+    throw new Error(`Failed to fetch slide images for lecture ${lectureId}`)
+  }
+  const data = await res.json()
+  const widths: number[] = data?.widths || []
+  // the backend's template points at /lectures/...; images go through the Next.js proxy
+  const template: string | null = data?.url ? `/api/backend${data.url}` : null
+  return {
+    available: !!data?.available,
+    ready: !!data?.ready,
+    pages: data?.pages || 0,
+    widths,
+    aspect: data?.aspect || null,
+    urlFor: (page: number, width: number) => {
+      if (!template || !widths.length) return null
+      const chosen = widths.find((w) => w >= width) ?? widths[widths.length - 1]
+      return template.replace('{page}', String(page)).replace('{width}', String(chosen))
+    },
+  }
+}
@@ -2,14 +2,15 @@ import { NextResponse } from "next/server";
 
 const BACKEND_BASE_URL = "http://localhost:8000/lectures";
 
-export async function GET(
+// generates the slide; a GET on the backend URL only reads a stored one
+export async function POST(
   _request: Request,
   context: { params: Promise<{ lectureId: string; slide: string }> }
 ) {
   try {
     const { lectureId, slide } = await context.params;
     const res = await fetch(`${BACKEND_BASE_URL}/step/${lectureId}/${slide}`, {
-      method: "GET",
+      method: "POST",
       // Let cookies and headers be default; CORS isn't an issue server-to-server
     });
     const data = await res.json().catch(() => ({}));
@@ -94,7 +94,7 @@ export default function Home() {
   const doStepAndPlay = useCallback(async (lecId: number, slide: number) => {
     setIsLoadingSlide(true);
     try {
-      const stepRes = await fetch(`/api/backend/lectures/step/${lecId}/${slide}`);
+      const stepRes = await fetch(`/api/backend/lectures/step/${lecId}/${slide}`, { method: "POST" });
       if (!stepRes.ok) throw new Error("step failed");
       const _step: StepResponse = await stepRes.json();
 